@@ -2,11 +2,35 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from config import Config
 from models import db
+from migrations import check_schema_version, upgrade
 from routes.auth_routes import auth_bp
 from routes.expense_routes import expense_bp
 from routes.income_routes import income_bp
 from routes.analytics_routes import analytics_bp
 from routes.savings_routes import savings_bp
+from routes.budget_routes import budget_bp
+from routes.change_routes import change_bp
+from routes.maintenance_routes import maintenance_bp
+from routes.category_routes import category_bp
+from routes.statement_routes import statement_bp
+from utils.compression import compress_response
+from utils.currency import MissingRateError
+from utils.db_routing import LAST_WRITE_HEADER, add_last_write_header
+
+
+def register_blueprints(app):
+    """Register the API blueprints"""
+    app.register_blueprint(auth_bp, url_prefix='/api')
+    app.register_blueprint(expense_bp, url_prefix='/api')
+    app.register_blueprint(income_bp, url_prefix='/api')
+    app.register_blueprint(analytics_bp, url_prefix='/api')
+    app.register_blueprint(savings_bp, url_prefix='/api')
+    app.register_blueprint(budget_bp, url_prefix='/api')
+    app.register_blueprint(change_bp, url_prefix='/api')
+    app.register_blueprint(maintenance_bp, url_prefix='/api')
+    app.register_blueprint(category_bp, url_prefix='/api')
+    app.register_blueprint(statement_bp, url_prefix='/api')
+
 
 def create_app():
     """Application factory pattern"""
@@ -14,21 +38,27 @@ def create_app():
     app.config.from_object(Config)
     
     # Enable CORS for all routes
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=[LAST_WRITE_HEADER])
     
     # Initialize database
     db.init_app(app)
 
-    # Ensure tables exist on startup (important for managed hosts like Render)
     with app.app_context():
-        db.create_all()
+        if app.config['FAST_BOOT']:
+            # Schema is managed by the explicit migrate step; only verify the version
+            check_schema_version()
+        else:
+            # Ensure tables exist on startup (important for managed hosts like Render)
+            upgrade()
 
     # Register blueprints
-    app.register_blueprint(auth_bp, url_prefix='/api')
-    app.register_blueprint(expense_bp, url_prefix='/api')
-    app.register_blueprint(income_bp, url_prefix='/api')
-    app.register_blueprint(analytics_bp, url_prefix='/api')
-    app.register_blueprint(savings_bp, url_prefix='/api')
+    register_blueprints(app)
+
+    # Let clients keep their reads on the primary right after they write
+    app.after_request(add_last_write_header)
+
+    # Compress large responses for clients that accept gzip/brotli
+    app.after_request(compress_response)
     
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
@@ -40,6 +70,11 @@ def create_app():
     def not_found(error):
         return jsonify({'error': 'Resource not found'}), 404
     
+    @app.errorhandler(MissingRateError)
+    def missing_rate(error):
+        # Raised from the write paths before anything is committed; the request's session is rolled back
+        return jsonify({'error': str(error)}), 400
+    
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({'error': 'Internal server error'}), 500
@@ -47,12 +82,6 @@ def create_app():
     return app
 
 if __name__ == '__main__':
+    # create_app() applies pending migrations unless FAST_BOOT is set
     app = create_app()
-    
-    # Create tables if they don't exist
-    with app.app_context():
-        db.create_all()
-        print("Database tables created successfully!")
-    
-    # Run the application
     app.run(debug=True, host='0.0.0.0', port=5002)
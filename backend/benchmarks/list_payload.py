@@ -0,0 +1,101 @@
+"""
+Payload size and latency of GET /api/expenses with compression and sparse fieldsets.
+
+    python benchmarks/list_payload.py --rows 5000 --runs 20
+
+Seeds a throwaway SQLite database and compares the full uncompressed list with
+gzip/brotli-encoded responses and with ?fields= selections.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'expensebook_payload.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['FAST_BOOT'] = '0'
+
+from app import create_app
+from models import db, Expense
+from utils import compression
+from utils.categories import category_id, DEFAULT_CATEGORIES
+
+CASES = [
+    ('full, identity', None, 'identity'),
+    ('full, gzip', None, 'gzip'),
+    ('full, br', None, 'br'),
+    ('fields=id,amount,category_id,date, identity', 'id,amount,category_id,date', 'identity'),
+    ('fields=id,amount,category_id,date, gzip', 'id,amount,category_id,date', 'gzip'),
+    ('fields=id,amount,category_id,date, br', 'id,amount,category_id,date', 'br'),
+]
+
+
+def _seed(app, rows):
+    with app.app_context():
+        client = app.test_client()
+        token = client.post('/api/register', json={
+            'name': 'Bench', 'email': 'bench@example.com', 'password': 'bench'
+        }).get_json()['token']
+
+        start = datetime.utcnow() - timedelta(days=365)
+        categories = [category_id(1, name) for name in DEFAULT_CATEGORIES]
+        db.session.bulk_save_objects([
+            Expense(
+                user_id=1,
+                amount=round(random.uniform(1, 200), 2),
+                category_id=random.choice(categories),
+                description=f'Expense {index}',
+                date=start + timedelta(minutes=random.randint(0, 525600))
+            )
+            for index in range(rows)
+        ])
+        db.session.commit()
+    return token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+
+    app = create_app()
+    token = _seed(app, args.rows)
+    client = app.test_client()
+
+    print(f"GET /api/expenses with {args.rows} rows, median of {args.runs} runs")
+    baseline = None
+    for label, fields, encoding in CASES:
+        if encoding == 'br' and compression.brotli is None:
+            print(f"  {label:<44} skipped (brotli not installed)")
+            continue
+
+        query = f'?fields={fields}' if fields else ''
+        headers = {'Authorization': f'Bearer {token}', 'Accept-Encoding': encoding}
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            response = client.get(f'/api/expenses{query}', headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        size = len(response.get_data())
+        baseline = baseline or size
+        print(
+            f"  {label:<44} {size:>10,} bytes ({size / baseline:6.1%})"
+            f"   {statistics.median(timings):7.1f} ms"
+        )
+
+    os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
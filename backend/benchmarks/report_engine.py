@@ -0,0 +1,161 @@
+"""
+NumPy report engine vs. SQL GROUP BY for an all-time monthly report.
+
+    python benchmarks/report_engine.py --rows 1000000 --runs 3
+
+Seeds a throwaway SQLite database with one user and --rows expenses (plus a
+tenth as many incomes and savings transactions), then times:
+  * sql:   GROUP BY year/month/category for expenses and GROUP BY year/month
+           for incomes and savings, pivoted and accumulated in Python
+  * numpy: utils.reporting.build_report (single column pull + array ops),
+           cold (arrays loaded from the database) and warm (cached arrays)
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'expensebook_report.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['FAST_BOOT'] = '0'
+
+from sqlalchemy import extract, func
+
+from app import create_app
+from models import db, DEFAULT_CURRENCY, User, Expense, Income, SavingsTransaction
+from utils import reporting
+from utils.categories import category_id, seed_defaults, DEFAULT_CATEGORIES
+from utils.reporting import LedgerArrays, build_report
+
+CHUNK = 50000
+
+
+def _seed(rows):
+    user = User(email='report@example.com', name='Report')
+    user.set_password('report')
+    db.session.add(user)
+    db.session.commit()
+    seed_defaults(user.id)
+    db.session.commit()
+    categories = [category_id(user.id, name) for name in DEFAULT_CATEGORIES]
+
+    start = datetime(2015, 1, 1)
+    span = int((datetime(2025, 1, 1) - start).total_seconds())
+
+    def _date():
+        return start + timedelta(seconds=random.randint(0, span))
+
+    for offset in range(0, rows, CHUNK):
+        count = min(CHUNK, rows - offset)
+        db.session.execute(Expense.__table__.insert(), [
+            {'user_id': user.id, 'amount': round(random.uniform(1, 200), 2),
+             'category_id': random.choice(categories), 'description': '', 'date': _date(),
+             'created_at': datetime.utcnow()}
+            for _ in range(count)
+        ])
+    db.session.execute(Income.__table__.insert(), [
+        {'user_id': user.id, 'amount': round(random.uniform(100, 2000), 2), 'source': 'Salary',
+         'date': _date(), 'created_at': datetime.utcnow()}
+        for _ in range(rows // 10)
+    ])
+    db.session.execute(SavingsTransaction.__table__.insert(), [
+        {'user_id': user.id, 'amount': round(random.uniform(1, 50), 2), 'action': 'deposit',
+         'description': '', 'date': _date(), 'created_at': datetime.utcnow()}
+        for _ in range(rows // 10)
+    ])
+    db.session.commit()
+    return user.id
+
+
+def sql_report(user_id):
+    """The GROUP BY approach used by the existing analytics routes, extended to all time"""
+    year = extract('year', Expense.date).label('year')
+    month = extract('month', Expense.date).label('month')
+    by_category = db.session.query(year, month, Expense.category_id, func.sum(Expense.amount)).filter(
+        Expense.user_id == user_id
+    ).group_by('year', 'month', Expense.category_id).all()
+
+    incomes = db.session.query(
+        extract('year', Income.date).label('year'), extract('month', Income.date).label('month'),
+        func.sum(Income.amount)
+    ).filter(Income.user_id == user_id).group_by('year', 'month').all()
+
+    savings = db.session.query(
+        extract('year', SavingsTransaction.date).label('year'),
+        extract('month', SavingsTransaction.date).label('month'),
+        SavingsTransaction.action, func.sum(SavingsTransaction.amount)
+    ).filter(SavingsTransaction.user_id == user_id).group_by('year', 'month', SavingsTransaction.action).all()
+
+    matrix, expenses, income, transfers = {}, {}, {}, {}
+    for y, m, category, total in by_category:
+        key = (int(y), int(m))
+        matrix.setdefault(category, {})[key] = total
+        expenses[key] = expenses.get(key, 0) + total
+    for y, m, total in incomes:
+        income[(int(y), int(m))] = total
+    for y, m, action, total in savings:
+        key = (int(y), int(m))
+        transfers[key] = transfers.get(key, 0) + (total if action == 'deposit' else -total)
+
+    balance, cumulative = 0, []
+    for key in sorted(set(expenses) | set(income) | set(transfers)):
+        balance += income.get(key, 0) - expenses.get(key, 0) - transfers.get(key, 0)
+        cumulative.append(balance)
+    return matrix, cumulative
+
+
+def _time(func_, runs):
+    timings = []
+    for _ in range(runs):
+        db.session.expire_all()
+        started = time.perf_counter()
+        result = func_()
+        timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        user_id = _seed(args.rows)
+        print(f"Seeded {args.rows:,} expenses in {time.perf_counter() - started:.1f}s")
+
+        (_, sql_cumulative), sql_seconds = _time(lambda: sql_report(user_id), args.runs)
+
+        def _cold(period):
+            reporting._ledger_cache.clear()
+            return build_report(user_id, period)
+
+        report, cold_seconds = _time(lambda: _cold('month'), args.runs)
+        _, load_seconds = _time(lambda: LedgerArrays.load(user_id, DEFAULT_CURRENCY), args.runs)
+        _, warm_monthly = _time(lambda: build_report(user_id, 'month'), args.runs)
+        _, warm_yearly = _time(lambda: build_report(user_id, 'year'), args.runs)
+
+        assert abs(report['cumulative_balance'][-1] - sql_cumulative[-1]) < 0.01 * max(1, abs(sql_cumulative[-1]))
+
+        print(f"  sql   GROUP BY monthly report          {sql_seconds * 1000:9.1f} ms")
+        print(f"  numpy monthly report, cold             {cold_seconds * 1000:9.1f} ms")
+        print(f"    of which column pull                 {load_seconds * 1000:9.1f} ms")
+        print(f"  numpy monthly report, cached arrays    {warm_monthly * 1000:9.1f} ms")
+        print(f"  numpy yearly report, cached arrays     {warm_yearly * 1000:9.1f} ms")
+
+    os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+"""
+SQL snapshot check: the statements and query plans every API route emits.
+
+    python benchmarks/sql_snapshots.py                 # compare with the stored snapshots
+    python benchmarks/sql_snapshots.py --update        # rewrite them after an intended change
+    python benchmarks/sql_snapshots.py --database-url postgresql://localhost/expensebook_snapshots \
+        --shard-url postgresql://localhost/expensebook_snapshots_shard
+
+Seeds throwaway databases with a fixed ledger: a primary, one shard holding
+the per-user tables and one read replica pointed at the primary, so it is
+always caught up (SQLite files by default; PostgreSQL databases given with
+--database-url and --shard-url are dropped and recreated). It then calls every
+route registered under /api once (CASES) and records per route the status
+code, the normalized SQL it emitted on each engine and the plan of each
+SELECT, UPDATE and DELETE (EXPLAIN QUERY PLAN on SQLite, EXPLAIN (FORMAT JSON)
+with sequential scans discouraged on PostgreSQL). Snapshots are JSON files in
+benchmarks/sql_snapshots/<dialect>/, one per blueprint, committed with the
+code so query changes show up in review.
+
+The check fails (exit status 1) when a route returns a different status code
+than its snapshot, emits more statements, scans a table that was read through
+an index before, stops reading from the replica, or has no case. Fewer
+statements or scans only print a note; run with --update and commit the new
+snapshots.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'sql_snapshots')
+sys.path.append(BACKEND_DIR)
+
+EMAIL = 'snapshots@example.com'
+PASSWORD = 'snapshots'
+REFRESH_TOKEN = '<refresh token of the seeded user>'
+# Registered by the auth.register case; cases in FRESH_SESSION_CASES run with a new session of this user
+OTHER_USER = {'email': 'other@example.com', 'password': 'other'}
+FRESH_SESSION_CASES = {'auth.logout'}
+# Statements of the seeded user are generated for the last closed month
+LAST_CLOSED = datetime.utcnow().replace(day=1) - timedelta(days=1)
+
+# (endpoint, method, path, json body) in the order they run against the seeded ledger;
+# reads come first and destructive calls last so every case sees the same data
+CASES = [
+    ('health_check', 'GET', '/api/health', None),
+    ('auth.register', 'POST', '/api/register', {'name': 'Other', **OTHER_USER}),
+    ('auth.login', 'POST', '/api/login', {'email': EMAIL, 'password': PASSWORD}),
+    ('auth.refresh_token', 'POST', '/api/token/refresh', {'refresh_token': REFRESH_TOKEN}),
+    ('auth.get_user', 'GET', '/api/user', None),
+    ('auth.update_user', 'PATCH', '/api/user', {'name': 'Snapshots'}),
+    ('expense.get_expenses', 'GET', '/api/expenses?category=Food', None),
+    ('income.get_incomes', 'GET', '/api/incomes', None),
+    ('savings.get_savings', 'GET', '/api/savings', None),
+    ('budget.get_budgets', 'GET', '/api/budgets', None),
+    ('budget.get_budget_status', 'GET', '/api/budgets/status', None),
+    ('budget.get_budget_alerts', 'GET', '/api/budgets/alerts', None),
+    ('category.get_categories', 'GET', '/api/categories', None),
+    ('statement.get_statements', 'GET', '/api/statements', None),
+    ('statement.get_statement', 'GET', f'/api/statements/{LAST_CLOSED.year}/{LAST_CLOSED.month}?format=pdf', None),
+    ('analytics.get_dashboard_analytics', 'GET', '/api/analytics/dashboard', None),
+    ('analytics.get_category_breakdown', 'GET', '/api/analytics/category-breakdown', None),
+    ('analytics.get_monthly_trend', 'GET', '/api/analytics/monthly-trend', None),
+    ('analytics.get_insights', 'GET', '/api/analytics/insights', None),
+    ('analytics.get_report', 'GET', '/api/analytics/report?period=month', None),
+    ('analytics.get_forecast', 'GET', '/api/analytics/forecast', None),
+    ('expense.create_expense', 'POST', '/api/expenses', {'amount': 12.5, 'category': 'Food', 'description': 'Lunch'}),
+    ('expense.update_expense', 'PUT', '/api/expenses/1', {'amount': 20}),
+    ('expense.bulk_update_expenses', 'PATCH', '/api/expenses/bulk', {'ids': [2, 3], 'set': {'description': 'Bulk'}}),
+    ('expense.delete_expense', 'DELETE', '/api/expenses/4', None),
+    ('expense.bulk_delete_expenses', 'DELETE', '/api/expenses/bulk', {'ids': [5, 6]}),
+    ('income.create_income', 'POST', '/api/incomes', {'amount': 900, 'source': 'Salary'}),
+    ('income.update_income', 'PUT', '/api/incomes/1', {'amount': 950}),
+    ('income.bulk_update_incomes', 'PATCH', '/api/incomes/bulk', {'ids': [2, 3], 'set': {'source': 'Bonus'}}),
+    ('income.delete_income', 'DELETE', '/api/incomes/4', None),
+    ('income.bulk_delete_incomes', 'DELETE', '/api/incomes/bulk', {'ids': [5, 6]}),
+    ('savings.create_savings_transaction', 'POST', '/api/savings', {'amount': 25, 'action': 'deposit'}),
+    ('savings.bulk_update_savings_transactions', 'PATCH', '/api/savings/bulk', {'ids': [2], 'set': {'description': 'Bulk'}}),
+    ('savings.bulk_delete_savings_transactions', 'DELETE', '/api/savings/bulk', {'ids': [3]}),
+    ('budget.create_budget', 'POST', '/api/budgets', {'category': 'Travel', 'amount': 300}),
+    ('budget.update_budget', 'PUT', '/api/budgets/1', {'amount': 500}),
+    ('budget.delete_budget', 'DELETE', '/api/budgets/2', None),
+    # Ids 1-10 are the built-in categories of the seeded user and of the one registered above
+    ('category.create_category', 'POST', '/api/categories', {'name': 'Pets'}),
+    ('category.update_category', 'PUT', '/api/categories/11', {'name': 'Pet care'}),
+    ('category.remove_category', 'DELETE', '/api/categories/11', None),
+    ('changes.get_changes', 'GET', '/api/changes?since=0', None),
+    ('changes.get_stream_token', 'POST', '/api/changes/stream-token', None),
+    ('changes.stream_changes', 'GET', '/api/changes/stream?since=0', None),
+    ('changes.get_sync', 'GET', '/api/sync', None),
+    ('maintenance.purge_data', 'POST', '/api/user/purge', {'before': '2000-01-01'}),
+    ('maintenance.get_jobs', 'GET', '/api/jobs', None),
+    ('maintenance.get_job', 'GET', '/api/jobs/1', None),
+    ('maintenance.delete_account', 'DELETE', '/api/user', None),
+    ('auth.logout', 'POST', '/api/logout', None),
+]
+
+_PLACEHOLDER = r'(?:\?|%\(\w+\)s|:\w+)'
+_IN_LIST = re.compile(rf'IN \({_PLACEHOLDER}(?:, {_PLACEHOLDER})*\)')
+# SCAN walks a whole table or index (SEARCH is a keyed lookup)
+_SQLITE_SCAN = re.compile(r'^SCAN (\w+)')
+_EXPLAINED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+_COUNTED = _EXPLAINED + ('INSERT',)
+
+
+def normalize(statement):
+    """Collapse whitespace and expanded IN lists so snapshots do not depend on list lengths"""
+    return _IN_LIST.sub('IN (...)', ' '.join(statement.split()))
+
+
+def _seed(app):
+    from models import db, Budget, Expense, Income, SavingsTransaction
+    from utils.budget_tracker import rebuild_spend
+    from utils.categories import category_id, DEFAULT_CATEGORIES
+    from utils.sharding import user_scope
+    from utils.statements import generate_statements
+
+    client = app.test_client()
+    tokens = client.post('/api/register', json={
+        'name': 'Snapshots', 'email': EMAIL, 'password': PASSWORD
+    }).get_json()
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with app.app_context(), user_scope(db.session, 1):
+        categories = [category_id(1, name) for name in DEFAULT_CATEGORIES]
+        db.session.execute(Expense.__table__.insert(), [
+            {'user_id': 1, 'amount': round(rng.uniform(1, 200), 2), 'currency': 'USD',
+             'category_id': categories[index % len(categories)], 'description': f'Expense {index}',
+             'date': now - timedelta(hours=20 * index), 'created_at': now, 'updated_at': now}
+            for index in range(600)
+        ])
+        db.session.execute(Income.__table__.insert(), [
+            {'user_id': 1, 'amount': 1000.0, 'currency': 'USD', 'source': 'Salary',
+             'date': now - timedelta(days=7 * index), 'created_at': now, 'updated_at': now}
+            for index in range(60)
+        ])
+        db.session.execute(SavingsTransaction.__table__.insert(), [
+            {'user_id': 1, 'amount': 50.0, 'currency': 'USD', 'action': 'deposit', 'description': '',
+             'date': now - timedelta(days=7 * index), 'created_at': now, 'updated_at': now}
+            for index in range(60)
+        ])
+        db.session.add(Budget(user_id=1, category_id=categories[0], year=now.year, month=now.month, amount=400))
+        # Bulk-inserted expenses bypass the running category totals
+        rebuild_spend(1)
+        db.session.commit()
+        generate_statements(1, LAST_CLOSED.year, LAST_CLOSED.month)
+    return tokens
+
+
+class Recorder:
+    """Collects the statements the engines execute while a case runs, with the bind that ran each"""
+
+    def __init__(self, engines):
+        self.binds = {engine: bind for bind, engine in engines.items()}
+        self.statements = None
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.statements is not None:
+            self.statements.append((self.binds[conn.engine], statement, None if executemany else parameters))
+
+
+def _sqlite_plan(conn, statement, parameters):
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters or ()).all()
+    plan = [row[-1] for row in rows]
+    return plan, {match.group(1) for match in map(_SQLITE_SCAN.match, plan) if match}
+
+
+def _postgresql_plan(conn, statement, parameters):
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    document = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters or {}).scalar()
+    if isinstance(document, str):
+        document = json.loads(document)
+
+    plan, scans = [], set()
+
+    def walk(node, depth):
+        relation = node.get('Relation Name')
+        index = node.get('Index Name')
+        plan.append('  ' * depth + node['Node Type'] + (f' on {relation}' if relation else '')
+                    + (f' using {index}' if index else ''))
+        if node['Node Type'] == 'Seq Scan':
+            scans.add(relation)
+        for child in node.get('Plans', []):
+            walk(child, depth + 1)
+
+    walk(document[0]['Plan'], 0)
+    return plan, scans
+
+
+def _explain(engines, recorded):
+    """Return (statement snapshots, tables read with a full scan)"""
+    from models import db
+
+    tables = set(db.metadata.tables)
+    statements, scans = [], set()
+    for bind, statement, parameters in recorded:
+        entry = {'bind': bind, 'sql': normalize(statement)}
+        if statement.lstrip().upper().startswith(_EXPLAINED) and parameters is not None:
+            engine = engines[bind]
+            explain = _postgresql_plan if engine.dialect.name == 'postgresql' else _sqlite_plan
+            with engine.connect() as conn:
+                entry['plan'], statement_scans = explain(conn, statement, parameters)
+                conn.rollback()
+            # Scans of subqueries and constant rows are not table scans
+            scans |= statement_scans & tables
+        statements.append(entry)
+    return statements, sorted(scans)
+
+
+def record(app, tokens):
+    """Run every case and return {blueprint: {endpoint: snapshot}}"""
+    from sqlalchemy import event
+    from models import db
+
+    with app.app_context():
+        engines = {bind or 'primary': engine for bind, engine in db.engines.items()}
+    recorder = Recorder(engines)
+    for engine in engines.values():
+        event.listen(engine, 'before_cursor_execute', recorder)
+
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {tokens['token']}"}
+    snapshots = {}
+    for endpoint, method, path, body in CASES:
+        if body and body.get('refresh_token') == REFRESH_TOKEN:
+            body = {'refresh_token': tokens['refresh_token']}
+        case_headers = headers
+        if endpoint in FRESH_SESSION_CASES:
+            # The seeded user's session is gone after delete_account
+            token = client.post('/api/login', json=OTHER_USER).get_json()['token']
+            case_headers = {'Authorization': f'Bearer {token}'}
+        recorder.statements = []
+        response = client.open(path, method=method, json=body, headers=case_headers)
+        response.get_data()
+        recorded, recorder.statements = recorder.statements, None
+
+        counted = [item for item in recorded if item[1].lstrip().upper().startswith(_COUNTED)]
+        statements, scans = _explain(engines, counted)
+        blueprint = endpoint.split('.')[0] if '.' in endpoint else 'app'
+        snapshots.setdefault(blueprint, {})[endpoint] = {
+            'request': f'{method} {path}',
+            'status': response.status_code,
+            'statement_count': len(counted),
+            'full_scans': scans,
+            'statements': statements
+        }
+
+    for engine in engines.values():
+        event.remove(engine, 'before_cursor_execute', recorder)
+    return snapshots
+
+
+def missing_cases(app):
+    covered = {endpoint for endpoint, _, _, _ in CASES}
+    return sorted(
+        rule.endpoint for rule in app.url_map.iter_rules()
+        if rule.rule.startswith('/api/') and rule.endpoint not in covered
+    )
+
+
+def _replica_reads(snapshot):
+    return sum(entry['bind'].startswith('replica_') for entry in snapshot['statements'])
+
+
+def compare(snapshots, directory):
+    """Print differences from the stored snapshots; returns the number of regressions"""
+    regressions = 0
+    for blueprint, routes in sorted(snapshots.items()):
+        path = os.path.join(directory, f'{blueprint}.json')
+        stored = {}
+        if os.path.exists(path):
+            with open(path) as handle:
+                stored = json.load(handle)
+
+        for endpoint, current in routes.items():
+            before = stored.get(endpoint)
+            if before is None:
+                print(f"  ✗ {endpoint}: no snapshot (run with --update)")
+                regressions += 1
+                continue
+
+            if current['status'] != before['status']:
+                print(f"  ✗ {endpoint}: status {current['status']}, snapshot has {before['status']}")
+                regressions += 1
+
+            if _replica_reads(before) and not _replica_reads(current):
+                print(f"  ✗ {endpoint}: no longer reads from the replica")
+                regressions += 1
+
+            if current['statement_count'] > before['statement_count']:
+                print(f"  ✗ {endpoint}: {current['statement_count']} statements, snapshot has {before['statement_count']}")
+                regressions += 1
+            elif current['statement_count'] < before['statement_count']:
+                print(f"  - {endpoint}: {current['statement_count']} statements, down from {before['statement_count']}")
+
+            new_scans = sorted(set(current['full_scans']) - set(before['full_scans']))
+            if new_scans:
+                print(f"  ✗ {endpoint}: full scan of {', '.join(new_scans)} (was read through an index)")
+                regressions += 1
+            gone = sorted(set(before['full_scans']) - set(current['full_scans']))
+            if gone:
+                print(f"  - {endpoint}: no longer scans {', '.join(gone)}")
+
+            if current['statement_count'] == before['statement_count'] and not new_scans and not gone:
+                def emitted(snapshot):
+                    return [(entry['bind'], entry['sql']) for entry in snapshot['statements']]
+
+                if emitted(current) != emitted(before):
+                    print(f"  - {endpoint}: SQL changed with the same statement count")
+    return regressions
+
+
+def write(snapshots, directory):
+    os.makedirs(directory, exist_ok=True)
+    for blueprint, routes in sorted(snapshots.items()):
+        with open(os.path.join(directory, f'{blueprint}.json'), 'w') as handle:
+            json.dump(dict(sorted(routes.items())), handle, indent=2, sort_keys=True)
+            handle.write('\n')
+    print(f"  - wrote {len(snapshots)} snapshot files to {os.path.relpath(directory, BACKEND_DIR)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--update', action='store_true', help='rewrite the snapshots instead of comparing')
+    parser.add_argument('--database-url', help='PostgreSQL database to use (dropped and recreated)')
+    parser.add_argument('--shard-url', help='PostgreSQL database to use as the shard (dropped and recreated)')
+    args = parser.parse_args()
+    if bool(args.database_url) != bool(args.shard_url):
+        parser.error('--database-url and --shard-url go together')
+
+    if os.environ.get('PYTHONHASHSEED') != '0':
+        # Set iteration order (and with it statement order) depends on string hashing
+        os.execve(sys.executable, [sys.executable, *sys.argv], {**os.environ, 'PYTHONHASHSEED': '0'})
+
+    db_dir = None
+    if args.database_url is None:
+        db_dir = tempfile.mkdtemp(prefix='expensebook_snapshots_')
+        args.database_url = f"sqlite:///{os.path.join(db_dir, 'primary.db')}"
+        args.shard_url = f"sqlite:///{os.path.join(db_dir, 'shard.db')}"
+    os.environ['DATABASE_URL'] = args.database_url
+    # The replica is the primary itself: a replica with no lag, so reads match and only the routing is recorded
+    os.environ['DATABASE_REPLICA_URLS'] = args.database_url
+    os.environ['DATABASE_SHARD_URLS'] = args.shard_url
+    os.environ['FAST_BOOT'] = '0'
+    # One deny-list sync per run, on the first authenticated request
+    os.environ['TOKEN_DENYLIST_SYNC_SECONDS'] = '3600'
+
+    # Imported here so the environment above is in place before the config is read
+    from app import create_app
+    from migrations import upgrade
+    from models import db
+
+    if db_dir is None:
+        from utils.sharding import shard_engines, shard_metadata
+
+        probe = create_app()
+        with probe.app_context():
+            for engine in shard_engines(db.engines):
+                shard_metadata(db.metadata).drop_all(engine)
+            db.drop_all()
+            upgrade()
+
+    # Random choices in the app (idempotency key eviction) must not change statement counts
+    random.seed(0)
+    app = create_app()
+    tokens = _seed(app)
+    snapshots = record(app, tokens)
+
+    with app.app_context():
+        directory = os.path.join(SNAPSHOT_DIR, db.engine.dialect.name)
+
+    missing = missing_cases(app)
+    for endpoint in missing:
+        print(f"  ✗ {endpoint}: no case in CASES")
+
+    if args.update:
+        write(snapshots, directory)
+        regressions = len(missing)
+    else:
+        regressions = compare(snapshots, directory) + len(missing)
+        print(f"  - {sum(len(routes) for routes in snapshots.values())} routes checked, {regressions} regressions")
+
+    if db_dir is not None:
+        shutil.rmtree(db_dir)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Cold-start and worker-spawn timing for the API process.
+
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --app-dir /path/to/other/checkout/backend
+
+Cold start is a fresh interpreter importing the app module and calling
+create_app(), measured with and without FAST_BOOT. Worker spawn compares a
+worker that builds its own app (no preload) with one forked from a master
+that already built it (gunicorn preload_app); both are timed until the
+worker has served its first request.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+print(time.perf_counter() - start)
+"""
+
+WORKER_SPAWN = """
+import os, sys, time
+preload = sys.argv[1] == 'preload'
+if preload:
+    from app import create_app
+    app = create_app()
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    if not preload:
+        from app import create_app
+        app = create_app()
+    app.test_client().get('/api/health')
+    os._exit(0)
+os.waitpid(pid, 0)
+print(time.perf_counter() - start)
+"""
+
+
+def _run(app_dir, code, env, *args):
+    """Run a snippet in a fresh interpreter; returns (in-process seconds, wall seconds)"""
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', code, *args],
+        cwd=app_dir, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1]), time.perf_counter() - started
+
+
+def _summary(label, samples):
+    ms = [value * 1000 for value in samples]
+    print(f"  {label:<44} median {statistics.median(ms):8.1f} ms   min {min(ms):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--app-dir', default=BACKEND_DIR, help='backend directory to measure')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:////tmp/expensebook_startup.db')
+
+    # Make sure the schema exists so FAST_BOOT's version check passes
+    migrate_script = os.path.join(args.app_dir, 'database', 'migrate.py')
+    if os.path.exists(migrate_script):
+        subprocess.run([sys.executable, migrate_script], cwd=args.app_dir, env=env, check=True, capture_output=True)
+
+    print(f"Database: {env['DATABASE_URL']}  runs: {args.runs}")
+    for fast_boot in ('0', '1'):
+        mode_env = dict(env, FAST_BOOT=fast_boot)
+        cold = [_run(args.app_dir, COLD_START, mode_env) for _ in range(args.runs)]
+        print(f"FAST_BOOT={fast_boot}")
+        _summary('cold start: create_app()', [inner for inner, _ in cold])
+        _summary('cold start: process wall time', [wall for _, wall in cold])
+        for mode in ('no-preload', 'preload'):
+            spawn = [_run(args.app_dir, WORKER_SPAWN, mode_env, mode)[0] for _ in range(args.runs)]
+            _summary(f'worker spawn to first request ({mode})', spawn)
+
+
+if __name__ == '__main__':
+    main()
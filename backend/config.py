@@ -1,14 +1,72 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+
+def _env_flag(name, default='false'):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+# Fast-boot deployments get their settings from the environment, not a .env file
+if not _env_flag('FAST_BOOT'):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+def _replica_binds():
+    """Build replica binds from the comma-separated DATABASE_REPLICA_URLS"""
+    urls = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    return {f'replica_{index}': url for index, url in enumerate(urls)}
+
+
+def _shard_binds():
+    """Build shard binds from the comma-separated DATABASE_SHARD_URLS"""
+    urls = [url.strip() for url in os.getenv('DATABASE_SHARD_URLS', '').split(',') if url.strip()]
+    return {f'shard_{index}': url for index, url in enumerate(urls)}
+
+
+def _previous_shard_binds():
+    """Shard URLs from before the ongoing rebalance (DATABASE_PREVIOUS_SHARD_URLS), in their old order"""
+    urls = [url.strip() for url in os.getenv('DATABASE_PREVIOUS_SHARD_URLS', '').split(',') if url.strip()]
+    return {f'previous_{index}': url for index, url in enumerate(urls)}
+
 
 class Config:
     """Application configuration class"""
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-jwt-secret-key-change-in-production')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://localhost/expense_tracker')
+    SQLALCHEMY_BINDS = {**_replica_binds(), **_shard_binds(), **_previous_shard_binds()}
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    FAST_BOOT = _env_flag('FAST_BOOT')
+    READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+    REPORT_CACHE_SECONDS = int(os.getenv('REPORT_CACHE_SECONDS', '30'))
+    REPORT_CACHE_BYTES = int(os.getenv('REPORT_CACHE_BYTES', str(64 * 1024 * 1024)))
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+    # 0 answers each SSE request with the pending changes and closes it, so sync workers are never pinned
+    CHANGE_STREAM_SECONDS = float(os.getenv('CHANGE_STREAM_SECONDS', '0'))
+    CHANGE_STREAM_POLL_SECONDS = float(os.getenv('CHANGE_STREAM_POLL_SECONDS', '1'))
+    CHANGE_STREAM_RETRY_MS = int(os.getenv('CHANGE_STREAM_RETRY_MS', '3000'))
+    # Lifetime of the ?token= credential EventSource connects with; clients fetch a new one when it expires
+    CHANGE_STREAM_TOKEN_SECONDS = int(os.getenv('CHANGE_STREAM_TOKEN_SECONDS', '300'))
+    CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', '30'))
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '90'))
+    SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', '5'))
+    FX_CACHE_SECONDS = int(os.getenv('FX_CACHE_SECONDS', '3600'))
+    # Forecast models dropped by other workers are refitted within this many seconds
+    FORECAST_CACHE_SECONDS = int(os.getenv('FORECAST_CACHE_SECONDS', '300'))
+    # Category renames made by other workers show up within this many seconds
+    CATEGORY_CACHE_SECONDS = int(os.getenv('CATEGORY_CACHE_SECONDS', '60'))
+    # Maintenance jobs delete at most this many rows per statement and pause between batches
+    MAINTENANCE_BATCH_SIZE = int(os.getenv('MAINTENANCE_BATCH_SIZE', '1000'))
+    MAINTENANCE_BATCH_PAUSE_SECONDS = float(os.getenv('MAINTENANCE_BATCH_PAUSE_SECONDS', '0.05'))
+    MAINTENANCE_STALE_SECONDS = int(os.getenv('MAINTENANCE_STALE_SECONDS', '600'))
+    ACCESS_TOKEN_MINUTES = int(os.getenv('ACCESS_TOKEN_MINUTES', '15'))
+    REFRESH_TOKEN_DAYS = int(os.getenv('REFRESH_TOKEN_DAYS', '30'))
+    # Revocations made by other workers take effect within this many seconds
+    TOKEN_DENYLIST_SYNC_SECONDS = float(os.getenv('TOKEN_DENYLIST_SYNC_SECONDS', '5'))
     JWT_TOKEN_LOCATION = ['headers']
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
@@ -0,0 +1,84 @@
+"""
+Purge sync metadata that clients no longer need.
+
+Deletes, in batches so no single statement holds locks for long:
+    - tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS
+    - change_log entries older than CHANGE_LOG_RETENTION_DAYS
+    - expired idempotency keys
+    - deny-list entries of revoked tokens that have expired anyway
+
+Runs against the primary database and every shard. Schedule it daily, e.g.:
+    python database/compact.py
+    python database/compact.py --dry-run
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import current_app
+from sqlalchemy import delete, func, inspect, select
+
+from app import create_app
+from models import db, ChangeLogEntry, IdempotencyKey, RevokedToken, Tombstone
+from utils.sharding import shard_engines
+
+BATCH_SIZE = 5000
+
+
+def _engines():
+    return [db.engine, *shard_engines(db.engines)]
+
+
+def purge(engine, table, column, cutoff, dry_run=False):
+    """Delete rows of `table` whose `column` is before cutoff; returns the number of rows"""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(table.name):
+            return 0
+        if dry_run:
+            return conn.execute(select(func.count()).select_from(table).where(column < cutoff)).scalar()
+
+    key = next(iter(table.primary_key.columns))
+    purged = 0
+    while True:
+        with engine.begin() as conn:
+            batch = select(key).where(column < cutoff).limit(BATCH_SIZE)
+            deleted = conn.execute(delete(table).where(key.in_(batch))).rowcount
+        purged += deleted
+        if deleted < BATCH_SIZE:
+            return purged
+
+
+def compact(dry_run=False):
+    config = current_app.config
+    now = datetime.utcnow()
+    targets = (
+        (Tombstone.__table__, Tombstone.__table__.c.deleted_at,
+         now - timedelta(days=config['SYNC_TOMBSTONE_RETENTION_DAYS'])),
+        (ChangeLogEntry.__table__, ChangeLogEntry.__table__.c.created_at,
+         now - timedelta(days=config['CHANGE_LOG_RETENTION_DAYS'])),
+        (IdempotencyKey.__table__, IdempotencyKey.__table__.c.expires_at, now),
+        (RevokedToken.__table__, RevokedToken.__table__.c.expires_at, now),
+    )
+
+    for table, column, cutoff in targets:
+        total = sum(purge(engine, table, column, cutoff, dry_run) for engine in _engines())
+        verb = 'would purge' if dry_run else 'purged'
+        print(f"  - {table.name}: {verb} {total} rows older than {cutoff:%Y-%m-%d %H:%M}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Purge old tombstones, change log entries, idempotency keys and revoked tokens')
+    parser.add_argument('--dry-run', action='store_true', help='only count the rows that would be purged')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        compact(args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
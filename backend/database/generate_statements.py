@@ -0,0 +1,109 @@
+"""
+Generate the monthly statements of every user once a month has closed.
+
+Each user's CSV, HTML and PDF statement is rendered and stored once; users
+who already have them are skipped, so the run can be repeated or resumed
+after a failure. Users are split into chunks of --chunk-size and rendered
+by --workers processes (default: one per CPU; 1 runs in this process).
+Schedule it shortly after the start of each month, e.g. from cron:
+    30 2 1 * * python database/generate_statements.py
+
+Examples:
+    python database/generate_statements.py
+    python database/generate_statements.py --year 2024 --month 5 --workers 4
+    python database/generate_statements.py --user 42 --workers 1
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from functools import partial
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, User
+from utils.ledger_snapshots import current_period_start
+from utils.statements import generate_statements, is_closed
+
+_app = None
+
+
+def _init_worker():
+    global _app
+    _app = create_app()
+
+
+def run_chunk(year, month, user_ids):
+    """Generate statements for a chunk of users; returns (users, statements stored, failures)"""
+    stored, failures = 0, []
+    with _app.app_context():
+        for user_id in user_ids:
+            try:
+                stored += generate_statements(user_id, year, month)
+            except Exception as e:
+                db.session.rollback()
+                failures.append((user_id, str(e)))
+        db.session.remove()
+    return len(user_ids), stored, failures
+
+
+def previous_month():
+    start = current_period_start()
+    return (start.year - 1, 12) if start.month == 1 else (start.year, start.month - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render and store monthly statements for closed months')
+    parser.add_argument('--year', type=int, help='year of the statement month (default: last closed month)')
+    parser.add_argument('--month', type=int, help='statement month, 1-12 (default: last closed month)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--chunk-size', type=int, default=200, help='users handed to a worker at a time')
+    parser.add_argument('--user', type=int, action='append', help='only this user id (repeatable)')
+    args = parser.parse_args()
+
+    year, month = previous_month()
+    year, month = args.year or year, args.month or month
+    if not 1 <= month <= 12 or not is_closed(year, month):
+        parser.error(f'{year}-{month:02d} is not a closed month')
+
+    global _app
+    _app = create_app()
+    with _app.app_context():
+        user_ids = args.user or [user_id for (user_id,) in db.session.query(User.id).order_by(User.id).all()]
+        db.session.remove()
+
+    chunks = [user_ids[index:index + args.chunk_size] for index in range(0, len(user_ids), args.chunk_size)]
+    print(f"Generating statements for {year}-{month:02d}: {len(user_ids)} users, "
+          f"{len(chunks)} chunks, {args.workers} workers")
+
+    done = stored = 0
+    failures = []
+
+    def report(result):
+        nonlocal done, stored
+        users, count, failed = result
+        done, stored = done + users, stored + count
+        failures.extend(failed)
+        print(f"  - {done}/{len(user_ids)} users, {stored} statements stored")
+
+    if args.workers <= 1:
+        for chunk in chunks:
+            report(run_chunk(year, month, chunk))
+    else:
+        # Spawned workers open their own connections instead of sharing this process's pool
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(args.workers, initializer=_init_worker) as pool:
+            for result in pool.imap_unordered(partial(run_chunk, year, month), chunks):
+                report(result)
+
+    for user_id, error in failures:
+        print(f"  - user {user_id} failed: {error}")
+    print(f"Done: {stored} statements stored, {len(failures)} users failed")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
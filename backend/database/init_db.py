@@ -8,8 +8,11 @@ import os
 # Add parent directory to path to import app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# This script manages the schema itself, so the app factory must not just verify it
+os.environ['FAST_BOOT'] = '0'
+
 from app import create_app
-from models import db
+from migrations import upgrade
 
 def init_database():
     """Initialize the database and create all tables"""
@@ -20,14 +23,28 @@ def init_database():
         # db.drop_all()
         # print("Dropped all existing tables")
         
-        # Create all tables
-        db.create_all()
+        # Create all tables and record the schema version
+        upgrade()
         print("✓ Database tables created successfully!")
         print("\nTables created:")
         print("  - users")
+        print("  - categories")
         print("  - expenses")
         print("  - incomes")
         print("  - savings_transactions")
+        print("  - budgets")
+        print("  - category_spend")
+        print("  - budget_alerts")
+        print("  - balance_snapshots")
+        print("  - spending_models")
+        print("  - idempotency_keys")
+        print("  - change_cursors")
+        print("  - change_log")
+        print("  - tombstones")
+        print("  - fx_rates")
+        print("  - maintenance_jobs")
+        print("  - revoked_tokens")
+        print("  - statements")
 
 if __name__ == '__main__':
     init_database()
@@ -0,0 +1,122 @@
+"""
+Load daily exchange rates from CSV files into fx_rates.
+
+Rates are stored as units of each currency per one unit of a pivot currency;
+every file loaded into a database must use the same pivot. Two layouts are
+accepted:
+    long:  date,currency,rate          (one rate per line)
+    wide:  Date,USD,JPY,GBP,...        (ECB eurofxref-hist.csv; N/A cells are skipped)
+
+The pivot itself is stored with rate 1 on every date in the file. A file
+replaces the rates already loaded for its currencies within its date range, so
+corrected or overlapping files can simply be reloaded. The table is written on
+the primary database and every shard.
+
+Examples:
+    python database/load_fx_rates.py eurofxref-hist.csv --pivot EUR
+    python database/load_fx_rates.py rates-2024.csv rates-2025.csv --pivot USD --dry-run
+"""
+import argparse
+import csv
+import os
+import sys
+from datetime import date
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, delete, inspect
+
+from app import create_app
+from models import db, FxRate
+from utils.sharding import shard_engines
+
+BATCH_SIZE = 5000
+
+
+def _rate(value):
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rate if rate > 0 else None
+
+
+def read_rates(path, pivot):
+    """Return {(currency, date): rate} from a long or wide CSV file"""
+    rates = {}
+    with open(path, newline='') as handle:
+        reader = csv.reader(handle)
+        header = [column.strip() for column in next(reader)]
+        long_format = [column.lower() for column in header[:3]] == ['date', 'currency', 'rate']
+
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            day = date.fromisoformat(row[0].strip())
+            if long_format:
+                entries = [(row[1], row[2])]
+            else:
+                entries = zip(header[1:], row[1:])
+
+            for currency, value in entries:
+                currency, rate = currency.strip().upper(), _rate(value.strip())
+                if currency and rate is not None:
+                    rates[(currency, day)] = rate
+            rates[(pivot, day)] = 1.0
+    return rates
+
+
+def load(engine, rates):
+    """Replace each currency's rates over the loaded date range on one database; returns rows written"""
+    if not inspect(engine).has_table(FxRate.__tablename__):
+        return 0
+
+    table = FxRate.__table__
+    by_currency = {}
+    for currency, day in rates:
+        by_currency.setdefault(currency, []).append(day)
+
+    rows = [{'currency': currency, 'date': day, 'rate': rate} for (currency, day), rate in sorted(rates.items())]
+    with engine.begin() as conn:
+        for currency, days in by_currency.items():
+            conn.execute(delete(table).where(and_(
+                table.c.currency == currency,
+                table.c.date >= min(days),
+                table.c.date <= max(days)
+            )))
+        for start in range(0, len(rows), BATCH_SIZE):
+            conn.execute(table.insert(), rows[start:start + BATCH_SIZE])
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load daily exchange rates from CSV files into fx_rates')
+    parser.add_argument('files', nargs='+', help='CSV files in long (date,currency,rate) or wide (Date,USD,...) layout')
+    parser.add_argument('--pivot', required=True, help='currency the rates are quoted against, e.g. EUR for ECB files')
+    parser.add_argument('--dry-run', action='store_true', help='parse the files and report what would be loaded')
+    args = parser.parse_args()
+
+    pivot = args.pivot.strip().upper()
+    rates = {}
+    for path in args.files:
+        rates.update(read_rates(path, pivot))
+
+    if not rates:
+        sys.exit('No rates found in the given files')
+    currencies = sorted({currency for currency, _ in rates})
+    days = sorted({day for _, day in rates})
+    print(f"  - {len(rates)} rates for {len(currencies)} currencies, {days[0]} to {days[-1]}")
+
+    if args.dry_run:
+        return
+
+    app = create_app()
+    with app.app_context():
+        for engine in [db.engine, *shard_engines(db.engines)]:
+            written = load(engine, rates)
+            print(f"  - {engine.url.render_as_string(hide_password=True)}: {written} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Worker for account deletions and data purges queued through the API.
+
+Runs queued `maintenance_jobs` one at a time, deleting in batches of
+--batch-size rows with --pause seconds between batches (defaults come from
+MAINTENANCE_BATCH_SIZE and MAINTENANCE_BATCH_PAUSE_SECONDS). Lower the batch
+size or raise the pause to throttle it during peak hours. Run it as a long-lived
+process, or from cron with --once.
+
+Examples:
+    python database/maintenance.py
+    python database/maintenance.py --once --batch-size 200 --pause 0.5
+    python database/maintenance.py --status
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import current_app
+
+from app import create_app
+from models import db, MaintenanceJob
+from utils.maintenance import ACTIVE_STATUSES, claim_next, fail_job, run_job
+
+
+def work(batch_size, pause, once=False, poll=5.0):
+    config = current_app.config
+    batch_size = batch_size or config['MAINTENANCE_BATCH_SIZE']
+    pause = config['MAINTENANCE_BATCH_PAUSE_SECONDS'] if pause is None else pause
+
+    while True:
+        job = claim_next(config['MAINTENANCE_STALE_SECONDS'])
+        if job is None:
+            if once:
+                return
+            db.session.close()
+            time.sleep(poll)
+            continue
+
+        print(f"  - job {job.id}: {job.kind} for account {job.account_id}")
+        try:
+            run_job(job, batch_size, pause)
+        except Exception as e:
+            fail_job(job, e)
+            print(f"  - job {job.id} failed: {e}")
+        else:
+            print(f"  - job {job.id} done: {job.rows_deleted} rows deleted")
+
+
+def status():
+    jobs = MaintenanceJob.query.filter(MaintenanceJob.status.in_(ACTIVE_STATUSES)).order_by(
+        MaintenanceJob.created_at
+    ).all()
+    if not jobs:
+        print("  - no pending or running jobs")
+    for job in jobs:
+        progress = job.to_dict()['progress']
+        print(f"  - job {job.id}: {job.kind} for account {job.account_id}, {job.status}"
+              f"{f' ({progress}% of {job.total_rows} rows, {job.stage})' if progress is not None else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued account deletions and data purges in batches')
+    parser.add_argument('--once', action='store_true', help='exit when no job is waiting instead of polling')
+    parser.add_argument('--batch-size', type=int, help='rows deleted per statement (MAINTENANCE_BATCH_SIZE)')
+    parser.add_argument('--pause', type=float, help='seconds to sleep between batches (MAINTENANCE_BATCH_PAUSE_SECONDS)')
+    parser.add_argument('--poll', type=float, default=5.0, help='seconds between checks for new jobs')
+    parser.add_argument('--status', action='store_true', help='list pending and running jobs and exit')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.status:
+            status()
+        else:
+            work(args.batch_size, args.pause, args.once, args.poll)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Schema migration step
+Run this once per deploy, before starting workers with FAST_BOOT=1
+"""
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The migrate step owns the schema, so the app factory must not touch it
+os.environ['FAST_BOOT'] = '0'
+
+from flask import Flask
+from config import Config
+from models import db
+from migrations import SCHEMA_VERSION, upgrade
+
+
+def migrate():
+    """Create missing tables and apply pending migrations"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        applied = upgrade()
+
+    if applied:
+        print(f"✓ Applied migrations: {', '.join(str(version) for version in applied)}")
+    print(f"✓ Database schema is at version {SCHEMA_VERSION}")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,298 @@
+"""
+Time partitioning, balance snapshots and archival for the ledger tables.
+
+Commands:
+    convert   Turn expenses, incomes and savings_transactions into tables
+              partitioned by RANGE (date) (PostgreSQL only)
+    ensure    Create the partitions for the current and upcoming periods
+    snapshot  Freeze cumulative balances for every closed period
+    archive   Move closed partitions to another tablespace and, optionally,
+              table access method
+
+convert, ensure and archive run on the primary database and on every shard.
+Rows dated outside the created partitions land in a DEFAULT partition; when
+`ensure` later creates the partition for their period it moves them into it.
+Archiving only relocates partitions: PostgreSQL does not compress them, so
+any saving comes from the storage behind the tablespace (e.g. a volume with
+filesystem compression) or from a compressing access method such as
+Citus columnar.
+
+Examples:
+    python database/partitions.py convert --granularity month
+    python database/partitions.py ensure --ahead 3
+    python database/partitions.py snapshot
+    python database/partitions.py archive --older-than 12 --tablespace archive
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import datetime
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import create_app
+from models import db, User
+from utils.ledger_snapshots import close_periods, current_period_start, next_boundary
+from utils.sharding import shard_engines, user_scope
+
+PARTITIONED_TABLES = ('expenses', 'incomes', 'savings_transactions')
+PARTITION_NAME = re.compile(r'_p(\d{4})(?:_(\d{2}))?$')
+
+
+def _period_start(value, granularity):
+    if granularity == 'year':
+        return datetime(value.year, 1, 1)
+    return datetime(value.year, value.month, 1)
+
+
+def _partition_name(table, start, granularity):
+    suffix = f'{start.year}' if granularity == 'year' else f'{start.year}_{start.month:02d}'
+    return f'{table}_p{suffix}'
+
+
+def _partition_end(name):
+    """Parse the exclusive period end encoded in a partition name, or None for the default partition"""
+    match = PARTITION_NAME.search(name)
+    if not match:
+        return None
+    granularity = 'month' if match.group(2) else 'year'
+    return next_boundary(datetime(int(match.group(1)), int(match.group(2) or 1), 1), granularity)
+
+
+def _engines():
+    """The primary and every shard, each of which holds ledger tables"""
+    engines = [db.engine, *shard_engines(db.engines)]
+    if any(engine.dialect.name != 'postgresql' for engine in engines):
+        sys.exit('Partitioning is only supported on PostgreSQL')
+    return engines
+
+
+def _is_partitioned(conn, table):
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+    ), {'table': table}).scalar()
+
+
+def _exists(conn, name):
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+
+
+def _partitions(conn, table):
+    """Return [(partition name, tablespace or None)] attached to a partitioned table"""
+    return conn.execute(text(
+        "SELECT c.relname, ts.spcname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "LEFT JOIN pg_tablespace ts ON ts.oid = c.reltablespace "
+        "WHERE p.relname = :table ORDER BY c.relname"
+    ), {'table': table}).all()
+
+
+def _create_partition(conn, table, start, granularity):
+    end = next_boundary(start, granularity)
+    name = _partition_name(table, start, granularity)
+    if _exists(conn, name):
+        return name
+
+    # A new range cannot be attached while the default partition holds rows in it:
+    # detach the default, move those rows into the new partition and reattach it
+    default = f'{table}_pdefault'
+    in_range = {'start': start, 'end': end}
+    stray = _exists(conn, default) and conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE date >= :start AND date < :end)"), in_range
+    ).scalar()
+    if stray:
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+
+    conn.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+    if stray:
+        conn.execute(text(
+            f"INSERT INTO {name} SELECT * FROM {default} WHERE date >= :start AND date < :end"
+        ), in_range)
+        conn.execute(text(f"DELETE FROM {default} WHERE date >= :start AND date < :end"), in_range)
+        conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    return name
+
+
+def _create_partitions(conn, table, first, last, granularity):
+    start = _period_start(first, granularity)
+    while start <= last:
+        _create_partition(conn, table, start, granularity)
+        start = next_boundary(start, granularity)
+
+
+def _upcoming_start(ahead, granularity):
+    """Start of the period `ahead` periods after the current one"""
+    start = _period_start(datetime.utcnow(), granularity)
+    for _ in range(ahead):
+        start = next_boundary(start, granularity)
+    return start
+
+
+def convert(granularity, ahead):
+    """Rebuild each ledger table as a range-partitioned table and copy its rows across"""
+    for engine in _engines():
+        with engine.begin() as conn:
+            for table in PARTITIONED_TABLES:
+                if _is_partitioned(conn, table):
+                    print(f"  - {engine.url.database}.{table}: already partitioned")
+                    continue
+                _convert_table(conn, table, granularity, ahead)
+                print(f"  - {engine.url.database}.{table}: partitioned by {granularity}")
+
+
+def _legacy_indexes(conn, table):
+    """(name, CREATE INDEX statement) of the table's indexes, except those backing constraints"""
+    return conn.execute(text(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :table AND indexname NOT IN ("
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass)) ORDER BY indexname"
+    ), {'table': table}).all()
+
+
+def _legacy_foreign_keys(conn, table):
+    """(name, definition) of the table's foreign keys"""
+    return conn.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f' ORDER BY conname"
+    ), {'table': table}).all()
+
+
+def _parent_ddl(table, indexes, foreign_keys):
+    """Statements giving the partitioned parent the legacy table's keys, foreign keys and indexes"""
+    # The partition key must be part of every unique constraint
+    statements = [f"ALTER TABLE {table} ADD PRIMARY KEY (id, date)"]
+    # Constraint names are per table, so the legacy table's names can be reused as they are
+    statements += [f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}" for name, definition in foreign_keys]
+    # Read before the rename, so each definition already names the new parent
+    statements += [definition for _, definition in indexes]
+    if f'ix_{table}_user_id_date' not in {name for name, _ in indexes}:
+        statements.append(f"CREATE INDEX ix_{table}_user_id_date ON {table} (user_id, date)")
+    return statements
+
+
+def _convert_table(conn, table, granularity, ahead):
+    legacy = f'{table}_unpartitioned'
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': table}).scalar()
+    indexes, foreign_keys = _legacy_indexes(conn, table), _legacy_foreign_keys(conn, table)
+
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    # Free the index names (including the primary key) for the new parent table
+    for (index,) in conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table"
+    ), {'table': legacy}).all():
+        conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_unpartitioned"))
+
+    conn.execute(text(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (date)"
+    ))
+    for statement in _parent_ddl(table, indexes, foreign_keys):
+        conn.execute(text(statement))
+
+    first = conn.execute(text(f"SELECT min(date) FROM {legacy}")).scalar() or datetime.utcnow()
+    last = conn.execute(text(f"SELECT max(date) FROM {legacy}")).scalar() or datetime.utcnow()
+    _create_partitions(conn, table, first, max(last, _upcoming_start(ahead, granularity)), granularity)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_pdefault PARTITION OF {table} DEFAULT"))
+
+    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+
+
+def ensure(granularity, ahead):
+    """Create partitions for the current period and the next `ahead` periods"""
+    upcoming = _upcoming_start(ahead, granularity)
+    for engine in _engines():
+        with engine.begin() as conn:
+            for table in PARTITIONED_TABLES:
+                if not _is_partitioned(conn, table):
+                    print(f"  - {engine.url.database}.{table}: not partitioned, run 'convert' first")
+                    continue
+                _create_partitions(conn, table, datetime.utcnow(), upcoming, granularity)
+                print(f"  - {engine.url.database}.{table}: partitions ready through {upcoming:%Y-%m}")
+
+
+def snapshot(granularity):
+    """Freeze per-user cumulative balances for every closed period"""
+    created = 0
+    for (user_id,) in db.session.query(User.id).order_by(User.id).all():
+        with user_scope(db.session, user_id):
+            created += close_periods(user_id, granularity)
+            db.session.commit()
+    print(f"  - {created} balance snapshots created")
+
+
+def archive(older_than, tablespace, access_method):
+    """Move closed partitions older than `older_than` months to another tablespace (and access method)"""
+    engines = _engines()
+
+    # Carryover must read snapshots, not the partitions being archived
+    snapshot('month')
+
+    open_period = current_period_start()
+    months = open_period.year * 12 + open_period.month - 1 - older_than
+    cutoff = datetime(months // 12, months % 12 + 1, 1)
+
+    for engine in engines:
+        with engine.begin() as conn:
+            for table in PARTITIONED_TABLES:
+                for name, current_tablespace in _partitions(conn, table):
+                    end = _partition_end(name)
+                    if end is None or end > cutoff or current_tablespace == tablespace:
+                        continue
+
+                    # Partitions stay attached, so archived rows remain queryable through the parent
+                    conn.execute(text(f"ALTER TABLE {name} SET TABLESPACE {tablespace}"))
+                    if access_method:
+                        conn.execute(text(f"ALTER TABLE {name} SET ACCESS METHOD {access_method}"))
+                    print(f"  - {engine.url.database}: archived {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ledger table partitioning and archival')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help='partition the ledger tables by date')
+    convert_parser.add_argument('--granularity', choices=('month', 'year'), default='month')
+    convert_parser.add_argument('--ahead', type=int, default=3)
+
+    ensure_parser = subparsers.add_parser('ensure', help='create upcoming partitions')
+    ensure_parser.add_argument('--granularity', choices=('month', 'year'), default='month')
+    ensure_parser.add_argument('--ahead', type=int, default=3)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help='snapshot balances of closed periods')
+    snapshot_parser.add_argument('--granularity', choices=('month', 'year'), default='month')
+
+    archive_parser = subparsers.add_parser('archive', help='move cold partitions to another tablespace')
+    archive_parser.add_argument('--older-than', type=int, default=12, help='age in months')
+    archive_parser.add_argument('--tablespace', required=True,
+                                help='target tablespace; rows are moved as-is, not compressed by PostgreSQL')
+    archive_parser.add_argument('--access-method',
+                                help='optional table access method to rewrite into, e.g. columnar (compresses)')
+
+    args = parser.parse_args()
+    app = create_app()
+
+    with app.app_context():
+        if args.command == 'convert':
+            convert(args.granularity, args.ahead)
+        elif args.command == 'ensure':
+            ensure(args.granularity, args.ahead)
+        elif args.command == 'snapshot':
+            snapshot(args.granularity)
+        elif args.command == 'archive':
+            archive(args.older_than, args.tablespace, args.access_method)
+
+
+if __name__ == '__main__':
+    main()
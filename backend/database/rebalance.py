@@ -0,0 +1,232 @@
+"""
+Move users' rows between shards after the shard list changes.
+
+Every user whose shard differs between the previous and the current hash ring
+has the rows of each per-user table copied (parents before children) to the new
+shard, the move recorded in `users.shard`, and the rows then deleted from the
+old shard. Run the app with DATABASE_PREVIOUS_SHARD_URLS set to the old list
+meanwhile, so users keep being routed to their old shard until their move is
+recorded. Each shard numbers its rows on its own, so ids a user's rows had on
+the old shard may belong to another user's rows on the new one: such rows get
+new ids from the target's sequence and the foreign keys pointing at them are
+rewritten. Clients then learn the new ids by syncing: the rows' updated_at is
+bumped, the old ids are tombstoned and the user's change log is dropped, so
+change-feed clients are told to resync. Pause writes for the users being
+moved while this runs; an interrupted run can simply be repeated: the target
+copy is replaced until the move is recorded, and users already moved are
+skipped.
+
+Examples:
+    # Split the unsharded primary database across DATABASE_SHARD_URLS
+    python database/rebalance.py --previous-shards "$DATABASE_URL"
+    # After appending a URL to DATABASE_SHARD_URLS
+    python database/rebalance.py --previous-shards "postgresql://db-a/expenses,postgresql://db-b/expenses"
+    python database/rebalance.py --previous-shards "..." --user 42 --dry-run
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Add parent directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select, text
+
+from app import create_app
+from models import db, User
+from utils.sharding import is_sharded, ring_for, shard_metadata, shard_names
+from utils.sync import SYNC_MODELS
+
+# Ids per IN list when looking for ids the target shard already uses
+ID_CHECK_CHUNK = 1000
+
+
+def _url(engine):
+    return engine.url.render_as_string(hide_password=False)
+
+
+def _engines_by_url(urls):
+    """Reuse the app's engines where a URL is already configured"""
+    known = {_url(engine): engine for engine in db.engines.values()}
+    return {url: known.get(url) or create_engine(url) for url in urls}
+
+
+def _taken_ids(conn, table, user_id, ids):
+    """Ids among `ids` that another user's rows on the target already have"""
+    taken = set()
+    for index in range(0, len(ids), ID_CHECK_CHUNK):
+        taken.update(conn.execute(select(table.c.id).where(
+            table.c.id.in_(ids[index:index + ID_CHECK_CHUNK]),
+            table.c.user_id != user_id
+        )).scalars())
+    return sorted(taken)
+
+
+def _allocate_ids(conn, table, count, floor):
+    """`count` unused ids on the target, all above `floor`"""
+    if conn.dialect.name == 'postgresql':
+        sequence = f"pg_get_serial_sequence('{table.name}', 'id')"
+        conn.execute(text(
+            f'SELECT setval({sequence}, GREATEST(nextval({sequence}), '
+            f'(SELECT COALESCE(MAX(id), 0) FROM {table.name}), :floor))'
+        ), {'floor': floor})
+        return list(conn.execute(
+            text(f'SELECT nextval({sequence}) FROM generate_series(1, :count)'), {'count': count}
+        ).scalars())
+    start = max(conn.execute(select(func.max(table.c.id))).scalar() or 0, floor) + 1
+    return list(range(start, start + count))
+
+
+def _advance_sequence(conn, table):
+    """Move a PostgreSQL id sequence past the copied ids; SQLite allocates MAX(id) + 1 by itself"""
+    if conn.dialect.name != 'postgresql':
+        return
+    sequence = f"pg_get_serial_sequence('{table.name}', 'id')"
+    conn.execute(text(
+        f'SELECT setval({sequence}, GREATEST(nextval({sequence}), (SELECT MAX(id) FROM {table.name})))'
+    ))
+
+
+def _renumber(conn, table, user_id, rows, new_ids):
+    """Give rows whose id is taken on the target new ids; returns {old id: new id} and marks the rows changed"""
+    ids = [row['id'] for row in rows]
+    taken = _taken_ids(conn, table, user_id, ids)
+    if not taken:
+        return {}
+    mapping = dict(zip(taken, _allocate_ids(conn, table, len(taken), max(ids))))
+    for row in rows:
+        if row['id'] in mapping:
+            row['id'] = mapping[row['id']]
+            row['_changed'] = True
+    new_ids[table.name] = mapping
+    return mapping
+
+
+def _repoint(table, rows, new_ids):
+    """Rewrite foreign keys to parents that were given new ids"""
+    for fk in table.foreign_keys:
+        mapping = new_ids.get(fk.column.table.name)
+        if not mapping:
+            continue
+        for row in rows:
+            if row[fk.parent.name] in mapping:
+                row[fk.parent.name] = mapping[row[fk.parent.name]]
+                row['_changed'] = True
+
+
+def copy_user(user_id, source, target, tables):
+    """Copy a user's rows from source to target, renumbering ids taken there; returns rows copied"""
+    with source.connect() as src:
+        rows = {
+            table.name: [
+                dict(row) for row in src.execute(
+                    select(table).where(table.c.user_id == user_id).order_by(*table.primary_key.columns)
+                ).mappings()
+            ]
+            for table in tables
+        }
+
+    copied = sum(len(table_rows) for table_rows in rows.values())
+    if not copied:
+        # Nothing left on the source: the user was already moved
+        return 0
+
+    now = datetime.utcnow()
+    by_name = {table.name: table for table in tables}
+    new_ids = {}
+    with target.begin() as dst:
+        # Drop whatever an interrupted earlier run left on the target
+        for table in reversed(tables):
+            dst.execute(table.delete().where(table.c.user_id == user_id))
+
+        for table in tables:
+            table_rows = rows[table.name]
+            if not table_rows:
+                continue
+            _repoint(table, table_rows, new_ids)
+            if 'id' in table.c:
+                _renumber(dst, table, user_id, table_rows, new_ids)
+            for row in table_rows:
+                # Changed rows are sent to clients again by the next sync
+                if row.pop('_changed', False) and 'updated_at' in table.c:
+                    row['updated_at'] = now
+            dst.execute(table.insert(), table_rows)
+            if 'id' in table.c:
+                _advance_sequence(dst, table)
+
+        renamed = [
+            {'user_id': user_id, 'entity': entity, 'entity_id': old_id, 'deleted_at': now}
+            for model, entity in SYNC_MODELS.values()
+            for old_id in new_ids.get(model.__tablename__, {})
+        ]
+        if renamed:
+            # Clients drop the old ids; change-feed entries name them too, so those clients must resync
+            dst.execute(by_name['tombstones'].insert(), renamed)
+            dst.execute(by_name['change_log'].delete().where(by_name['change_log'].c.user_id == user_id))
+
+    return copied
+
+
+def delete_user(user_id, engine, tables):
+    """Delete a user's rows from a shard they no longer live on"""
+    with engine.begin() as conn:
+        for table in reversed(tables):
+            conn.execute(table.delete().where(table.c.user_id == user_id))
+
+
+def rebalance(previous_urls, user_ids=None, dry_run=False):
+    current = {name: _url(db.engines[name]) for name in db.engines if name and name.startswith('shard_')}
+    if not current:
+        sys.exit('No shards configured; set DATABASE_SHARD_URLS')
+
+    previous = dict(zip(shard_names(len(previous_urls)), previous_urls))
+    engines = _engines_by_url(set(previous.values()) | set(current.values()))
+    previous_ring, current_ring = ring_for(previous), ring_for(current)
+    tables = [table for table in shard_metadata(db.metadata).sorted_tables if is_sharded(table)]
+
+    query = db.session.query(User.id, User.shard).order_by(User.id)
+    if user_ids:
+        query = query.filter(User.id.in_(user_ids))
+
+    users = rows = 0
+    for user_id, moved_to in query.all():
+        source_name, target_name = previous_ring.get(user_id), current_ring.get(user_id)
+        source, target = previous[source_name], current[target_name]
+        if source == target:
+            continue
+
+        users += 1
+        if dry_run:
+            print(f"  - user {user_id}: {source_name} -> {target_name}")
+            continue
+        if moved_to != target_name:
+            rows += copy_user(user_id, engines[source], engines[target], tables)
+            # Requests for the user go to the target from here on
+            db.session.query(User).filter_by(id=user_id).update({'shard': target_name})
+            db.session.commit()
+        delete_user(user_id, engines[source], tables)
+
+    if dry_run:
+        print(f"  - {users} users would move")
+        return
+    print(f"  - moved {users} users ({rows} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move users between shards after DATABASE_SHARD_URLS changed')
+    parser.add_argument('--previous-shards', required=True,
+                        help='comma-separated shard URLs before the change, in their old order')
+    parser.add_argument('--user', type=int, action='append', help='only rebalance these user ids')
+    parser.add_argument('--dry-run', action='store_true', help='list the users that would move')
+    args = parser.parse_args()
+
+    previous_urls = [url.strip() for url in args.previous_shards.split(',') if url.strip()]
+    app = create_app()
+
+    with app.app_context():
+        rebalance(previous_urls, args.user, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
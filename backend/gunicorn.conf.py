@@ -0,0 +1,26 @@
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5002')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+
+# Long-lived change streams (CHANGE_STREAM_SECONDS > 0) need an async worker such as gevent
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# Load the app once in the master and fork workers from it
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Give each worker its own connection pool instead of the master's sockets"""
+    if worker_class == 'gevent':
+        # Let psycopg2 yield to other greenlets while it waits on the database
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    from wsgi import app
+    from models import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,291 @@
+"""
+Explicit, versioned schema management.
+
+`python database/migrate.py` (or `upgrade()`) creates missing tables and runs
+pending migrations. With FAST_BOOT enabled, workers skip schema management and
+only compare the recorded version with SCHEMA_VERSION. Per-user tables are
+created and altered on every configured shard as well as on the primary.
+Concurrent upgrades (two deploys, or several workers booting without
+FAST_BOOT) take turns on a PostgreSQL advisory lock.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import func, insert, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Category, SchemaVersion, User
+from utils.budget_tracker import rebuild_spend
+from utils.categories import DEFAULT_CATEGORIES
+from utils.sharding import shard_engines, shard_for, shard_metadata, user_scope
+
+
+def _shard_engines():
+    return shard_engines(db.engines)
+
+
+def _connections_with(table):
+    """Yield a transactional connection to the primary and every shard that holds the table"""
+    for engine in [db.engine, *_shard_engines()]:
+        with engine.begin() as conn:
+            if inspect(conn).has_table(table):
+                yield conn
+
+
+def add_column_if_missing(table, column, ddl):
+    """Add a column to an existing table (on the primary and every shard holding it) unless create_all already created it"""
+    for conn in _connections_with(table):
+        if column not in {col['name'] for col in inspect(conn).get_columns(table)}:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def execute_on_table(table, *statements):
+    """Run SQL statements wherever the table exists"""
+    for conn in _connections_with(table):
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def _create_tables():
+    db.create_all()
+    for engine in _shard_engines():
+        shard_metadata(db.metadata).create_all(engine)
+
+
+def _add_updated_at():
+    for table in ('expenses', 'incomes', 'savings_transactions'):
+        add_column_if_missing(table, 'updated_at', 'TIMESTAMP')
+        execute_on_table(
+            table,
+            f'UPDATE {table} SET updated_at = COALESCE(created_at, date) WHERE updated_at IS NULL',
+            f'CREATE INDEX IF NOT EXISTS ix_{table}_user_id_updated_at ON {table} (user_id, updated_at)'
+        )
+
+
+def _add_currencies():
+    for table in ('expenses', 'incomes', 'savings_transactions'):
+        add_column_if_missing(table, 'currency', "VARCHAR(3) NOT NULL DEFAULT 'USD'")
+    add_column_if_missing('users', 'base_currency', "VARCHAR(3) NOT NULL DEFAULT 'USD'")
+
+
+def _cascade_user_deletes_on(tables):
+    # SQLite cannot alter constraints; its tables pick up ON DELETE CASCADE when recreated
+    for table in tables:
+        for conn in _connections_with(table):
+            if conn.dialect.name != 'postgresql':
+                continue
+            for fk in inspect(conn).get_foreign_keys(table):
+                if fk['referred_table'] != 'users' or (fk.get('options') or {}).get('ondelete') == 'CASCADE':
+                    continue
+                conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT {fk["name"]}'))
+                conn.execute(text(
+                    f'ALTER TABLE {table} ADD CONSTRAINT {fk["name"]} '
+                    'FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE'
+                ))
+
+
+def _cascade_user_deletes():
+    _cascade_user_deletes_on(('expenses', 'incomes', 'savings_transactions'))
+
+
+def _add_categories():
+    add_column_if_missing('expenses', 'category_id', 'INTEGER REFERENCES categories (id)')
+    now = datetime.utcnow()
+
+    # Every existing user gets the built-in categories on the database holding their rows
+    users_by_shard = {}
+    for (user_id,) in db.session.query(User.id).order_by(User.id):
+        users_by_shard.setdefault(shard_for(user_id), []).append(user_id)
+    categories = Category.__table__
+    for shard, user_ids in users_by_shard.items():
+        with (db.engines[shard] if shard else db.engine).begin() as conn:
+            # Skip what an interrupted earlier run already seeded
+            seeded = set(conn.execute(select(categories.c.user_id, categories.c.name)).all())
+            rows = [
+                {'user_id': user_id, 'name': name, 'created_at': now}
+                for user_id in user_ids for name in DEFAULT_CATEGORIES if (user_id, name) not in seeded
+            ]
+            if rows:
+                conn.execute(insert(categories), rows)
+
+    # Names in use that are not built in become custom categories, then expenses point at them by id
+    for conn in _connections_with('expenses'):
+        if 'category' not in {col['name'] for col in inspect(conn).get_columns('expenses')}:
+            continue
+        used = ['SELECT user_id, category AS name FROM expenses']
+        # Budgets created after this migration (e.g. on a database upgraded from the first release) have no names
+        if 'category' in {col['name'] for col in inspect(conn).get_columns('budgets')}:
+            used.append('SELECT user_id, category FROM budgets')
+        conn.execute(text(
+            'INSERT INTO categories (user_id, name, created_at) '
+            f'SELECT used.user_id, used.name, :now FROM ({" UNION ".join(used)}) used WHERE NOT EXISTS ('
+            'SELECT 1 FROM categories WHERE categories.user_id = used.user_id AND categories.name = used.name)'
+        ), {'now': now})
+        conn.execute(text(
+            'UPDATE expenses SET category_id = (SELECT categories.id FROM categories '
+            'WHERE categories.user_id = expenses.user_id AND categories.name = expenses.category)'
+        ))
+        conn.execute(text('ALTER TABLE expenses DROP COLUMN category'))
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text('ALTER TABLE expenses ALTER COLUMN category_id SET NOT NULL'))
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_expenses_user_id_category_id ON expenses (user_id, category_id)'
+        ))
+
+
+def _add_versions():
+    for table in ('expenses', 'incomes'):
+        add_column_if_missing(table, 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+
+def _key_budgets_by_category_id():
+    # Running totals and spending models are derived: drop them and let them rebuild under the new key
+    for table in ('category_spend', 'spending_models'):
+        execute_on_table(table, f'DROP TABLE {table}')
+
+    for conn in _connections_with('budgets'):
+        if 'category' not in {col['name'] for col in inspect(conn).get_columns('budgets')}:
+            continue
+        category_id = (
+            'SELECT categories.id FROM categories '
+            'WHERE categories.user_id = budgets.user_id AND categories.name = budgets.category'
+        )
+        # Budgets on a category name the user no longer has keep it as a category of their own
+        conn.execute(text(
+            'INSERT INTO categories (user_id, name, created_at) '
+            'SELECT DISTINCT user_id, category, CURRENT_TIMESTAMP FROM budgets '
+            f'WHERE NOT EXISTS ({category_id})'
+        ))
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text('ALTER TABLE budgets ADD COLUMN category_id INTEGER REFERENCES categories (id)'))
+            conn.execute(text(f'UPDATE budgets SET category_id = ({category_id})'))
+            conn.execute(text('ALTER TABLE budgets DROP CONSTRAINT uq_budget_user_category_month'))
+            conn.execute(text('ALTER TABLE budgets DROP COLUMN category'))
+            conn.execute(text('ALTER TABLE budgets ALTER COLUMN category_id SET NOT NULL'))
+            conn.execute(text(
+                'ALTER TABLE budgets ADD CONSTRAINT uq_budget_user_category_month '
+                'UNIQUE (user_id, category_id, year, month)'
+            ))
+            continue
+
+        # SQLite cannot drop a column that is part of a UNIQUE constraint: rebuild the table, keeping ids
+        conn.execute(text(
+            'CREATE TABLE budgets_new (id INTEGER NOT NULL PRIMARY KEY, '
+            'user_id INTEGER NOT NULL REFERENCES users (id), '
+            'category_id INTEGER NOT NULL REFERENCES categories (id), '
+            'year INTEGER NOT NULL, month INTEGER NOT NULL, amount FLOAT NOT NULL, '
+            'alert_threshold FLOAT NOT NULL, created_at DATETIME, '
+            'CONSTRAINT uq_budget_user_category_month UNIQUE (user_id, category_id, year, month))'
+        ))
+        conn.execute(text(
+            'INSERT INTO budgets_new (id, user_id, category_id, year, month, amount, alert_threshold, created_at) '
+            f'SELECT id, user_id, ({category_id}), year, month, amount, alert_threshold, created_at FROM budgets'
+        ))
+        conn.execute(text('DROP TABLE budgets'))
+        conn.execute(text('ALTER TABLE budgets_new RENAME TO budgets'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_budgets_user_id ON budgets (user_id)'))
+
+    _create_tables()
+
+
+def _backfill_category_spend():
+    # Budget status reads category_spend as complete, so category-months never written since tracking began need rows
+    for (user_id,) in db.session.query(User.id).order_by(User.id).all():
+        with user_scope(db.session, user_id):
+            rebuild_spend(user_id)
+            db.session.commit()
+
+
+def _disable_deleted_accounts():
+    add_column_if_missing('users', 'deleted_at', 'TIMESTAMP')
+    _cascade_user_deletes_on(('budgets', 'category_spend', 'budget_alerts', 'balance_snapshots', 'spending_models'))
+
+
+def _add_user_shard():
+    add_column_if_missing('users', 'shard', 'VARCHAR(32)')
+
+
+# (version, description, callable) in apply order; append new entries only
+MIGRATIONS = [
+    (1, 'create tables', _create_tables),
+    (2, 'add spending_models', _create_tables),
+    (3, 'add idempotency_keys', _create_tables),
+    (4, 'add change_cursors and change_log', _create_tables),
+    (5, 'add updated_at to ledger tables and tombstones', _add_updated_at),
+    (6, 'add currencies and fx_rates', _add_currencies),
+    (7, 'add maintenance_jobs and cascade user deletes', _cascade_user_deletes),
+    (8, 'add revoked_tokens', _create_tables),
+    (9, 'add categories and expenses.category_id', _add_categories),
+    (10, 'add statements', _create_tables),
+    (11, 'add version to expenses and incomes', _add_versions),
+    (12, 'key budgets, category_spend and spending_models by category id', _key_budgets_by_category_id),
+    (13, 'backfill category_spend for every category-month', _backfill_category_spend),
+    (14, 'add users.deleted_at and cascade user deletes to budget tables', _disable_deleted_accounts),
+    (15, 'add users.shard', _add_user_shard),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary application-wide key for pg_advisory_lock, shared by every process that migrates
+MIGRATION_LOCK_KEY = 4_210_771_029
+
+
+def current_version():
+    """Return the applied schema version, or 0 when the database is unversioned"""
+    if not inspect(db.engine).has_table(SchemaVersion.__tablename__):
+        return 0
+    return db.session.query(func.max(SchemaVersion.version)).scalar() or 0
+
+
+@contextmanager
+def _migration_lock():
+    """Hold an exclusive, session-level advisory lock on the primary while migrating"""
+    # SQLite is a single local file used for development; its writers already serialize on the file
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as conn:
+        conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        # The lock outlives this transaction; do not sit idle inside it while migrating
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+            conn.commit()
+
+
+def upgrade():
+    """Create missing tables and apply pending migrations; returns the versions applied"""
+    with _migration_lock():
+        # New tables are always created first, so migrations only alter existing ones
+        _create_tables()
+
+        applied = []
+        # Read under the lock: whoever held it before may have applied everything already
+        version = current_version()
+        for number, description, migrate in MIGRATIONS:
+            if number <= version:
+                continue
+            migrate()
+            db.session.add(SchemaVersion(version=number, description=description))
+            db.session.commit()
+            applied.append(number)
+        return applied
+
+
+def check_schema_version():
+    """Fail fast when the database schema does not match this build"""
+    try:
+        version = db.session.query(func.max(SchemaVersion.version)).scalar() or 0
+    except SQLAlchemyError:
+        db.session.rollback()
+        version = 0
+    finally:
+        db.session.close()
+
+    if version != SCHEMA_VERSION:
+        raise RuntimeError(
+            f'Database schema is at version {version}, this build expects {SCHEMA_VERSION}. '
+            'Run `python database/migrate.py` before starting workers.'
+        )
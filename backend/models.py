@@ -1,8 +1,12 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+DEFAULT_CURRENCY = 'USD'
 
 class User(db.Model):
     """User model for authentication and user management"""
@@ -12,12 +16,18 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     name = db.Column(db.String(100), nullable=False)
+    base_currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)  # ISO 4217 code analytics report in
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime)  # set when account deletion is requested; the user can no longer sign in
+    shard = db.Column(db.String(32))  # shard bind database/rebalance.py last moved the user's rows to
     
-    # Relationships
-    expenses = db.relationship('Expense', backref='user', lazy=True, cascade='all, delete-orphan')
-    incomes = db.relationship('Income', backref='user', lazy=True, cascade='all, delete-orphan')
-    savings_transactions = db.relationship('SavingsTransaction', backref='user', lazy=True, cascade='all, delete-orphan')
+    # Relationships; the database deletes the rows (ON DELETE CASCADE) instead of the ORM loading them first.
+    # Large accounts are deleted in batches by a maintenance job (utils/maintenance.py).
+    expenses = db.relationship('Expense', backref='user', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    incomes = db.relationship('Income', backref='user', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    savings_transactions = db.relationship(
+        'SavingsTransaction', backref='user', lazy=True, cascade='all, delete-orphan', passive_deletes=True
+    )
     
     def set_password(self, password):
         """Hash and set password"""
@@ -33,6 +43,7 @@ class User(db.Model):
             'id': self.id,
             'email': self.email,
             'name': self.name,
+            'base_currency': self.base_currency,
             'created_at': self.created_at.isoformat()
         }
 
@@ -40,14 +51,19 @@ class User(db.Model):
 class SavingsTransaction(db.Model):
     """Savings transaction model for manual savings adjustments"""
     __tablename__ = 'savings_transactions'
+    __table_args__ = (
+        db.Index('ix_savings_transactions_user_id_updated_at', 'user_id', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     amount = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
     action = db.Column(db.String(20), nullable=False)  # 'deposit' or 'withdraw'
     description = db.Column(db.Text)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def to_dict(self):
         """Convert savings transaction object to dictionary"""
@@ -55,9 +71,32 @@ class SavingsTransaction(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'amount': self.amount,
+            'currency': self.currency,
             'action': self.action,
             'description': self.description,
             'date': self.date.isoformat(),
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class Category(db.Model):
+    """Expense category: the built-in defaults seeded for every user plus their custom ones"""
+    __tablename__ = 'categories'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_category_user_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    name = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert category object to dictionary"""
+        return {
+            'id': self.id,
+            'name': self.name,
             'created_at': self.created_at.isoformat()
         }
 
@@ -65,14 +104,28 @@ class SavingsTransaction(db.Model):
 class Expense(db.Model):
     """Expense model for tracking user expenses"""
     __tablename__ = 'expenses'
+    __table_args__ = (
+        db.Index('ix_expenses_user_id_updated_at', 'user_id', 'updated_at'),
+        db.Index('ix_expenses_user_id_category_id', 'user_id', 'category_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     amount = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(50), nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
     description = db.Column(db.Text)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Incremented by every write; an edit naming a version only applies to that version
+    version = db.Column(db.Integer, nullable=False, default=1)
+    
+    @property
+    def category(self):
+        """Category name, resolved through the per-process category cache"""
+        from utils.categories import category_name
+        return category_name(self.user_id, self.category_id)
     
     def to_dict(self):
         """Convert expense object to dictionary"""
@@ -80,23 +133,33 @@ class Expense(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'amount': self.amount,
+            'currency': self.currency,
+            'category_id': self.category_id,
             'category': self.category,
             'description': self.description,
             'date': self.date.isoformat(),
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'version': self.version
         }
 
 
 class Income(db.Model):
     """Income model for tracking user income"""
     __tablename__ = 'incomes'
+    __table_args__ = (
+        db.Index('ix_incomes_user_id_updated_at', 'user_id', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     source = db.Column(db.String(100), nullable=False)
     amount = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)
     
     def to_dict(self):
         """Convert income object to dictionary"""
@@ -105,6 +168,295 @@ class Income(db.Model):
             'user_id': self.user_id,
             'source': self.source,
             'amount': self.amount,
+            'currency': self.currency,
             'date': self.date.isoformat(),
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'version': self.version
+        }
+
+
+class Budget(db.Model):
+    """Monthly spending budget for a single expense category"""
+    __tablename__ = 'budgets'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'category_id', 'year', 'month', name='uq_budget_user_category_month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    alert_threshold = db.Column(db.Float, nullable=False, default=80.0)  # percent of amount
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    alerts = db.relationship('BudgetAlert', backref='budget', lazy=True, cascade='all, delete-orphan')
+
+    @property
+    def category(self):
+        """Category name, resolved through the per-process category cache"""
+        from utils.categories import category_name
+        return category_name(self.user_id, self.category_id)
+
+    def to_dict(self):
+        """Convert budget object to dictionary"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'category_id': self.category_id,
+            'category': self.category,
+            'year': self.year,
+            'month': self.month,
+            'amount': self.amount,
+            'alert_threshold': self.alert_threshold,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class CategorySpend(db.Model):
+    """Running month-to-date expense total per user, category and month"""
+    __tablename__ = 'category_spend'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'category_id', 'year', 'month', name='uq_category_spend_user_category_month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class BudgetAlert(db.Model):
+    """Alert raised when spending crosses a budget threshold"""
+    __tablename__ = 'budget_alerts'
+    __table_args__ = (
+        db.UniqueConstraint('budget_id', 'threshold', name='uq_budget_alert_threshold'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    budget_id = db.Column(db.Integer, db.ForeignKey('budgets.id', ondelete='CASCADE'), nullable=False, index=True)
+    threshold = db.Column(db.Float, nullable=False)  # percent of budget that was crossed
+    spent = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert budget alert object to dictionary"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'budget_id': self.budget_id,
+            'threshold': self.threshold,
+            'spent': self.spent,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class BalanceSnapshot(db.Model):
+    """Frozen cumulative ledger totals for a user up to the end of a closed period"""
+    __tablename__ = 'balance_snapshots'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'period_end', name='uq_balance_snapshot_user_period'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    period_end = db.Column(db.DateTime, nullable=False)  # exclusive upper bound of the closed period
+    income_total = db.Column(db.Float, nullable=False, default=0.0)
+    expense_total = db.Column(db.Float, nullable=False, default=0.0)
+    deposits_total = db.Column(db.Float, nullable=False, default=0.0)
+    withdrawals_total = db.Column(db.Float, nullable=False, default=0.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SchemaVersion(db.Model):
+    """Schema versions applied by the migrate step"""
+    __tablename__ = 'schema_version'
+
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(255))
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SpendingModel(db.Model):
+    """Per-category spending model fitted incrementally from closed months"""
+    __tablename__ = 'spending_models'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'category_id', name='uq_spending_model_user_category'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    fitted_through = db.Column(db.Integer, nullable=False)  # months since year 0, exclusive
+    months_observed = db.Column(db.Integer, nullable=False, default=0)
+    month_sum = db.Column(db.Float, nullable=False, default=0.0)
+    month_sumsq = db.Column(db.Float, nullable=False, default=0.0)
+    histogram = db.Column(db.Text, nullable=False, default='[]')  # JSON bucket counts of expense amounts
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a POST made with an Idempotency-Key header"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_user_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body
+    status_code = db.Column(db.Integer)  # NULL while the original request is in flight
+    response = db.Column(db.Text)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class ChangeCursor(db.Model):
+    """Last change-feed sequence number handed out for a user"""
+    __tablename__ = 'change_cursors'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    last_seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class ChangeLogEntry(db.Model):
+    """One write to a user's ledger, in per-user sequence order"""
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'seq', name='uq_change_log_user_seq'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False)
+    entity = db.Column(db.String(20), nullable=False)  # expense, income or savings
+    op = db.Column(db.String(20), nullable=False)  # create, update, delete, bulk_update, bulk_delete
+    data = db.Column(db.Text, nullable=False)  # JSON: the row, {'id'} or {'ids', 'set'}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert change log entry to dictionary"""
+        return {
+            'seq': self.seq,
+            'entity': self.entity,
+            'op': self.op,
+            'data': json.loads(self.data),
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class Tombstone(db.Model):
+    """Marker left by a hard delete so offline clients can sync the removal"""
+    __tablename__ = 'tombstones'
+    __table_args__ = (
+        db.Index('ix_tombstones_user_id_deleted_at', 'user_id', 'deleted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    entity = db.Column(db.String(20), nullable=False)  # expense, income or savings
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FxRate(db.Model):
+    """Daily exchange rate: units of `currency` per one unit of the pivot currency"""
+    __tablename__ = 'fx_rates'
+    # Copied to every shard so per-user aggregates can convert without leaving the shard
+    __table_args__ = {'info': {'replicated': True}}
+
+    currency = db.Column(db.String(3), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    rate = db.Column(db.Float, nullable=False)
+
+
+class MaintenanceJob(db.Model):
+    """Account deletion or data purge worked off in batches by database/maintenance.py"""
+    __tablename__ = 'maintenance_jobs'
+    __table_args__ = (
+        db.Index('ix_maintenance_jobs_status_created_at', 'status', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Not a user_id foreign key: the job stays on the primary and outlives a deleted account
+    account_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # delete_account or purge_data
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON, e.g. {'before': '2024-01-01T00:00:00'}
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    stage = db.Column(db.String(50))  # table being deleted from
+    total_rows = db.Column(db.Integer)
+    rows_deleted = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # worker heartbeat
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        """Convert maintenance job to dictionary"""
+        progress = None
+        if self.status == 'done':
+            progress = 100.0
+        elif self.total_rows:
+            progress = round(min(self.rows_deleted / self.total_rows, 1.0) * 100, 1)
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': json.loads(self.params),
+            'status': self.status,
+            'stage': self.stage,
+            'total_rows': self.total_rows,
+            'rows_deleted': self.rows_deleted,
+            'progress': progress,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class RevokedToken(db.Model):
+    """Deny-list entry for a revoked access or refresh token, kept until the token would expire"""
+    __tablename__ = 'revoked_tokens'
+
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class Statement(db.Model):
+    """Monthly statement rendered after the month closed; stored once and never rewritten"""
+    __tablename__ = 'statements'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', 'month', 'format', name='uq_statement_user_month_format'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    format = db.Column(db.String(4), nullable=False)  # 'csv', 'html' or 'pdf'
+    currency = db.Column(db.String(3), nullable=False)
+    etag = db.Column(db.String(64), nullable=False)  # sha256 of content
+    size = db.Column(db.Integer, nullable=False)
+    content = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert statement metadata to dictionary"""
+        return {
+            'id': self.id,
+            'year': self.year,
+            'month': self.month,
+            'format': self.format,
+            'currency': self.currency,
+            'size': self.size,
+            'etag': self.etag,
             'created_at': self.created_at.isoformat()
         }
@@ -1,15 +1,23 @@
 from flask import Blueprint, request, jsonify
 from models import db, Expense, Income, SavingsTransaction
 from utils.jwt_helper import token_required
+from utils.db_routing import use_read_replica
+from utils.ledger_snapshots import totals_before
+from utils.reporting import MAX_WINDOW, PERIOD_UNITS, build_report
+from utils.forecasting import forecast
+from utils.currency import base_currency, converted_amount
+from utils.categories import category_name
 from datetime import datetime, timedelta
 from sqlalchemy import func, extract
 
 analytics_bp = Blueprint('analytics', __name__)
+analytics_bp.before_request(use_read_replica)
 
 @analytics_bp.route('/analytics/dashboard', methods=['GET'])
 @token_required
 def get_dashboard_analytics(current_user_id):
     """Get dashboard analytics including total income, expenses, and savings"""
+    base = base_currency(current_user_id)
     # Get date range (default to current month)
     now = datetime.utcnow()
     start_of_month = datetime(now.year, now.month, 1)
@@ -26,25 +34,25 @@ def get_dashboard_analytics(current_user_id):
     end_of_prev_month = start_of_month - timedelta(seconds=1)
 
     # Calculate total income for current month
-    total_income = db.session.query(func.sum(Income.amount)).filter(
+    total_income = db.session.query(func.sum(converted_amount(Income, base))).filter(
         Income.user_id == current_user_id,
         Income.date >= start_of_month
     ).scalar() or 0
     
     # Calculate total expenses for current month
-    total_expenses = db.session.query(func.sum(Expense.amount)).filter(
+    total_expenses = db.session.query(func.sum(converted_amount(Expense, base))).filter(
         Expense.user_id == current_user_id,
         Expense.date >= start_of_month
     ).scalar() or 0
     
     # Savings calculations - current month
-    savings_deposits_month = db.session.query(func.sum(SavingsTransaction.amount)).filter(
+    savings_deposits_month = db.session.query(func.sum(converted_amount(SavingsTransaction, base))).filter(
         SavingsTransaction.user_id == current_user_id,
         SavingsTransaction.action == 'deposit',
         SavingsTransaction.date >= start_of_month
     ).scalar() or 0
 
-    savings_withdrawals_month = db.session.query(func.sum(SavingsTransaction.amount)).filter(
+    savings_withdrawals_month = db.session.query(func.sum(converted_amount(SavingsTransaction, base))).filter(
         SavingsTransaction.user_id == current_user_id,
         SavingsTransaction.action == 'withdraw',
         SavingsTransaction.date >= start_of_month
@@ -52,33 +60,13 @@ def get_dashboard_analytics(current_user_id):
 
     savings_balance_month = savings_deposits_month - savings_withdrawals_month
 
-    # Carryover calculations from previous months
-    total_income_before = db.session.query(func.sum(Income.amount)).filter(
-        Income.user_id == current_user_id,
-        Income.date < start_of_month
-    ).scalar() or 0
-
-    total_expenses_before = db.session.query(func.sum(Expense.amount)).filter(
-        Expense.user_id == current_user_id,
-        Expense.date < start_of_month
-    ).scalar() or 0
-
-    savings_deposits_before = db.session.query(func.sum(SavingsTransaction.amount)).filter(
-        SavingsTransaction.user_id == current_user_id,
-        SavingsTransaction.action == 'deposit',
-        SavingsTransaction.date < start_of_month
-    ).scalar() or 0
-
-    savings_withdrawals_before = db.session.query(func.sum(SavingsTransaction.amount)).filter(
-        SavingsTransaction.user_id == current_user_id,
-        SavingsTransaction.action == 'withdraw',
-        SavingsTransaction.date < start_of_month
-    ).scalar() or 0
+    # Carryover calculations from previous months (closed periods come from snapshots)
+    before = totals_before(current_user_id, start_of_month)
 
     carryover_balance = (
-        total_income_before
-        - total_expenses_before
-        - (savings_deposits_before - savings_withdrawals_before)
+        before['income']
+        - before['expenses']
+        - (before['deposits'] - before['withdrawals'])
     )
 
     available_funds = carryover_balance + total_income
@@ -90,20 +78,20 @@ def get_dashboard_analytics(current_user_id):
     remaining_balance_month = available_funds - total_expenses - savings_balance_month
     
     # Get all-time totals
-    all_time_income = db.session.query(func.sum(Income.amount)).filter(
+    all_time_income = db.session.query(func.sum(converted_amount(Income, base))).filter(
         Income.user_id == current_user_id
     ).scalar() or 0
     
-    all_time_expenses = db.session.query(func.sum(Expense.amount)).filter(
+    all_time_expenses = db.session.query(func.sum(converted_amount(Expense, base))).filter(
         Expense.user_id == current_user_id
     ).scalar() or 0
 
-    all_time_savings_deposits = db.session.query(func.sum(SavingsTransaction.amount)).filter(
+    all_time_savings_deposits = db.session.query(func.sum(converted_amount(SavingsTransaction, base))).filter(
         SavingsTransaction.user_id == current_user_id,
         SavingsTransaction.action == 'deposit'
     ).scalar() or 0
 
-    all_time_savings_withdrawals = db.session.query(func.sum(SavingsTransaction.amount)).filter(
+    all_time_savings_withdrawals = db.session.query(func.sum(converted_amount(SavingsTransaction, base))).filter(
         SavingsTransaction.user_id == current_user_id,
         SavingsTransaction.action == 'withdraw'
     ).scalar() or 0
@@ -112,6 +100,7 @@ def get_dashboard_analytics(current_user_id):
     all_time_remaining_balance = carryover_balance + (total_income - total_expenses - savings_balance_month)
     
     return jsonify({
+        'currency': base,
         'current_month': {
             'total_income': round(total_income, 2),
             'total_expenses': round(total_expenses, 2),
@@ -149,13 +138,14 @@ def get_dashboard_analytics(current_user_id):
 @token_required
 def get_category_breakdown(current_user_id):
     """Get expense breakdown by category"""
+    base = base_currency(current_user_id)
     # Get date range from query params
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
     query = db.session.query(
-        Expense.category,
-        func.sum(Expense.amount).label('total')
+        Expense.category_id,
+        func.sum(converted_amount(Expense, base)).label('total')
     ).filter(Expense.user_id == current_user_id)
     
     if start_date:
@@ -172,16 +162,17 @@ def get_category_breakdown(current_user_id):
         except ValueError:
             pass
     
-    category_data = query.group_by(Expense.category).all()
+    category_data = query.group_by(Expense.category_id).all()
     
     # Calculate total for percentage
     total_expenses = sum(item.total for item in category_data)
     
     breakdown = []
-    for category, total in category_data:
+    for id, total in category_data:
         percentage = (total / total_expenses * 100) if total_expenses > 0 else 0
         breakdown.append({
-            'category': category,
+            'category_id': id,
+            'category': category_name(current_user_id, id),
             'total': round(total, 2),
             'percentage': round(percentage, 2)
         })
@@ -189,12 +180,13 @@ def get_category_breakdown(current_user_id):
     # Sort by total descending
     breakdown.sort(key=lambda x: x['total'], reverse=True)
     
-    return jsonify({'breakdown': breakdown}), 200
+    return jsonify({'breakdown': breakdown, 'currency': base}), 200
 
 @analytics_bp.route('/analytics/monthly-trend', methods=['GET'])
 @token_required
 def get_monthly_trend(current_user_id):
     """Get monthly trend for income, expenses, savings deposits, and leftover balance"""
+    base = base_currency(current_user_id)
     now = datetime.utcnow()
     months_count = 6
     current_month_start = datetime(now.year, now.month, 1)
@@ -216,7 +208,7 @@ def get_monthly_trend(current_user_id):
     income_data = db.session.query(
         extract('year', Income.date).label('year'),
         extract('month', Income.date).label('month'),
-        func.sum(Income.amount).label('total')
+        func.sum(converted_amount(Income, base)).label('total')
     ).filter(
         Income.user_id == current_user_id,
         Income.date >= first_month_start
@@ -226,7 +218,7 @@ def get_monthly_trend(current_user_id):
     expense_data = db.session.query(
         extract('year', Expense.date).label('year'),
         extract('month', Expense.date).label('month'),
-        func.sum(Expense.amount).label('total')
+        func.sum(converted_amount(Expense, base)).label('total')
     ).filter(
         Expense.user_id == current_user_id,
         Expense.date >= first_month_start
@@ -237,7 +229,7 @@ def get_monthly_trend(current_user_id):
         extract('year', SavingsTransaction.date).label('year'),
         extract('month', SavingsTransaction.date).label('month'),
         SavingsTransaction.action,
-        func.sum(SavingsTransaction.amount).label('total')
+        func.sum(converted_amount(SavingsTransaction, base)).label('total')
     ).filter(
         SavingsTransaction.user_id == current_user_id,
         SavingsTransaction.date >= first_month_start
@@ -256,29 +248,8 @@ def get_monthly_trend(current_user_id):
             withdrawals_dict[key] = total
 
     # Calculate carryover balance prior to the first month in range
-    income_before = db.session.query(func.sum(Income.amount)).filter(
-        Income.user_id == current_user_id,
-        Income.date < first_month_start
-    ).scalar() or 0
-
-    expenses_before = db.session.query(func.sum(Expense.amount)).filter(
-        Expense.user_id == current_user_id,
-        Expense.date < first_month_start
-    ).scalar() or 0
-
-    deposits_before = db.session.query(func.sum(SavingsTransaction.amount)).filter(
-        SavingsTransaction.user_id == current_user_id,
-        SavingsTransaction.action == 'deposit',
-        SavingsTransaction.date < first_month_start
-    ).scalar() or 0
-
-    withdrawals_before = db.session.query(func.sum(SavingsTransaction.amount)).filter(
-        SavingsTransaction.user_id == current_user_id,
-        SavingsTransaction.action == 'withdraw',
-        SavingsTransaction.date < first_month_start
-    ).scalar() or 0
-
-    carryover = income_before - expenses_before - (deposits_before - withdrawals_before)
+    before = totals_before(current_user_id, first_month_start)
+    carryover = before['income'] - before['expenses'] - (before['deposits'] - before['withdrawals'])
 
     trend = []
     for month_start in month_starts:
@@ -301,7 +272,7 @@ def get_monthly_trend(current_user_id):
 
         carryover = leftover
 
-    return jsonify({'trend': trend}), 200
+    return jsonify({'trend': trend, 'currency': base}), 200
 
 @analytics_bp.route('/analytics/insights', methods=['GET'])
 @token_required
@@ -309,15 +280,16 @@ def get_insights(current_user_id):
     """Get automated insights about spending and saving patterns"""
     insights = []
     now = datetime.utcnow()
+    base = base_currency(current_user_id)
     
     # Current month
     start_of_month = datetime(now.year, now.month, 1)
-    current_month_income = db.session.query(func.sum(Income.amount)).filter(
+    current_month_income = db.session.query(func.sum(converted_amount(Income, base))).filter(
         Income.user_id == current_user_id,
         Income.date >= start_of_month
     ).scalar() or 0
     
-    current_month_expenses = db.session.query(func.sum(Expense.amount)).filter(
+    current_month_expenses = db.session.query(func.sum(converted_amount(Expense, base))).filter(
         Expense.user_id == current_user_id,
         Expense.date >= start_of_month
     ).scalar() or 0
@@ -333,13 +305,13 @@ def get_insights(current_user_id):
     start_of_prev_month = datetime(prev_year, prev_month, 1)
     end_of_prev_month = start_of_month - timedelta(days=1)
     
-    prev_month_income = db.session.query(func.sum(Income.amount)).filter(
+    prev_month_income = db.session.query(func.sum(converted_amount(Income, base))).filter(
         Income.user_id == current_user_id,
         Income.date >= start_of_prev_month,
         Income.date <= end_of_prev_month
     ).scalar() or 0
     
-    prev_month_expenses = db.session.query(func.sum(Expense.amount)).filter(
+    prev_month_expenses = db.session.query(func.sum(converted_amount(Expense, base))).filter(
         Expense.user_id == current_user_id,
         Expense.date >= start_of_prev_month,
         Expense.date <= end_of_prev_month
@@ -359,17 +331,17 @@ def get_insights(current_user_id):
     
     # Category insights
     category_data = db.session.query(
-        Expense.category,
-        func.sum(Expense.amount).label('total')
+        Expense.category_id,
+        func.sum(converted_amount(Expense, base)).label('total')
     ).filter(
         Expense.user_id == current_user_id,
         Expense.date >= start_of_month
-    ).group_by(Expense.category).all()
+    ).group_by(Expense.category_id).all()
     
     if category_data and current_month_expenses > 0:
         top_category = max(category_data, key=lambda x: x.total)
         percentage = (top_category.total / current_month_expenses * 100)
-        insights.append(f"{top_category.category} covers {percentage:.1f}% of your expenses this month.")
+        insights.append(f"{category_name(current_user_id, top_category.category_id)} covers {percentage:.1f}% of your expenses this month.")
     
     # Spending trend
     if prev_month_expenses > 0:
@@ -387,3 +359,39 @@ def get_insights(current_user_id):
             insights.append("Consider reviewing your expenses to improve your savings rate.")
     
     return jsonify({'insights': insights}), 200
+
+@analytics_bp.route('/analytics/report', methods=['GET'])
+@token_required
+def get_report(current_user_id):
+    """Get a long-range report: category x period pivot, cumulative balance, moving averages"""
+    period = request.args.get('period', 'month')
+    if period not in PERIOD_UNITS:
+        return jsonify({'error': f'period must be one of: {", ".join(PERIOD_UNITS)}'}), 400
+    
+    try:
+        window = int(request.args.get('window', 3))
+    except ValueError:
+        return jsonify({'error': 'window must be an integer'}), 400
+    if not 1 <= window <= MAX_WINDOW:
+        return jsonify({'error': f'window must be between 1 and {MAX_WINDOW}'}), 400
+    
+    start = end = None
+    try:
+        if request.args.get('start_date'):
+            start = datetime.fromisoformat(request.args['start_date'].replace('Z', '+00:00')).replace(tzinfo=None)
+        if request.args.get('end_date'):
+            end = datetime.fromisoformat(request.args['end_date'].replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    # Day-level reports over unbounded ranges would be huge; cap them to roughly ten years
+    if period == 'day' and (start is None or (end or datetime.utcnow()) - start > timedelta(days=3660)):
+        return jsonify({'error': 'Daily reports require a start_date within ten years of end_date'}), 400
+    
+    return jsonify({'report': build_report(current_user_id, period, start, end, window)}), 200
+
+@analytics_bp.route('/analytics/forecast', methods=['GET'])
+@token_required
+def get_forecast(current_user_id):
+    """Project end-of-month spend per category and flag anomalous expenses this month"""
+    return jsonify({'forecast': forecast(current_user_id)}), 200
@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify
-from models import db, User
-from utils.jwt_helper import create_token, token_required
+from flask import Blueprint, request, jsonify, g
+from models import db, Expense, Income, SavingsTransaction, User, DEFAULT_CURRENCY
+from utils.jwt_helper import create_tokens, revoke_session, rotate_refresh_token, token_required
+from utils.currency import parse_currency, require_convertible_rows
+from utils.maintenance import drop_derived_totals
+from utils.categories import seed_defaults
+from utils.sharding import home_shard, shard_for, user_scope
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -17,22 +21,35 @@ def register():
     if User.query.filter_by(email=data['email']).first():
         return jsonify({'error': 'Email already registered'}), 400
     
+    try:
+        base_currency = parse_currency(data.get('base_currency'), DEFAULT_CURRENCY)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Create new user
     user = User(
         email=data['email'],
-        name=data['name']
+        name=data['name'],
+        base_currency=base_currency
     )
     user.set_password(data['password'])
     
     db.session.add(user)
     db.session.commit()
     
-    # Generate token
-    token = create_token(user.id)
+    # Accounts created while a rebalance runs have nothing to move: start them on their new shard
+    if shard_for(user.id) != home_shard(user.id):
+        user.shard = home_shard(user.id)
+        db.session.commit()
+    
+    # The built-in categories live next to the user's expenses, on their shard
+    with user_scope(db.session, user.id):
+        seed_defaults(user.id)
+        db.session.commit()
     
     return jsonify({
         'message': 'User registered successfully',
-        'token': token,
+        **create_tokens(user.id),
         'user': user.to_dict()
     }), 201
 
@@ -48,18 +65,33 @@ def login():
     # Find user
     user = User.query.filter_by(email=data['email']).first()
     
-    if not user or not user.check_password(data['password']):
+    if not user or user.deleted_at or not user.check_password(data['password']):
         return jsonify({'error': 'Invalid email or password'}), 401
     
-    # Generate token
-    token = create_token(user.id)
-    
     return jsonify({
         'message': 'Login successful',
-        'token': token,
+        **create_tokens(user.id),
         'user': user.to_dict()
     }), 200
 
+@auth_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    """Exchange a refresh token for a new access token and refresh token"""
+    data = request.get_json() or {}
+    
+    if not data.get('refresh_token'):
+        return jsonify({'error': 'refresh_token is required'}), 400
+    
+    # Each refresh token works once; the old one is revoked as the new pair is issued
+    user_id = rotate_refresh_token(data['refresh_token'])
+    if user_id is None or not db.session.get(User, user_id):
+        db.session.rollback()
+        return jsonify({'error': 'Refresh token is invalid, expired or already used'}), 401
+    
+    db.session.commit()
+    
+    return jsonify(create_tokens(user_id)), 200
+
 @auth_bp.route('/user', methods=['GET'])
 @token_required
 def get_user(current_user_id):
@@ -71,8 +103,43 @@ def get_user(current_user_id):
     
     return jsonify({'user': user.to_dict()}), 200
 
+@auth_bp.route('/user', methods=['PATCH'])
+@token_required
+def update_user(current_user_id):
+    """Update the current user's name or base currency"""
+    user = User.query.get(current_user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    data = request.get_json() or {}
+    
+    if data.get('name'):
+        user.name = data['name']
+    
+    try:
+        base_currency = parse_currency(data.get('base_currency'), user.base_currency)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if base_currency != user.base_currency:
+        # Every existing row must convert to the new base, or totals would leave it out
+        for model in (Expense, Income, SavingsTransaction):
+            require_convertible_rows(model, current_user_id, base_currency)
+        user.base_currency = base_currency
+        g.pop('base_currencies', None)
+        # Stored totals are in the old base currency
+        drop_derived_totals(current_user_id)
+    
+    db.session.commit()
+    
+    return jsonify({'user': user.to_dict()}), 200
+
 @auth_bp.route('/logout', methods=['POST'])
 @token_required
 def logout(current_user_id):
-    """Logout user (client-side token removal)"""
+    """Logout user: revoke the access token and its refresh token"""
+    revoke_session(g.token)
+    db.session.commit()
+    
     return jsonify({'message': 'Logout successful'}), 200
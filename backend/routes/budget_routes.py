@@ -0,0 +1,208 @@
+from flask import Blueprint, request, jsonify
+from datetime import datetime
+
+from models import db, Budget, BudgetAlert
+from utils.jwt_helper import token_required
+from utils.budget_tracker import get_month_spend, check_thresholds
+from utils.categories import category_id, category_names
+
+budget_bp = Blueprint('budget', __name__)
+
+
+def _parse_period(args):
+    """Read year/month from a mapping, defaulting to the current month"""
+    now = datetime.utcnow()
+    try:
+        year = int(args.get('year') or now.year)
+        month = int(args.get('month') or now.month)
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= month <= 12:
+        return None
+    return year, month
+
+
+@budget_bp.route('/budgets', methods=['GET'])
+@token_required
+def get_budgets(current_user_id):
+    """Get budgets for a month (defaults to current month)"""
+    period = _parse_period(request.args)
+    if not period:
+        return jsonify({'error': 'Invalid year or month'}), 400
+    year, month = period
+
+    budgets = Budget.query.filter_by(user_id=current_user_id, year=year, month=month).all()
+    budgets.sort(key=lambda budget: budget.category or '')
+
+    return jsonify({
+        'budgets': [budget.to_dict() for budget in budgets]
+    }), 200
+
+
+@budget_bp.route('/budgets', methods=['POST'])
+@token_required
+def create_budget(current_user_id):
+    """Create a budget for a category and month"""
+    data = request.get_json() or {}
+
+    if not data.get('amount') or not data.get('category'):
+        return jsonify({'error': 'Amount and category are required'}), 400
+
+    budget_category_id = category_id(current_user_id, data['category'])
+    if budget_category_id is None:
+        return jsonify({'error': f'Category must be one of: {", ".join(category_names(current_user_id))}'}), 400
+
+    period = _parse_period(data)
+    if not period:
+        return jsonify({'error': 'Invalid year or month'}), 400
+    year, month = period
+
+    try:
+        amount = float(data['amount'])
+        alert_threshold = float(data.get('alert_threshold', 80))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Amount and alert_threshold must be valid numbers'}), 400
+
+    if amount <= 0:
+        return jsonify({'error': 'Amount must be greater than zero'}), 400
+
+    if not 0 < alert_threshold <= 100:
+        return jsonify({'error': 'alert_threshold must be between 0 and 100'}), 400
+
+    existing = Budget.query.filter_by(
+        user_id=current_user_id, category_id=budget_category_id, year=year, month=month
+    ).first()
+    if existing:
+        return jsonify({'error': 'A budget already exists for this category and month'}), 400
+
+    budget = Budget(
+        user_id=current_user_id,
+        category_id=budget_category_id,
+        year=year,
+        month=month,
+        amount=amount,
+        alert_threshold=alert_threshold
+    )
+    db.session.add(budget)
+    db.session.flush()
+
+    # Spending that happened before the budget was created may already cross a threshold
+    spent = get_month_spend(current_user_id, year, month).get(budget.category_id, 0)
+    check_thresholds(current_user_id, budget.category_id, year, month, 0, spent, budget=budget)
+
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Budget created successfully',
+        'budget': budget.to_dict()
+    }), 201
+
+
+@budget_bp.route('/budgets/<int:budget_id>', methods=['PUT'])
+@token_required
+def update_budget(current_user_id, budget_id):
+    """Update a budget's amount or alert threshold"""
+    budget = Budget.query.filter_by(id=budget_id, user_id=current_user_id).first()
+
+    if not budget:
+        return jsonify({'error': 'Budget not found'}), 404
+
+    data = request.get_json() or {}
+
+    try:
+        if data.get('amount'):
+            budget.amount = float(data['amount'])
+        if data.get('alert_threshold'):
+            budget.alert_threshold = float(data['alert_threshold'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Amount and alert_threshold must be valid numbers'}), 400
+
+    if budget.amount <= 0:
+        return jsonify({'error': 'Amount must be greater than zero'}), 400
+
+    if not 0 < budget.alert_threshold <= 100:
+        return jsonify({'error': 'alert_threshold must be between 0 and 100'}), 400
+
+    spent = get_month_spend(current_user_id, budget.year, budget.month).get(budget.category_id, 0)
+    check_thresholds(current_user_id, budget.category_id, budget.year, budget.month, 0, spent, budget=budget)
+
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Budget updated successfully',
+        'budget': budget.to_dict()
+    }), 200
+
+
+@budget_bp.route('/budgets/<int:budget_id>', methods=['DELETE'])
+@token_required
+def delete_budget(current_user_id, budget_id):
+    """Delete a budget and its alerts"""
+    budget = Budget.query.filter_by(id=budget_id, user_id=current_user_id).first()
+
+    if not budget:
+        return jsonify({'error': 'Budget not found'}), 404
+
+    db.session.delete(budget)
+    db.session.commit()
+
+    return jsonify({'message': 'Budget deleted successfully'}), 200
+
+
+@budget_bp.route('/budgets/status', methods=['GET'])
+@token_required
+def get_budget_status(current_user_id):
+    """Get month-to-date spend against each budget, and across all categories, from the running category totals"""
+    period = _parse_period(request.args)
+    if not period:
+        return jsonify({'error': 'Invalid year or month'}), 400
+    year, month = period
+
+    budgets = Budget.query.filter_by(user_id=current_user_id, year=year, month=month).all()
+    spend = get_month_spend(current_user_id, year, month)
+
+    status = []
+    for budget in budgets:
+        spent = spend.get(budget.category_id, 0)
+        percent_used = (spent / budget.amount * 100) if budget.amount > 0 else 0
+
+        if percent_used >= 100:
+            state = 'exceeded'
+        elif percent_used >= budget.alert_threshold:
+            state = 'warning'
+        else:
+            state = 'ok'
+
+        status.append({
+            'budget_id': budget.id,
+            'category_id': budget.category_id,
+            'category': budget.category,
+            'amount': round(budget.amount, 2),
+            'spent': round(spent, 2),
+            'remaining': round(budget.amount - spent, 2),
+            'percent_used': round(percent_used, 2),
+            'alert_threshold': budget.alert_threshold,
+            'status': state
+        })
+
+    status.sort(key=lambda x: x['percent_used'], reverse=True)
+
+    return jsonify({
+        'year': year,
+        'month': month,
+        'total_spent': round(sum(spend.values()), 2),
+        'budgets': status
+    }), 200
+
+
+@budget_bp.route('/budgets/alerts', methods=['GET'])
+@token_required
+def get_budget_alerts(current_user_id):
+    """Get budget threshold alerts, newest first"""
+    alerts = BudgetAlert.query.filter_by(user_id=current_user_id).order_by(
+        BudgetAlert.created_at.desc()
+    ).limit(50).all()
+
+    return jsonify({
+        'alerts': [alert.to_dict() for alert in alerts]
+    }), 200
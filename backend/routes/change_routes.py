@@ -0,0 +1,106 @@
+import json
+import time
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from models import db
+from utils.jwt_helper import create_stream_token, token_required, stream_token_required
+from utils.change_feed import MAX_CHANGES, changes_since, is_truncated, latest_seq
+from utils.sync import retention_horizon, sync_payload
+
+change_bp = Blueprint('changes', __name__)
+
+def _parse_since(value):
+    try:
+        since = int(value or 0)
+    except ValueError:
+        return None
+    return since if since >= 0 else None
+
+@change_bp.route('/changes', methods=['GET'])
+@token_required
+def get_changes(current_user_id):
+    """Get the user's changes after a sequence number for delta sync"""
+    since = _parse_since(request.args.get('since'))
+    if since is None:
+        return jsonify({'error': 'since must be a non-negative integer'}), 400
+
+    try:
+        limit = min(int(request.args.get('limit', MAX_CHANGES)), MAX_CHANGES)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    last_seq = latest_seq(current_user_id)
+    if is_truncated(current_user_id, since, last_seq):
+        return jsonify({'error': 'Changes since this sequence were compacted; resync with GET /sync', 'last_seq': last_seq}), 410
+    
+    entries = changes_since(current_user_id, since, limit)
+
+    return jsonify({
+        'changes': [entry.to_dict() for entry in entries],
+        'last_seq': last_seq,
+        'has_more': bool(entries) and entries[-1].seq < last_seq
+    }), 200
+
+@change_bp.route('/changes/stream-token', methods=['POST'])
+@token_required
+def get_stream_token(current_user_id):
+    """Issue a short-lived token that can only open the change stream"""
+    return jsonify(create_stream_token(current_user_id)), 200
+
+@change_bp.route('/changes/stream', methods=['GET'])
+@stream_token_required
+def stream_changes(current_user_id):
+    """Server-sent events stream of the user's changes"""
+    since = _parse_since(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    if since is None:
+        return jsonify({'error': 'since must be a non-negative integer'}), 400
+
+    config = current_app.config
+    duration = config['CHANGE_STREAM_SECONDS']
+    interval = config['CHANGE_STREAM_POLL_SECONDS']
+
+    def events(since):
+        # EventSource reconnects after `retry` ms and resumes from Last-Event-ID
+        yield f"retry: {config['CHANGE_STREAM_RETRY_MS']}\n\n"
+        last_seq = latest_seq(current_user_id)
+        if is_truncated(current_user_id, since, last_seq):
+            # The client missed compacted entries: it must resync and reconnect from last_seq
+            yield f"event: reset\ndata: {json.dumps({'last_seq': last_seq})}\n\n"
+            return
+        deadline = time.monotonic() + duration
+
+        while True:
+            entries = changes_since(current_user_id, since)
+            # Hand the connection back to the pool while the stream waits
+            db.session.close()
+
+            for entry in entries:
+                since = entry.seq
+                yield f"id: {entry.seq}\nevent: change\ndata: {json.dumps(entry.to_dict())}\n\n"
+
+            if time.monotonic() + interval >= deadline:
+                break
+            if not entries:
+                yield ": keepalive\n\n"
+                time.sleep(interval)
+
+    response = Response(stream_with_context(events(since)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@change_bp.route('/sync', methods=['GET'])
+@token_required
+def get_sync(current_user_id):
+    """Get ledger rows changed and deleted since the client's watermark"""
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            return jsonify({'error': 'Invalid since format'}), 400
+        
+        if since < retention_horizon():
+            return jsonify({'error': 'since is older than the tombstone retention window; sync without since'}), 410
+    
+    return jsonify(sync_payload(current_user_id, since or None)), 200
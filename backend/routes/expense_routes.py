@@ -1,14 +1,58 @@
 from flask import Blueprint, request, jsonify
-from models import db, Expense
+from models import db, Category, Expense
 from utils.jwt_helper import token_required
+from utils.idempotency import idempotent
+from utils.db_routing import use_read_replica
+from utils.fieldsets import parse_fields, serialize_rows
+from utils.budget_tracker import record_expense_change, spend_keys, refresh_spend
+from utils.bulk import build_bulk_query, parse_changes, summarize
+from utils.ledger_snapshots import invalidate_snapshots
+from utils.forecasting import invalidate_models
+from utils.change_feed import record_change, bulk_change_data
+from utils.sync import record_deletions
+from utils.categories import category_id, category_names
+from utils.currency import base_currency, convert, parse_currency, require_rates, require_rates_on
+from utils.versioning import conflict_response, expected_version, update_row, version_headers
+from sqlalchemy import select
 from datetime import datetime
 
 expense_bp = Blueprint('expense', __name__)
+expense_bp.before_request(use_read_replica)
+
+# Fields whose edit moves spend between category-months
+SPEND_FIELDS = {'amount', 'currency', 'category_id', 'date'}
+
+# ?fields= names that are not expense columns
+EXTRA_FIELDS = {
+    'category': select(Category.name).where(Category.id == Expense.category_id).scalar_subquery().label('category')
+}
+
+def _spend(expense, base):
+    """Expense amount in the base currency budgets are tracked in"""
+    return convert(expense.amount, expense.currency, base, expense.date)
+
+def _category_error(user_id):
+    return jsonify({'error': f'Category must be one of: {", ".join(category_names(user_id))}'}), 400
+
+def _resolve_category_filter(user_id, data):
+    """Swap a category name in a bulk filter for its id; False when the name is unknown"""
+    filters = data.get('filter')
+    if not isinstance(filters, dict) or 'category' not in filters:
+        return True
+    filters = dict(filters)
+    filters['category_id'] = category_id(user_id, str(filters.pop('category')))
+    data['filter'] = filters
+    return filters['category_id'] is not None
 
 @expense_bp.route('/expenses', methods=['GET'])
 @token_required
 def get_expenses(current_user_id):
     """Get all expenses for current user"""
+    try:
+        fields = parse_fields(Expense, EXTRA_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Get query parameters for filtering
     category = request.args.get('category')
     start_date = request.args.get('start_date')
@@ -18,7 +62,7 @@ def get_expenses(current_user_id):
     query = Expense.query.filter_by(user_id=current_user_id)
     
     if category:
-        query = query.filter_by(category=category)
+        query = query.filter_by(category_id=category_id(current_user_id, category))
     
     if start_date:
         try:
@@ -34,7 +78,12 @@ def get_expenses(current_user_id):
         except ValueError:
             return jsonify({'error': 'Invalid end_date format'}), 400
     
-    expenses = query.order_by(Expense.date.desc()).all()
+    query = query.order_by(Expense.date.desc())
+    
+    if fields:
+        return jsonify({'expenses': serialize_rows(query.with_entities(*fields).all(), fields)}), 200
+    
+    expenses = query.all()
     
     return jsonify({
         'expenses': [expense.to_dict() for expense in expenses]
@@ -42,6 +91,7 @@ def get_expenses(current_user_id):
 
 @expense_bp.route('/expenses', methods=['POST'])
 @token_required
+@idempotent
 def create_expense(current_user_id):
     """Create a new expense"""
     data = request.get_json()
@@ -51,9 +101,9 @@ def create_expense(current_user_id):
         return jsonify({'error': 'Amount and category are required'}), 400
     
     # Validate category
-    valid_categories = ['Food', 'Rent', 'Travel', 'Misc.', 'Others']
-    if data['category'] not in valid_categories:
-        return jsonify({'error': f'Category must be one of: {", ".join(valid_categories)}'}), 400
+    expense_category_id = category_id(current_user_id, data['category'])
+    if expense_category_id is None:
+        return _category_error(current_user_id)
     
     # Parse date if provided
     expense_date = datetime.utcnow()
@@ -63,16 +113,28 @@ def create_expense(current_user_id):
         except ValueError:
             return jsonify({'error': 'Invalid date format'}), 400
     
+    base = base_currency(current_user_id)
+    try:
+        currency = parse_currency(data.get('currency'), base)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    require_rates(currency, base, expense_date)
+    
     # Create expense
     expense = Expense(
         user_id=current_user_id,
         amount=float(data['amount']),
-        category=data['category'],
+        currency=currency,
+        category_id=expense_category_id,
         description=data.get('description', ''),
         date=expense_date
     )
     
     db.session.add(expense)
+    record_expense_change(current_user_id, expense.category_id, expense.date, _spend(expense, base))
+    invalidate_snapshots(current_user_id, expense.date)
+    invalidate_models(current_user_id, expense.date)
+    record_change(current_user_id, 'expense', 'create', row=expense)
     db.session.commit()
     
     return jsonify({
@@ -83,39 +145,74 @@ def create_expense(current_user_id):
 @expense_bp.route('/expenses/<int:expense_id>', methods=['PUT'])
 @token_required
 def update_expense(current_user_id, expense_id):
-    """Update an expense"""
-    expense = Expense.query.filter_by(id=expense_id, user_id=current_user_id).first()
-    
-    if not expense:
-        return jsonify({'error': 'Expense not found'}), 404
+    """Update an expense; a version in If-Match or the body makes the edit conditional"""
+    data = request.get_json() or {}
     
-    data = request.get_json()
+    try:
+        version = expected_version(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Update fields
+    # Collect the new values
+    values = {}
     if data.get('amount'):
-        expense.amount = float(data['amount'])
+        values['amount'] = float(data['amount'])
     
     if data.get('category'):
-        valid_categories = ['Food', 'Rent', 'Travel', 'Misc.', 'Others']
-        if data['category'] not in valid_categories:
-            return jsonify({'error': f'Category must be one of: {", ".join(valid_categories)}'}), 400
-        expense.category = data['category']
+        values['category_id'] = category_id(current_user_id, data['category'])
+        if values['category_id'] is None:
+            return _category_error(current_user_id)
+    
+    try:
+        currency = parse_currency(data.get('currency'), None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if currency:
+        values['currency'] = currency
     
     if 'description' in data:
-        expense.description = data['description']
+        values['description'] = data['description']
     
     if data.get('date'):
         try:
-            expense.date = datetime.fromisoformat(data['date'].replace('Z', '+00:00'))
+            values['date'] = datetime.fromisoformat(data['date'].replace('Z', '+00:00'))
         except ValueError:
             return jsonify({'error': 'Invalid date format'}), 400
     
+    # Budget totals and balance snapshots need the values being replaced; the UPDATE returns them
+    spend_changed = bool(values.keys() & SPEND_FIELDS)
+    expense, changed, previous = update_row(
+        Expense, current_user_id, expense_id, values, version,
+        previous=('category_id', 'date', 'amount', 'currency') if spend_changed else ()
+    )
+    if expense is None:
+        return conflict_response(Expense, current_user_id, expense_id, 'expense')
+    if not changed:
+        return jsonify({
+            'message': 'Expense unchanged',
+            'expense': expense.to_dict()
+        }), 200, version_headers(expense)
+    
+    if spend_changed:
+        # Keep category-month totals for budget tracking in step with the edit
+        base = base_currency(current_user_id)
+        old_category_id, old_date, old_amount = previous.category_id, previous.date, _spend(previous, base)
+        new_amount = _spend(expense, base)
+        if (old_category_id, old_date.year, old_date.month) == (expense.category_id, expense.date.year, expense.date.month):
+            record_expense_change(current_user_id, expense.category_id, expense.date, new_amount - old_amount)
+        else:
+            record_expense_change(current_user_id, old_category_id, old_date, -old_amount)
+            record_expense_change(current_user_id, expense.category_id, expense.date, new_amount)
+        invalidate_snapshots(current_user_id, old_date, expense.date)
+        invalidate_models(current_user_id, old_date, expense.date)
+    record_change(current_user_id, 'expense', 'update', row=expense)
+    
     db.session.commit()
     
     return jsonify({
         'message': 'Expense updated successfully',
         'expense': expense.to_dict()
-    }), 200
+    }), 200, version_headers(expense)
 
 @expense_bp.route('/expenses/<int:expense_id>', methods=['DELETE'])
 @token_required
@@ -127,6 +224,100 @@ def delete_expense(current_user_id, expense_id):
         return jsonify({'error': 'Expense not found'}), 404
     
     db.session.delete(expense)
+    record_expense_change(current_user_id, expense.category_id, expense.date, -_spend(expense, base_currency(current_user_id)))
+    invalidate_snapshots(current_user_id, expense.date)
+    invalidate_models(current_user_id, expense.date)
+    record_change(current_user_id, 'expense', 'delete', data={'id': expense_id})
+    record_deletions(current_user_id, 'expense', [expense_id])
     db.session.commit()
     
     return jsonify({'message': 'Expense deleted successfully'}), 200
+
+@expense_bp.route('/expenses/bulk', methods=['PATCH'])
+@token_required
+def bulk_update_expenses(current_user_id):
+    """Update many expenses selected by ids or filter in one statement"""
+    data = request.get_json() or {}
+    
+    if not _resolve_category_filter(current_user_id, data):
+        return _category_error(current_user_id)
+    
+    query, error = build_bulk_query(Expense, current_user_id, data, ('category_id',))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    changes, error = parse_changes(data.get('set'), ('amount', 'category', 'description', 'date'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    category = None
+    if 'category' in changes:
+        category = changes.pop('category')
+        changes['category_id'] = category_id(current_user_id, category)
+        if changes['category_id'] is None:
+            return _category_error(current_user_id)
+    
+    matched, earliest = summarize(query, Expense)
+    if data.get('dry_run'):
+        return jsonify({'dry_run': True, 'matched': matched}), 200
+    if 'date' in changes:
+        require_rates_on(query, Expense, base_currency(current_user_id), changes['date'])
+    
+    # Category-months the rows leave and the ones they move into
+    old_keys = spend_keys(query)
+    new_date = changes.get('date')
+    new_keys = {
+        (changes.get('category_id', old_category_id),
+         new_date.year if new_date else year,
+         new_date.month if new_date else month)
+        for old_category_id, year, month in old_keys
+    }
+    
+    change = bulk_change_data(query, Expense, changes)
+    if category is not None:
+        change['set']['category'] = category
+    updated = query.update({**changes, 'version': Expense.version + 1}, synchronize_session=False)
+    
+    refresh_spend(current_user_id, old_keys | new_keys)
+    invalidate_snapshots(current_user_id, earliest, new_date)
+    invalidate_models(current_user_id, earliest, new_date)
+    record_change(current_user_id, 'expense', 'bulk_update', data=change)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Expenses updated successfully',
+        'updated': updated
+    }), 200
+
+@expense_bp.route('/expenses/bulk', methods=['DELETE'])
+@token_required
+def bulk_delete_expenses(current_user_id):
+    """Delete many expenses selected by ids or filter in one statement"""
+    data = request.get_json() or {}
+    
+    if not _resolve_category_filter(current_user_id, data):
+        return _category_error(current_user_id)
+    
+    query, error = build_bulk_query(Expense, current_user_id, data, ('category_id',))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    matched, earliest = summarize(query, Expense)
+    if data.get('dry_run'):
+        return jsonify({'dry_run': True, 'matched': matched}), 200
+    
+    keys = spend_keys(query)
+    change = bulk_change_data(query, Expense)
+    deleted = query.delete(synchronize_session=False)
+    
+    refresh_spend(current_user_id, keys)
+    invalidate_snapshots(current_user_id, earliest)
+    invalidate_models(current_user_id, earliest)
+    record_change(current_user_id, 'expense', 'bulk_delete', data=change)
+    record_deletions(current_user_id, 'expense', change['ids'])
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Expenses deleted successfully',
+        'deleted': deleted
+    }), 200
@@ -1,14 +1,29 @@
 from flask import Blueprint, request, jsonify
 from models import db, Income
 from utils.jwt_helper import token_required
+from utils.idempotency import idempotent
+from utils.db_routing import use_read_replica
+from utils.fieldsets import parse_fields, serialize_rows
+from utils.ledger_snapshots import invalidate_snapshots
+from utils.change_feed import record_change, bulk_change_data
+from utils.sync import record_deletions
+from utils.currency import base_currency, parse_currency, require_rates, require_rates_on
+from utils.bulk import build_bulk_query, parse_changes, summarize
+from utils.versioning import conflict_response, expected_version, update_row, version_headers
 from datetime import datetime
 
 income_bp = Blueprint('income', __name__)
+income_bp.before_request(use_read_replica)
 
 @income_bp.route('/incomes', methods=['GET'])
 @token_required
 def get_incomes(current_user_id):
     """Get all incomes for current user"""
+    try:
+        fields = parse_fields(Income)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Get query parameters for filtering
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
@@ -30,7 +45,12 @@ def get_incomes(current_user_id):
         except ValueError:
             return jsonify({'error': 'Invalid end_date format'}), 400
     
-    incomes = query.order_by(Income.date.desc()).all()
+    query = query.order_by(Income.date.desc())
+    
+    if fields:
+        return jsonify({'incomes': serialize_rows(query.with_entities(*fields).all(), fields)}), 200
+    
+    incomes = query.all()
     
     return jsonify({
         'incomes': [income.to_dict() for income in incomes]
@@ -38,6 +58,7 @@ def get_incomes(current_user_id):
 
 @income_bp.route('/incomes', methods=['POST'])
 @token_required
+@idempotent
 def create_income(current_user_id):
     """Create a new income"""
     data = request.get_json()
@@ -54,15 +75,25 @@ def create_income(current_user_id):
         except ValueError:
             return jsonify({'error': 'Invalid date format'}), 400
     
+    base = base_currency(current_user_id)
+    try:
+        currency = parse_currency(data.get('currency'), base)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    require_rates(currency, base, income_date)
+    
     # Create income
     income = Income(
         user_id=current_user_id,
         source=data['source'],
         amount=float(data['amount']),
+        currency=currency,
         date=income_date
     )
     
     db.session.add(income)
+    invalidate_snapshots(current_user_id, income.date)
+    record_change(current_user_id, 'income', 'create', row=income)
     db.session.commit()
     
     return jsonify({
@@ -73,33 +104,58 @@ def create_income(current_user_id):
 @income_bp.route('/incomes/<int:income_id>', methods=['PUT'])
 @token_required
 def update_income(current_user_id, income_id):
-    """Update an income"""
-    income = Income.query.filter_by(id=income_id, user_id=current_user_id).first()
+    """Update an income; a version in If-Match or the body makes the edit conditional"""
+    data = request.get_json() or {}
     
-    if not income:
-        return jsonify({'error': 'Income not found'}), 404
-    
-    data = request.get_json()
+    try:
+        version = expected_version(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Update fields
+    # Collect the new values
+    values = {}
     if data.get('amount'):
-        income.amount = float(data['amount'])
+        values['amount'] = float(data['amount'])
     
     if data.get('source'):
-        income.source = data['source']
+        values['source'] = data['source']
+    
+    try:
+        currency = parse_currency(data.get('currency'), None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if currency:
+        values['currency'] = currency
     
     if data.get('date'):
         try:
-            income.date = datetime.fromisoformat(data['date'].replace('Z', '+00:00'))
+            values['date'] = datetime.fromisoformat(data['date'].replace('Z', '+00:00'))
         except ValueError:
             return jsonify({'error': 'Invalid date format'}), 400
     
+    # Snapshots from the date the income moves away from are stale too; the UPDATE returns it
+    income, changed, previous = update_row(
+        Income, current_user_id, income_id, values, version, previous=('date',) if 'date' in values else ()
+    )
+    if income is None:
+        return conflict_response(Income, current_user_id, income_id, 'income')
+    if not changed:
+        return jsonify({
+            'message': 'Income unchanged',
+            'income': income.to_dict()
+        }), 200, version_headers(income)
+    
+    if values.keys() & {'currency', 'date'}:
+        require_rates(income.currency, base_currency(current_user_id), income.date)
+    if values.keys() & {'amount', 'currency', 'date'}:
+        invalidate_snapshots(current_user_id, previous.date if 'date' in values else None, income.date)
+    record_change(current_user_id, 'income', 'update', row=income)
     db.session.commit()
     
     return jsonify({
         'message': 'Income updated successfully',
         'income': income.to_dict()
-    }), 200
+    }), 200, version_headers(income)
 
 @income_bp.route('/incomes/<int:income_id>', methods=['DELETE'])
 @token_required
@@ -111,6 +167,71 @@ def delete_income(current_user_id, income_id):
         return jsonify({'error': 'Income not found'}), 404
     
     db.session.delete(income)
+    invalidate_snapshots(current_user_id, income.date)
+    record_change(current_user_id, 'income', 'delete', data={'id': income_id})
+    record_deletions(current_user_id, 'income', [income_id])
     db.session.commit()
     
     return jsonify({'message': 'Income deleted successfully'}), 200
+
+@income_bp.route('/incomes/bulk', methods=['PATCH'])
+@token_required
+def bulk_update_incomes(current_user_id):
+    """Update many incomes selected by ids or filter in one statement"""
+    data = request.get_json() or {}
+    
+    query, error = build_bulk_query(Income, current_user_id, data, ('source',))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    changes, error = parse_changes(data.get('set'), ('amount', 'source', 'date'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if 'source' in changes and not changes['source']:
+        return jsonify({'error': 'Source cannot be empty'}), 400
+    
+    matched, earliest = summarize(query, Income)
+    if data.get('dry_run'):
+        return jsonify({'dry_run': True, 'matched': matched}), 200
+    if 'date' in changes:
+        require_rates_on(query, Income, base_currency(current_user_id), changes['date'])
+    
+    change = bulk_change_data(query, Income, changes)
+    updated = query.update({**changes, 'version': Income.version + 1}, synchronize_session=False)
+    
+    invalidate_snapshots(current_user_id, earliest, changes.get('date'))
+    record_change(current_user_id, 'income', 'bulk_update', data=change)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Incomes updated successfully',
+        'updated': updated
+    }), 200
+
+@income_bp.route('/incomes/bulk', methods=['DELETE'])
+@token_required
+def bulk_delete_incomes(current_user_id):
+    """Delete many incomes selected by ids or filter in one statement"""
+    data = request.get_json() or {}
+    
+    query, error = build_bulk_query(Income, current_user_id, data, ('source',))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    matched, earliest = summarize(query, Income)
+    if data.get('dry_run'):
+        return jsonify({'dry_run': True, 'matched': matched}), 200
+    
+    change = bulk_change_data(query, Income)
+    deleted = query.delete(synchronize_session=False)
+    
+    invalidate_snapshots(current_user_id, earliest)
+    record_change(current_user_id, 'income', 'bulk_delete', data=change)
+    record_deletions(current_user_id, 'income', change['ids'])
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Incomes deleted successfully',
+        'deleted': deleted
+    }), 200
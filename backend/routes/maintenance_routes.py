@@ -0,0 +1,71 @@
+from flask import Blueprint, request, jsonify
+from datetime import datetime
+
+from models import db, MaintenanceJob, User
+from utils.jwt_helper import revoke_user, token_required
+from utils.maintenance import enqueue
+
+maintenance_bp = Blueprint('maintenance', __name__)
+
+
+@maintenance_bp.route('/user', methods=['DELETE'])
+@token_required
+def delete_account(current_user_id):
+    """Schedule deletion of the current user and all of their data"""
+    user = db.session.get(User, current_user_id)
+    job = enqueue(current_user_id, 'delete_account')
+    # Sign the user out everywhere so no session adds rows while the job deletes them
+    user.deleted_at = user.deleted_at or datetime.utcnow()
+    revoke_user(current_user_id)
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Account deletion scheduled',
+        'job': job.to_dict()
+    }), 202
+
+
+@maintenance_bp.route('/user/purge', methods=['POST'])
+@token_required
+def purge_data(current_user_id):
+    """Schedule deletion of expenses, incomes and savings transactions dated before a date"""
+    data = request.get_json() or {}
+
+    if not data.get('before'):
+        return jsonify({'error': 'before is required'}), 400
+
+    try:
+        before = datetime.fromisoformat(data['before'].replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return jsonify({'error': 'Invalid before format'}), 400
+
+    job = enqueue(current_user_id, 'purge_data', {'before': before.isoformat()})
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Data purge scheduled',
+        'job': job.to_dict()
+    }), 202
+
+
+@maintenance_bp.route('/jobs', methods=['GET'])
+@token_required
+def get_jobs(current_user_id):
+    """Get the current user's maintenance jobs, newest first"""
+    jobs = MaintenanceJob.query.filter_by(account_id=current_user_id).order_by(
+        MaintenanceJob.created_at.desc()
+    ).limit(50).all()
+
+    return jsonify({'jobs': [job.to_dict() for job in jobs]}), 200
+
+
+@maintenance_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_job(current_user_id, job_id):
+    """Get the status and progress of a maintenance job"""
+    job = MaintenanceJob.query.filter_by(id=job_id, account_id=current_user_id).first()
+
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify({'job': job.to_dict()}), 200
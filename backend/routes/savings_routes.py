@@ -4,17 +4,27 @@ from sqlalchemy import func
 
 from models import db, SavingsTransaction
 from utils.jwt_helper import token_required
+from utils.idempotency import idempotent
+from utils.db_routing import use_read_replica
+from utils.fieldsets import parse_fields, serialize_rows
+from utils.ledger_snapshots import invalidate_snapshots
+from utils.change_feed import record_change, bulk_change_data
+from utils.sync import record_deletions
+from utils.currency import base_currency, convert, converted_amount, parse_currency, require_rates_on
+from utils.bulk import build_bulk_query, parse_changes, summarize
 
 savings_bp = Blueprint('savings', __name__)
+savings_bp.before_request(use_read_replica)
 
 
 def _get_all_time_savings(user_id):
-    deposits = db.session.query(func.sum(SavingsTransaction.amount)).filter(
+    base = base_currency(user_id)
+    deposits = db.session.query(func.sum(converted_amount(SavingsTransaction, base))).filter(
         SavingsTransaction.user_id == user_id,
         SavingsTransaction.action == 'deposit'
     ).scalar() or 0
 
-    withdrawals = db.session.query(func.sum(SavingsTransaction.amount)).filter(
+    withdrawals = db.session.query(func.sum(converted_amount(SavingsTransaction, base))).filter(
         SavingsTransaction.user_id == user_id,
         SavingsTransaction.action == 'withdraw'
     ).scalar() or 0
@@ -29,14 +39,15 @@ def _get_all_time_savings(user_id):
 def _get_current_month_savings(user_id):
     now = datetime.utcnow()
     start_of_month = datetime(now.year, now.month, 1)
+    base = base_currency(user_id)
 
-    deposits = db.session.query(func.sum(SavingsTransaction.amount)).filter(
+    deposits = db.session.query(func.sum(converted_amount(SavingsTransaction, base))).filter(
         SavingsTransaction.user_id == user_id,
         SavingsTransaction.action == 'deposit',
         SavingsTransaction.date >= start_of_month
     ).scalar() or 0
 
-    withdrawals = db.session.query(func.sum(SavingsTransaction.amount)).filter(
+    withdrawals = db.session.query(func.sum(converted_amount(SavingsTransaction, base))).filter(
         SavingsTransaction.user_id == user_id,
         SavingsTransaction.action == 'withdraw',
         SavingsTransaction.date >= start_of_month
@@ -54,15 +65,25 @@ def _get_current_month_savings(user_id):
 @token_required
 def get_savings(current_user_id):
     """Get savings transactions and summary"""
-    transactions = SavingsTransaction.query.filter_by(user_id=current_user_id).order_by(
+    try:
+        fields = parse_fields(SavingsTransaction)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = SavingsTransaction.query.filter_by(user_id=current_user_id).order_by(
         SavingsTransaction.date.desc()
-    ).all()
+    )
+    if fields:
+        transactions = serialize_rows(query.with_entities(*fields).all(), fields)
+    else:
+        transactions = [tx.to_dict() for tx in query.all()]
 
     all_time = _get_all_time_savings(current_user_id)
     current_month = _get_current_month_savings(current_user_id)
 
     return jsonify({
         'summary': {
+            'currency': base_currency(current_user_id),
             'all_time': {
                 'total_deposits': round(all_time['deposits'], 2),
                 'total_withdrawals': round(all_time['withdrawals'], 2),
@@ -75,12 +96,13 @@ def get_savings(current_user_id):
                 'label': current_month['month']
             }
         },
-        'transactions': [tx.to_dict() for tx in transactions]
+        'transactions': transactions
     }), 200
 
 
 @savings_bp.route('/savings', methods=['POST'])
 @token_required
+@idempotent
 def create_savings_transaction(current_user_id):
     """Create a savings transaction (deposit or withdraw)"""
     data = request.get_json() or {}
@@ -113,24 +135,108 @@ def create_savings_transaction(current_user_id):
         except ValueError:
             return jsonify({'error': 'Invalid date format'}), 400
 
+    base = base_currency(current_user_id)
+    try:
+        currency = parse_currency(data.get('currency'), base)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    converted = convert(amount, currency, base, tx_date)
     all_time = _get_all_time_savings(current_user_id)
     current_balance = all_time['balance']
 
-    if action == 'withdraw' and amount > current_balance:
+    if action == 'withdraw' and converted > current_balance:
         return jsonify({'error': 'Insufficient savings balance for withdrawal'}), 400
 
     transaction = SavingsTransaction(
         user_id=current_user_id,
         amount=amount,
+        currency=currency,
         action=action,
         description=description,
         date=tx_date
     )
 
     db.session.add(transaction)
+    invalidate_snapshots(current_user_id, tx_date)
+    record_change(current_user_id, 'savings', 'create', row=transaction)
     db.session.commit()
 
     return jsonify({
         'message': 'Savings transaction recorded successfully',
         'transaction': transaction.to_dict()
     }), 201
+
+
+@savings_bp.route('/savings/bulk', methods=['PATCH'])
+@token_required
+def bulk_update_savings_transactions(current_user_id):
+    """Update many savings transactions selected by ids or filter in one statement"""
+    data = request.get_json() or {}
+
+    query, error = build_bulk_query(SavingsTransaction, current_user_id, data, ('action',))
+    if error:
+        return jsonify({'error': error}), 400
+
+    changes, error = parse_changes(data.get('set'), ('amount', 'action', 'description', 'date'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    if 'action' in changes:
+        changes['action'] = (changes['action'] or '').lower()
+        if changes['action'] not in ('deposit', 'withdraw'):
+            return jsonify({'error': "Action must be either 'deposit' or 'withdraw'"}), 400
+
+    matched, earliest = summarize(query, SavingsTransaction)
+    if data.get('dry_run'):
+        return jsonify({'dry_run': True, 'matched': matched}), 200
+    if 'date' in changes:
+        require_rates_on(query, SavingsTransaction, base_currency(current_user_id), changes['date'])
+
+    change = bulk_change_data(query, SavingsTransaction, changes)
+    updated = query.update(changes, synchronize_session=False)
+
+    if _get_all_time_savings(current_user_id)['balance'] < 0:
+        db.session.rollback()
+        return jsonify({'error': 'Update would leave a negative savings balance'}), 400
+
+    invalidate_snapshots(current_user_id, earliest, changes.get('date'))
+    record_change(current_user_id, 'savings', 'bulk_update', data=change)
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Savings transactions updated successfully',
+        'updated': updated
+    }), 200
+
+
+@savings_bp.route('/savings/bulk', methods=['DELETE'])
+@token_required
+def bulk_delete_savings_transactions(current_user_id):
+    """Delete many savings transactions selected by ids or filter in one statement"""
+    data = request.get_json() or {}
+
+    query, error = build_bulk_query(SavingsTransaction, current_user_id, data, ('action',))
+    if error:
+        return jsonify({'error': error}), 400
+
+    matched, earliest = summarize(query, SavingsTransaction)
+    if data.get('dry_run'):
+        return jsonify({'dry_run': True, 'matched': matched}), 200
+
+    change = bulk_change_data(query, SavingsTransaction)
+    deleted = query.delete(synchronize_session=False)
+
+    if _get_all_time_savings(current_user_id)['balance'] < 0:
+        db.session.rollback()
+        return jsonify({'error': 'Deleting these deposits would leave a negative savings balance'}), 400
+
+    invalidate_snapshots(current_user_id, earliest)
+    record_change(current_user_id, 'savings', 'bulk_delete', data=change)
+    record_deletions(current_user_id, 'savings', change['ids'])
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Savings transactions deleted successfully',
+        'deleted': deleted
+    }), 200
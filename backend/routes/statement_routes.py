@@ -0,0 +1,59 @@
+from flask import Blueprint, Response, request, jsonify
+from werkzeug.http import http_date
+
+from models import Statement
+from utils.jwt_helper import token_required
+from utils.db_routing import use_read_replica
+from utils.statements import CONTENT_TYPES, is_closed
+
+statement_bp = Blueprint('statement', __name__)
+statement_bp.before_request(use_read_replica)
+
+# Stored statements never change, so clients and private caches may keep them indefinitely
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+
+@statement_bp.route('/statements', methods=['GET'])
+@token_required
+def get_statements(current_user_id):
+    """List the current user's generated statements, newest month first"""
+    statements = Statement.query.filter_by(user_id=current_user_id).order_by(
+        Statement.year.desc(), Statement.month.desc(), Statement.format
+    ).all()
+
+    return jsonify({
+        'statements': [statement.to_dict() for statement in statements]
+    }), 200
+
+
+@statement_bp.route('/statements/<int:year>/<int:month>', methods=['GET'])
+@token_required
+def get_statement(current_user_id, year, month):
+    """Download a monthly statement as csv, html or pdf (?format=, default csv)"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in CONTENT_TYPES:
+        return jsonify({'error': f'format must be one of: {", ".join(CONTENT_TYPES)}'}), 400
+
+    if not 1 <= month <= 12:
+        return jsonify({'error': 'Invalid year or month'}), 400
+
+    # The content column is deferred: a revalidation is answered without loading it
+    statement = Statement.query.filter_by(user_id=current_user_id, year=year, month=month, format=fmt).first()
+    if not statement:
+        if not is_closed(year, month):
+            return jsonify({'error': 'Statements are available once the month has closed'}), 404
+        return jsonify({'error': 'Statement not found'}), 404
+
+    headers = {
+        'ETag': f'"{statement.etag}"',
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+        'Last-Modified': http_date(statement.created_at)
+    }
+    if request.if_none_match.contains_weak(statement.etag):
+        return Response(status=304, headers=headers)
+
+    filename = f'statement-{year}-{month:02d}.{fmt}'
+    return Response(statement.content, content_type=CONTENT_TYPES[fmt], headers={
+        **headers,
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
@@ -0,0 +1,85 @@
+"""
+Shared fixtures: every test gets a fresh app on its own SQLite files.
+
+Run from backend/ with `python -m pytest`.
+"""
+import os
+import sys
+
+import pytest
+
+# Settings come from the fixtures below, not from a developer's .env
+os.environ['FAST_BOOT'] = 'true'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import db  # noqa: E402
+from utils import categories, currency, forecasting, reporting, sharding, token_denylist  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    """Per-process caches must not leak rows or ids between test databases"""
+    monkeypatch.setattr(categories, '_cache', {})
+    monkeypatch.setattr(currency, '_series', {})
+    monkeypatch.setattr(currency, '_known', (0.0, frozenset()))
+    monkeypatch.setattr(forecasting, '_model_cache', {})
+    monkeypatch.setattr(reporting, '_ledger_cache', reporting.OrderedDict())
+    monkeypatch.setattr(sharding, '_rings', {})
+    monkeypatch.setattr(token_denylist, '_revoked', {})
+    monkeypatch.setattr(token_denylist, '_synced_through', None)
+    monkeypatch.setattr(token_denylist, '_next_sync', 0.0)
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Build an app on tmp_path/primary.db plus the given number of shard and replica files
+
+    `previous_shards` configures the first shard files as the shard list before an ongoing rebalance.
+    """
+    apps = []
+
+    def make(shards=0, replicas=0, previous_shards=0, **config):
+        binds = {f'shard_{index}': f'sqlite:///{tmp_path}/shard_{index}.db' for index in range(shards)}
+        binds.update({f'previous_{index}': f'sqlite:///{tmp_path}/shard_{index}.db' for index in range(previous_shards)})
+        binds.update({f'replica_{index}': f'sqlite:///{tmp_path}/replica_{index}.db' for index in range(replicas)})
+        monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path}/primary.db')
+        monkeypatch.setattr(Config, 'SQLALCHEMY_BINDS', binds)
+        monkeypatch.setattr(Config, 'FAST_BOOT', False)
+        for key, value in config.items():
+            monkeypatch.setattr(Config, key, value)
+        # init_app registers a metadata per bind key; drop the ones earlier apps configured
+        monkeypatch.setattr(db, 'metadatas', {None: db.metadatas[None]})
+
+        app = create_app()
+        app.config['TESTING'] = True
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def register(client):
+    """Register a user and return their Authorization headers"""
+    def register(email='user@example.com', password='secret123', **fields):
+        response = client.post('/api/register', json={'name': 'Test', 'email': email, 'password': password, **fields})
+        assert response.status_code == 201, response.get_json()
+        return {'Authorization': f'Bearer {response.get_json()["token"]}'}
+    return register
@@ -0,0 +1,132 @@
+"""
+Incremental category-month totals must always equal a full recomputation.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event
+
+from models import db, CategorySpend, Expense
+from utils import budget_tracker
+from utils.budget_tracker import get_month_spend, rebuild_spend, record_expense_change
+
+
+def recomputed(user_id=1):
+    """{(category id, year, month): total} summed from the expenses themselves"""
+    totals = defaultdict(float)
+    for expense in Expense.query.filter_by(user_id=user_id):
+        totals[(expense.category_id, expense.date.year, expense.date.month)] += expense.amount
+    return {key: round(total, 6) for key, total in totals.items() if round(total, 6)}
+
+
+def tracked(user_id=1):
+    return {
+        (row.category_id, row.year, row.month): round(row.total, 6)
+        for row in CategorySpend.query.filter_by(user_id=user_id) if round(row.total, 6)
+    }
+
+
+def test_incremental_totals_match_recomputation(app, client, register):
+    headers = register()
+    created = []
+    for index, (category, amount, day) in enumerate([
+        ('Food', 12.5, '2026-03-02'), ('Food', 30, '2026-03-15'), ('Rent', 900, '2026-03-01'),
+        ('Travel', 45.25, '2026-04-03'), ('Food', 8, '2026-04-20'), ('Misc.', 3.75, '2026-02-28'),
+    ]):
+        response = client.post('/api/expenses', json={
+            'category': category, 'amount': amount, 'date': day, 'description': f'#{index}'
+        }, headers=headers)
+        assert response.status_code == 201
+        created.append(response.get_json()['expense']['id'])
+
+    assert client.put(f'/api/expenses/{created[0]}', json={'amount': 20}, headers=headers).status_code == 200
+    assert client.put(f'/api/expenses/{created[1]}', json={
+        'category': 'Travel', 'date': '2026-04-01'
+    }, headers=headers).status_code == 200
+    assert client.delete(f'/api/expenses/{created[2]}', headers=headers).status_code == 200
+    assert client.patch('/api/expenses/bulk', json={
+        'filter': {'category': 'Food'}, 'set': {'category': 'Others'}
+    }, headers=headers).status_code == 200
+    assert client.patch('/api/expenses/bulk', json={
+        'ids': [created[3]], 'set': {'date': '2026-05-10', 'amount': 60}
+    }, headers=headers).status_code == 200
+    assert client.delete('/api/expenses/bulk', json={'ids': [created[5]]}, headers=headers).status_code == 200
+
+    with app.app_context():
+        assert tracked() == recomputed()
+
+
+def test_status_total_covers_categories_without_budgets(client, register):
+    headers = register()
+    client.post('/api/budgets', json={'category': 'Food', 'amount': 100, 'year': 2026, 'month': 3}, headers=headers)
+    for category, amount in [('Food', 40), ('Rent', 800), ('Travel', 60)]:
+        client.post('/api/expenses', json={'category': category, 'amount': amount, 'date': '2026-03-10'}, headers=headers)
+
+    status = client.get('/api/budgets/status?year=2026&month=3', headers=headers).get_json()
+
+    assert status['total_spent'] == 900
+    assert [(budget['category'], budget['spent']) for budget in status['budgets']] == [('Food', 40)]
+
+
+def test_status_does_not_write(app, client, register):
+    headers = register()
+    client.post('/api/budgets', json={'category': 'Rent', 'amount': 500, 'year': 2026, 'month': 6}, headers=headers)
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get('/api/budgets/status?year=2026&month=6', headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200
+    assert response.get_json()['budgets'][0]['spent'] == 0
+    assert {'INSERT', 'UPDATE', 'DELETE'}.isdisjoint(statements)
+
+
+def test_concurrent_first_write_adds_delta_to_the_winning_row(app, register, monkeypatch):
+    register()
+    with app.app_context():
+        expense = Expense(user_id=1, amount=25.0, category_id=1, date=datetime(2026, 7, 4))
+        db.session.add(expense)
+        # Another request seeded the category-month (from a SUM that could not see this expense)
+        with db.engine.begin() as conn:
+            conn.execute(CategorySpend.__table__.insert().values(
+                user_id=1, category_id=1, year=2026, month=7, total=10.0
+            ))
+
+        # This request's UPDATE ran before that row was committed
+        add_to_spend = budget_tracker._add_to_spend
+        calls = []
+
+        def racing_add(*args):
+            calls.append(args)
+            return None if len(calls) == 1 else add_to_spend(*args)
+
+        monkeypatch.setattr(budget_tracker, '_add_to_spend', racing_add)
+        record_expense_change(1, 1, expense.date, 25.0)
+        db.session.commit()
+
+        assert len(calls) == 2
+        assert get_month_spend(1, 2026, 7) == {1: 35.0}
+        assert Expense.query.count() == 1
+
+
+def test_rebuild_spend_matches_recomputation(app, register):
+    register()
+    with app.app_context():
+        db.session.execute(Expense.__table__.insert(), [
+            {'user_id': 1, 'amount': 10.0 + index, 'currency': 'USD', 'category_id': 1 + index % 3,
+             'description': '', 'date': datetime(2026, 1 + index % 4, 1 + index % 27)}
+            for index in range(40)
+        ])
+        rebuild_spend(1)
+        db.session.commit()
+
+        assert tracked() == recomputed()
@@ -0,0 +1,96 @@
+"""
+Bulk endpoints count matches on a dry run, cap id lists at MAX_BULK_IDS and keep category totals and balance
+snapshots in step with the rows they change.
+"""
+import pytest
+
+from models import db, BalanceSnapshot
+from utils.bulk import MAX_BULK_IDS
+from utils.ledger_snapshots import close_periods
+
+EXPENSES = [('Food', 40, '2026-03-02'), ('Food', 15, '2026-03-20'), ('Rent', 800, '2026-03-01'), ('Food', 9, '2026-04-11')]
+
+
+@pytest.fixture
+def headers(client, register):
+    headers = register()
+    for category in ('Food', 'Rent'):
+        client.post('/api/budgets', json={'category': category, 'amount': 1000, 'year': 2026, 'month': 3},
+                    headers=headers)
+    for category, amount, day in EXPENSES:
+        client.post('/api/expenses', json={'category': category, 'amount': amount, 'date': day}, headers=headers)
+    return headers
+
+
+def spent(client, headers):
+    status = client.get('/api/budgets/status?year=2026&month=3', headers=headers).get_json()
+    return {budget['category']: budget['spent'] for budget in status['budgets']}
+
+
+def test_dry_run_counts_without_writing(client, headers):
+    march_food = {'filter': {'category': 'Food', 'start_date': '2026-03-01', 'end_date': '2026-03-31'}}
+
+    response = client.patch('/api/expenses/bulk', json={**march_food, 'set': {'amount': 1}, 'dry_run': True},
+                            headers=headers)
+    assert response.get_json() == {'dry_run': True, 'matched': 2}
+    response = client.delete('/api/expenses/bulk', json={'ids': [1, 3, 99], 'dry_run': True}, headers=headers)
+    assert response.get_json() == {'dry_run': True, 'matched': 2}
+
+    assert len(client.get('/api/expenses', headers=headers).get_json()['expenses']) == 4
+    assert spent(client, headers) == {'Food': 55, 'Rent': 800}
+
+
+def test_id_list_is_capped(client, headers):
+    ids = list(range(1, MAX_BULK_IDS + 2))
+
+    response = client.delete('/api/expenses/bulk', json={'ids': ids}, headers=headers)
+    assert response.status_code == 400
+    assert str(MAX_BULK_IDS) in response.get_json()['error']
+
+    response = client.delete('/api/expenses/bulk', json={'ids': ids[:MAX_BULK_IDS], 'dry_run': True}, headers=headers)
+    assert response.get_json()['matched'] == 4
+
+
+def test_other_users_rows_are_not_matched(client, register, headers):
+    other = register('other@example.com')
+
+    response = client.delete('/api/expenses/bulk', json={'ids': [1, 2, 3, 4]}, headers=other)
+
+    assert response.get_json()['deleted'] == 0
+    assert len(client.get('/api/expenses', headers=headers).get_json()['expenses']) == 4
+
+
+def snapshot_months(app):
+    with app.test_request_context():
+        return [row.period_end.month for row in BalanceSnapshot.query.order_by(BalanceSnapshot.period_end)]
+
+
+def test_bulk_writes_refresh_category_totals_and_snapshots(app, client, headers):
+    client.post('/api/incomes', json={'source': 'Salary', 'amount': 3000, 'date': '2026-01-15'}, headers=headers)
+    with app.test_request_context():
+        close_periods(1)
+        db.session.commit()
+    assert snapshot_months(app)[:3] == [2, 3, 4]
+
+    response = client.patch('/api/expenses/bulk', json={
+        'filter': {'category': 'Food', 'start_date': '2026-03-01', 'end_date': '2026-03-31'},
+        'set': {'category': 'Rent'}
+    }, headers=headers)
+    assert response.get_json()['updated'] == 2
+    assert spent(client, headers) == {'Food': 0, 'Rent': 855}
+    # Snapshots closing the months after the touched rows are gone; earlier ones never saw them
+    assert snapshot_months(app) == [2, 3]
+
+    response = client.delete('/api/expenses/bulk', json={'filter': {'category': 'Rent'}}, headers=headers)
+    assert response.get_json()['deleted'] == 3
+    assert spent(client, headers) == {'Food': 0, 'Rent': 0}
+
+    response = client.patch('/api/expenses/bulk', json={'ids': [4], 'set': {'date': '2026-03-15', 'amount': 12}},
+                            headers=headers)
+    assert response.get_json()['updated'] == 1
+    assert spent(client, headers) == {'Food': 12, 'Rent': 0}
+
+    with app.test_request_context():
+        close_periods(1)
+        latest = BalanceSnapshot.query.order_by(BalanceSnapshot.period_end.desc()).first()
+        assert (latest.income_total, latest.expense_total) == (3000, 12)
@@ -0,0 +1,111 @@
+"""
+Categories are per-user rows; expenses and budgets follow them by id through renames and reassignment.
+"""
+from tests.test_budgets import recomputed, tracked
+
+
+def categories(client, headers):
+    return {row['name']: row['id'] for row in client.get('/api/categories', headers=headers).get_json()['categories']}
+
+
+def add_expense(client, headers, category, amount, day='2026-03-05'):
+    response = client.post('/api/expenses', json={'category': category, 'amount': amount, 'date': day},
+                           headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['expense']
+
+
+def test_create_rename_and_delete(client, register):
+    headers = register()
+    assert list(categories(client, headers)) == ['Food', 'Rent', 'Travel', 'Misc.', 'Others']
+
+    response = client.post('/api/categories', json={'name': '  Pets '}, headers=headers)
+    assert response.status_code == 201
+    pets = response.get_json()['category']['id']
+    assert client.post('/api/categories', json={'name': 'Pets'}, headers=headers).status_code == 400
+    assert client.post('/api/categories', json={'name': ''}, headers=headers).status_code == 400
+    assert client.post('/api/categories', json={'name': 'x' * 51}, headers=headers).status_code == 400
+    # New names are accepted by the expense routes right away
+    assert add_expense(client, headers, 'Pets', 20)['category_id'] == pets
+
+    assert client.put(f'/api/categories/{pets}', json={'name': 'Food'}, headers=headers).status_code == 400
+    assert client.put(f'/api/categories/{pets}', json={'name': 'Animals'}, headers=headers).status_code == 200
+    assert categories(client, headers)['Animals'] == pets
+
+    # Another user can neither see nor change them
+    other = register('other@example.com')
+    assert 'Animals' not in categories(client, other)
+    assert client.put(f'/api/categories/{pets}', json={'name': 'Mine'}, headers=other).status_code == 404
+    assert client.delete(f'/api/categories/{pets}', headers=other).status_code == 404
+
+    unused = client.post('/api/categories', json={'name': 'Unused'}, headers=headers).get_json()['category']['id']
+    assert client.delete(f'/api/categories/{unused}', headers=headers).status_code == 200
+    assert 'Unused' not in categories(client, headers)
+    assert client.post('/api/expenses', json={'category': 'Unused', 'amount': 1, 'date': '2026-03-05'},
+                       headers=headers).status_code == 400
+
+
+def test_rename_restamps_expenses_for_sync(client, register):
+    headers = register()
+    expense = add_expense(client, headers, 'Food', 12)
+    watermark = client.get('/api/sync', headers=headers).get_json()['watermark']
+
+    food = categories(client, headers)['Food']
+    assert client.put(f'/api/categories/{food}', json={'name': 'Groceries'}, headers=headers).status_code == 200
+
+    # The sync overlap window would resend the row anyway; compare timestamps instead
+    synced = client.get(f'/api/sync?since={watermark}', headers=headers).get_json()['expenses']
+    assert [(row['id'], row['category']) for row in synced] == [(expense['id'], 'Groceries')]
+    assert synced[0]['updated_at'] > expense['updated_at']
+    listed = client.get('/api/expenses', headers=headers).get_json()['expenses']
+    assert [(row['category'], row['category_id']) for row in listed] == [('Groceries', food)]
+
+
+def test_delete_with_reassign(app, client, register):
+    headers = register()
+    ids = categories(client, headers)
+    moved = [add_expense(client, headers, 'Travel', amount, day)
+             for amount, day in ((30, '2026-03-05'), (70, '2026-04-02'))]
+    add_expense(client, headers, 'Food', 5)
+    assert client.post('/api/budgets', json={'category': 'Travel', 'amount': 150, 'year': 2026, 'month': 4},
+                       headers=headers).status_code == 201
+
+    response = client.delete(f"/api/categories/{ids['Travel']}", headers=headers)
+    assert response.status_code == 400
+    assert 'reassign_to' in response.get_json()['error']
+    for reassign_to in ('abc', str(ids['Travel']), '9999'):
+        response = client.delete(f"/api/categories/{ids['Travel']}?reassign_to={reassign_to}", headers=headers)
+        assert response.status_code == 400
+
+    # A month budgeted under both categories has to be resolved first
+    assert client.post('/api/budgets', json={'category': 'Food', 'amount': 50, 'year': 2026, 'month': 4},
+                       headers=headers).status_code == 201
+    response = client.delete(f"/api/categories/{ids['Travel']}?reassign_to={ids['Food']}", headers=headers)
+    assert response.status_code == 400
+    assert '2026-04' in response.get_json()['error']
+    budgets = client.get('/api/budgets?year=2026&month=4', headers=headers).get_json()['budgets']
+    food_budget = next(budget['id'] for budget in budgets if budget['category'] == 'Food')
+    assert client.delete(f'/api/budgets/{food_budget}', headers=headers).status_code == 200
+
+    since = client.get('/api/changes?since=0', headers=headers).get_json()['last_seq']
+    response = client.delete(f"/api/categories/{ids['Travel']}?reassign_to={ids['Food']}", headers=headers)
+    assert response.status_code == 200
+    assert 'Travel' not in categories(client, headers)
+
+    expenses = client.get('/api/expenses', headers=headers).get_json()['expenses']
+    assert {row['category'] for row in expenses} == {'Food'}
+    assert all(row['version'] == 2 for row in expenses if row['id'] in {expense['id'] for expense in moved})
+    budgets = client.get('/api/budgets?year=2026&month=4', headers=headers).get_json()['budgets']
+    assert [(budget['category'], budget['month']) for budget in budgets] == [('Food', 4)]
+    status = client.get('/api/budgets/status?year=2026&month=4', headers=headers).get_json()
+    assert status['budgets'][0]['spent'] == 70
+
+    changes = client.get(f'/api/changes?since={since}', headers=headers).get_json()['changes']
+    assert [(change['entity'], change['op']) for change in changes] == [
+        ('expense', 'bulk_update'), ('category', 'delete')
+    ]
+    assert sorted(changes[0]['data']['ids']) == sorted(expense['id'] for expense in moved)
+    assert changes[0]['data']['set']['category'] == 'Food'
+
+    with app.app_context():
+        assert tracked() == recomputed()
@@ -0,0 +1,40 @@
+"""
+The change stream takes a short-lived, stream-only token in its URL, never an access token.
+"""
+
+
+def stream_url(token):
+    return f'/api/changes/stream?since=0&token={token}'
+
+
+def test_stream_accepts_a_stream_token(client, register):
+    headers = register()
+    stream_token = client.post('/api/changes/stream-token', headers=headers).get_json()['stream_token']
+
+    response = client.get(stream_url(stream_token))
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+
+def test_access_token_is_rejected_in_the_url(client, register):
+    access_token = register()['Authorization'].split(' ')[1]
+
+    assert client.get(stream_url(access_token)).status_code == 401
+
+
+def test_stream_token_only_opens_the_stream(client, register):
+    headers = register()
+    stream_token = client.post('/api/changes/stream-token', headers=headers).get_json()['stream_token']
+
+    assert client.get('/api/expenses', headers={'Authorization': f'Bearer {stream_token}'}).status_code == 401
+
+
+def test_stream_token_expires(make_app):
+    app = make_app(CHANGE_STREAM_TOKEN_SECONDS=-1)
+    client = app.test_client()
+    response = client.post('/api/register', json={'name': 'Test', 'email': 'a@example.com', 'password': 'secret123'})
+    headers = {'Authorization': f'Bearer {response.get_json()["token"]}'}
+    stream_token = client.post('/api/changes/stream-token', headers=headers).get_json()['stream_token']
+
+    assert client.get(stream_url(stream_token)).status_code == 401
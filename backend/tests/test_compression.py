@@ -0,0 +1,64 @@
+"""
+Large responses are compressed as the client asks; list endpoints return only the ?fields= requested.
+"""
+import gzip
+import json
+
+import pytest
+
+from utils import compression
+
+
+@pytest.fixture
+def expenses(client, register):
+    headers = register()
+    for day in range(1, 21):
+        client.post('/api/expenses', json={
+            'category': 'Food', 'amount': day, 'description': f'Groceries run {day}', 'date': f'2026-03-{day:02d}'
+        }, headers=headers)
+    return headers
+
+
+def test_large_response_is_gzipped(client, expenses, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+
+    response = client.get('/api/expenses', headers={**expenses, 'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert len(json.loads(gzip.decompress(response.data))['expenses']) == 20
+
+
+def test_small_or_unaccepted_responses_are_left_alone(client, expenses):
+    small = client.get('/api/expenses?fields=id&end_date=2026-03-01', headers={**expenses, 'Accept-Encoding': 'gzip'})
+    assert small.status_code == 200
+    assert 'Content-Encoding' not in small.headers
+    assert small.get_json() == {'expenses': [{'id': 1}]}
+
+    plain = client.get('/api/expenses', headers={**expenses, 'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert len(plain.get_json()['expenses']) == 20
+
+
+def test_minimum_size_is_configurable(make_app):
+    client = make_app(COMPRESS_MIN_SIZE=10).test_client()
+
+    response = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data))['status']
+
+
+def test_fields_selects_columns_and_derived_fields(client, expenses):
+    rows = client.get('/api/expenses?fields=amount,category,date,amount', headers=expenses).get_json()['expenses']
+
+    assert rows[0] == {'amount': 20, 'category': 'Food', 'date': '2026-03-20T00:00:00'}
+    assert all(row.keys() == {'amount', 'category', 'date'} for row in rows)
+
+
+@pytest.mark.parametrize('path', ['/api/expenses', '/api/incomes', '/api/savings'])
+def test_unknown_fields_are_rejected(client, register, path):
+    response = client.get(f'{path}?fields=id,password', headers=register())
+
+    assert response.status_code == 400
+    assert 'Unknown fields: password' in response.get_json()['error']
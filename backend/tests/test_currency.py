@@ -0,0 +1,75 @@
+"""
+Every stored amount converts to the base currency at a rate on or before its date.
+"""
+from datetime import date
+
+import pytest
+
+from models import db, FxRate
+from utils.currency import MissingRateError, convert
+
+FIRST_RATE = date(2026, 1, 1)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([
+            FxRate(currency='USD', date=FIRST_RATE, rate=1.0),
+            FxRate(currency='EUR', date=FIRST_RATE, rate=0.9),
+        ])
+        db.session.commit()
+    return app
+
+
+def test_convert_raises_before_the_first_rate(app):
+    with app.app_context():
+        assert convert(9.0, 'EUR', 'USD', date(2026, 2, 1)) == pytest.approx(10.0)
+        with pytest.raises(MissingRateError, match='EUR on or before 2025-12-31'):
+            convert(9.0, 'EUR', 'USD', date(2025, 12, 31))
+
+
+def test_write_without_a_rate_is_rejected(client, register):
+    headers = register()
+
+    for path, body in [
+        ('/api/expenses', {'category': 'Food', 'amount': 5, 'currency': 'EUR', 'date': '2025-12-31'}),
+        ('/api/incomes', {'source': 'Salary', 'amount': 5, 'currency': 'EUR', 'date': '2025-12-31'}),
+        ('/api/savings', {'action': 'deposit', 'amount': 5, 'currency': 'EUR', 'date': '2025-12-31'}),
+    ]:
+        response = client.post(path, json=body, headers=headers)
+        assert response.status_code == 400
+        assert 'No exchange rate for EUR' in response.get_json()['error']
+
+    assert client.get('/api/expenses', headers=headers).get_json()['expenses'] == []
+    assert client.post('/api/expenses', json={
+        'category': 'Food', 'amount': 5, 'currency': 'EUR', 'date': '2026-01-01'
+    }, headers=headers).status_code == 201
+
+
+def test_moving_rows_before_their_rates_is_rejected(client, register):
+    headers = register()
+    expense = client.post('/api/expenses', json={
+        'category': 'Food', 'amount': 5, 'currency': 'EUR', 'date': '2026-02-01'
+    }, headers=headers).get_json()['expense']
+
+    assert client.put(f'/api/expenses/{expense["id"]}', json={'date': '2025-06-01'}, headers=headers).status_code == 400
+    assert client.patch('/api/expenses/bulk', json={
+        'ids': [expense['id']], 'set': {'date': '2025-06-01'}
+    }, headers=headers).status_code == 400
+
+    expenses = client.get('/api/expenses', headers=headers).get_json()['expenses']
+    assert [item['date'][:10] for item in expenses] == ['2026-02-01']
+
+
+def test_base_currency_change_needs_rates_for_every_row(client, register):
+    headers = register()
+    # Stored in the base currency, so it needed no rate until the base changes
+    client.post('/api/incomes', json={'source': 'Salary', 'amount': 100, 'date': '2025-06-01'}, headers=headers)
+
+    response = client.patch('/api/user', json={'base_currency': 'EUR'}, headers=headers)
+
+    assert response.status_code == 400
+    assert 'on or before 2025-06-01' in response.get_json()['error']
+    assert client.get('/api/user', headers=headers).get_json()['user']['base_currency'] == 'USD'
@@ -0,0 +1,90 @@
+"""
+Spending models are fitted from SQL aggregates and always read and written on the primary.
+"""
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from models import db, SpendingModel
+from utils import forecasting
+from utils.forecasting import BUCKET_EDGES
+from tests.test_replicas import replicate
+
+AMOUNTS = [0.005, 3.3, 3.7, 12.5, 48, 48, 250, 999.9, 2.5e7]
+
+
+def add_past_expenses(client, headers):
+    now = datetime.utcnow()
+    for index, amount in enumerate(AMOUNTS):
+        month = (now.month - 2 - index % 3) % 12 + 1
+        year = now.year - (1 if month >= now.month else 0)
+        response = client.post('/api/expenses', json={
+            'category': 'Food', 'amount': amount, 'date': f'{year}-{month:02d}-10'
+        }, headers=headers)
+        assert response.status_code == 201
+
+
+def test_histogram_matches_the_raw_amounts(app, client, register):
+    headers = register()
+    add_past_expenses(client, headers)
+
+    assert client.get('/api/analytics/forecast', headers=headers).status_code == 200
+
+    with app.app_context():
+        model = SpendingModel.query.one()
+    expected, _ = np.histogram(np.clip(AMOUNTS, BUCKET_EDGES[0], BUCKET_EDGES[-1]), bins=BUCKET_EDGES)
+    assert json.loads(model.histogram) == expected.tolist()
+    assert model.month_sum == pytest.approx(sum(AMOUNTS))
+
+
+def test_models_are_never_read_from_the_replica(make_app, tmp_path, register, monkeypatch):
+    app = make_app(replicas=1)
+    client = app.test_client()
+    headers = register()
+    add_past_expenses(client, headers)
+    replicate(app, tmp_path)
+
+    statements = []
+    with app.app_context():
+        replica = db.engines['replica_0']
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(replica, 'before_cursor_execute', record)
+    try:
+        for _ in range(2):
+            # A worker that has not cached the user's models yet
+            monkeypatch.setattr(forecasting, '_model_cache', {})
+            assert client.get('/api/analytics/forecast', headers=headers).status_code == 200
+    finally:
+        event.remove(replica, 'before_cursor_execute', record)
+
+    assert statements
+    assert not any('spending_models' in statement for statement in statements)
+    with app.app_context():
+        assert SpendingModel.query.one().month_sum == pytest.approx(sum(AMOUNTS))
+
+
+def test_writes_to_closed_months_refit_the_models(client, register):
+    headers = register()
+    add_past_expenses(client, headers)
+
+    def food_mean():
+        forecast = client.get('/api/analytics/forecast', headers=headers).get_json()['forecast']
+        return next((row['historical_mean'] for row in forecast['categories'] if row['category'] == 'Food'), None)
+
+    before = food_mean()
+    expenses = client.get('/api/expenses', headers=headers).get_json()['expenses']
+    target = next(expense for expense in expenses if expense['amount'] == 250)
+
+    assert client.put(f'/api/expenses/{target["id"]}', json={'amount': 550}, headers=headers).status_code == 200
+    edited = food_mean()
+    assert edited > before
+    assert edited * 3 == pytest.approx(before * 3 + 300)
+
+    assert client.delete('/api/expenses/bulk', json={'filter': {'category': 'Food'}}, headers=headers).status_code == 200
+    assert food_mean() is None
@@ -0,0 +1,53 @@
+"""
+A write made with an Idempotency-Key commits together with its stored response.
+"""
+import pytest
+
+from models import db
+
+EXPENSE = {'category': 'Food', 'amount': 12.5, 'date': '2026-03-05'}
+
+
+def expense_count(client, headers):
+    return len(client.get('/api/expenses', headers=headers).get_json()['expenses'])
+
+
+def test_retry_replays_the_stored_response(client, register):
+    headers = {**register(), 'Idempotency-Key': 'abc'}
+
+    first = client.post('/api/expenses', json=EXPENSE, headers=headers)
+    retry = client.post('/api/expenses', json=EXPENSE, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert expense_count(client, headers) == 1
+
+
+def test_crash_before_storing_the_response_commits_nothing(client, register, monkeypatch):
+    headers = {**register(), 'Idempotency-Key': 'abc'}
+
+    def crash(*args, **kwargs):
+        raise RuntimeError('worker died')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, 'merge', crash)
+        with pytest.raises(RuntimeError):
+            client.post('/api/expenses', json=EXPENSE, headers=headers)
+
+    assert expense_count(client, headers) == 0
+    # Neither the expense nor a stuck in-flight claim was committed, so the retry goes through
+    retry = client.post('/api/expenses', json=EXPENSE, headers=headers)
+    assert retry.status_code == 201
+    assert 'Idempotent-Replayed' not in retry.headers
+    assert expense_count(client, headers) == 1
+
+
+def test_rejected_request_is_replayed_too(client, register):
+    headers = {**register(), 'Idempotency-Key': 'abc'}
+
+    first = client.post('/api/expenses', json={**EXPENSE, 'category': 'Nope'}, headers=headers)
+    retry = client.post('/api/expenses', json={**EXPENSE, 'category': 'Nope'}, headers=headers)
+
+    assert first.status_code == retry.status_code == 400
+    assert retry.headers['Idempotent-Replayed'] == 'true'
@@ -0,0 +1,47 @@
+"""
+Account deletion signs the user out everywhere and leaves no rows behind.
+"""
+from datetime import datetime
+
+import pytest
+
+from models import db, Budget, Expense, User
+from utils import maintenance
+from utils.maintenance import claim_next, run_job
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(TOKEN_DENYLIST_SYNC_SECONDS=0)
+
+
+def test_deletion_request_revokes_every_session(client, register):
+    headers = register(email='gone@example.com', password='secret123')
+    login = client.post('/api/login', json={'email': 'gone@example.com', 'password': 'secret123'}).get_json()
+    other = {'Authorization': f'Bearer {login["token"]}'}
+
+    assert client.delete('/api/user', headers=headers).status_code == 202
+
+    assert client.get('/api/expenses', headers=other).status_code == 401
+    assert client.post('/api/token/refresh', json={'refresh_token': login['refresh_token']}).status_code == 401
+    assert client.post('/api/login', json={'email': 'gone@example.com', 'password': 'secret123'}).status_code == 401
+
+
+def test_final_pass_removes_rows_added_behind_the_job(app, client, register, monkeypatch):
+    headers = register()
+    client.post('/api/expenses', json={'category': 'Food', 'amount': 5, 'date': '2026-03-05'}, headers=headers)
+    client.post('/api/budgets', json={'category': 'Food', 'amount': 100, 'year': 2026, 'month': 3}, headers=headers)
+    assert client.delete('/api/user', headers=headers).status_code == 202
+
+    def late_write(seconds):
+        # A request that authenticated before the revocation commits after the expenses batch
+        db.session.add(Expense(user_id=1, amount=7.0, category_id=1, date=datetime(2026, 3, 6)))
+        db.session.commit()
+
+    monkeypatch.setattr(maintenance.time, 'sleep', late_write)
+    with app.app_context():
+        run_job(claim_next(600), batch_size=1000, pause=0)
+
+        assert db.session.get(User, 1) is None
+        assert Expense.query.filter_by(user_id=1).count() == 0
+        assert Budget.query.filter_by(user_id=1).count() == 0
@@ -0,0 +1,56 @@
+"""
+Upgrading a database created by the first release brings it to the current schema.
+"""
+import sqlite3
+
+from sqlalchemy import func, select
+
+import migrations
+from migrations import SCHEMA_VERSION
+from models import db, Budget, Category, Expense, SchemaVersion
+
+# The schema the first release created, before any migration existed
+BASELINE_SCHEMA = '''
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY, email VARCHAR(120) NOT NULL, password_hash VARCHAR(255) NOT NULL,
+    name VARCHAR(100) NOT NULL, created_at DATETIME
+);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE savings_transactions (
+    id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), amount FLOAT NOT NULL,
+    action VARCHAR(20) NOT NULL, description TEXT, date DATETIME NOT NULL, created_at DATETIME
+);
+CREATE TABLE expenses (
+    id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), amount FLOAT NOT NULL,
+    category VARCHAR(50) NOT NULL, description TEXT, date DATETIME NOT NULL, created_at DATETIME
+);
+CREATE TABLE incomes (
+    id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), source VARCHAR(100) NOT NULL,
+    amount FLOAT NOT NULL, date DATETIME NOT NULL, created_at DATETIME
+);
+INSERT INTO users (id, email, password_hash, name, created_at)
+    VALUES (1, 'old@example.com', 'x', 'Old', '2024-01-01 00:00:00');
+INSERT INTO expenses (user_id, amount, category, date, created_at) VALUES
+    (1, 12.5, 'Food', '2024-02-03 00:00:00', '2024-02-03 00:00:00'),
+    (1, 40, 'Groceries', '2024-02-04 00:00:00', '2024-02-04 00:00:00');
+'''
+
+
+def test_upgrade_from_baseline_schema(make_app, tmp_path):
+    with sqlite3.connect(tmp_path / 'primary.db') as conn:
+        conn.executescript(BASELINE_SCHEMA)
+
+    app = make_app()
+
+    with app.app_context():
+        assert db.session.query(func.max(SchemaVersion.version)).scalar() == SCHEMA_VERSION
+        names = dict(db.session.execute(select(Category.id, Category.name).where(Category.user_id == 1)).all())
+        # Built-in categories plus the custom name already in use, each once
+        assert sorted(names.values()) == ['Food', 'Groceries', 'Misc.', 'Others', 'Rent', 'Travel']
+        expenses = db.session.execute(select(Expense.amount, Expense.category_id).order_by(Expense.id)).all()
+        assert [(amount, names[category_id]) for amount, category_id in expenses] == [(12.5, 'Food'), (40, 'Groceries')]
+        assert db.session.query(Budget).count() == 0
+
+        # Repeating the step (e.g. after a failure further on) adds nothing twice
+        migrations._add_categories()
+        assert db.session.query(Category).filter_by(user_id=1).count() == len(names)
@@ -0,0 +1,62 @@
+"""
+Converting a ledger table to a partitioned one keeps every index and foreign key of the table it replaces.
+"""
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from database.partitions import PARTITIONED_TABLES, _parent_ddl
+from models import db
+
+
+def catalog(table):
+    """pg_indexes and pg_get_constraintdef rows as PostgreSQL reports them for a table created from the models"""
+    dialect = postgresql.dialect()
+    indexes = []
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        definition = str(CreateIndex(index).compile(dialect=dialect))
+        indexes.append((index.name, definition.replace(f'ON {table.name} ', f'ON public.{table.name} USING btree ')))
+    foreign_keys = []
+    for constraint in table.foreign_key_constraints:
+        columns = ', '.join(element.parent.name for element in constraint.elements)
+        referred = ', '.join(element.column.name for element in constraint.elements)
+        definition = f'FOREIGN KEY ({columns}) REFERENCES {constraint.referred_table.name}({referred})'
+        if constraint.ondelete:
+            definition += f' ON DELETE {constraint.ondelete}'
+        foreign_keys.append((f'{table.name}_{columns}_fkey', definition))
+    return indexes, foreign_keys
+
+
+@pytest.mark.parametrize('name', PARTITIONED_TABLES)
+def test_parent_keeps_indexes_and_foreign_keys(name):
+    table = db.metadata.tables[name]
+    indexes, foreign_keys = catalog(table)
+
+    statements = _parent_ddl(name, indexes, foreign_keys)
+
+    assert statements[0] == f'ALTER TABLE {name} ADD PRIMARY KEY (id, date)'
+    for index_name, definition in indexes:
+        assert definition in statements
+    for constraint_name, definition in foreign_keys:
+        assert f'ALTER TABLE {name} ADD CONSTRAINT {constraint_name} {definition}' in statements
+    assert f'CREATE INDEX ix_{name}_user_id_date ON {name} (user_id, date)' in statements
+    # Reads that the partitioned table must keep serving from an index
+    assert any(f'ix_{name}_user_id_updated_at ON public.{name}' in statement for statement in statements)
+
+
+def test_expenses_keep_the_category_index_and_foreign_key():
+    statements = _parent_ddl('expenses', *catalog(db.metadata.tables['expenses']))
+
+    assert any('ix_expenses_user_id_category_id' in statement for statement in statements)
+    assert any('FOREIGN KEY (category_id) REFERENCES categories(id)' in statement for statement in statements)
+    assert any('FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE' in statement for statement in statements)
+
+
+def test_existing_user_date_index_is_not_created_twice():
+    indexes = [
+        ('ix_incomes_user_id_date', 'CREATE INDEX ix_incomes_user_id_date ON public.incomes USING btree (user_id, date)')
+    ]
+
+    statements = _parent_ddl('incomes', indexes, [])
+
+    assert sum('ix_incomes_user_id_date' in statement for statement in statements) == 1
@@ -0,0 +1,101 @@
+"""
+GET routes read from one replica per request, except right after the client's own writes.
+"""
+import sqlite3
+import time
+
+from sqlalchemy import event
+
+from models import db
+
+
+def replicate(app, tmp_path, replicas=1):
+    """Copy the primary database into the replica files, like a replica that has caught up"""
+    with sqlite3.connect(tmp_path / 'primary.db') as primary:
+        for index in range(replicas):
+            with sqlite3.connect(tmp_path / f'replica_{index}.db') as replica:
+                primary.backup(replica)
+    with app.app_context():
+        for index in range(replicas):
+            db.engines[f'replica_{index}'].dispose()
+
+
+def add_expense(client, headers, amount):
+    response = client.post('/api/expenses', json={'category': 'Food', 'amount': amount, 'date': '2026-03-05'},
+                           headers=headers)
+    assert response.status_code == 201
+    return response
+
+
+def amounts(client, headers, **extra):
+    response = client.get('/api/expenses', headers={**headers, **extra})
+    return sorted(expense['amount'] for expense in response.get_json()['expenses'])
+
+
+def test_reads_go_to_the_replica(make_app, tmp_path, register):
+    app = make_app(replicas=1)
+    client = app.test_client()
+    headers = register()
+    add_expense(client, headers, 10)
+    replicate(app, tmp_path)
+
+    # Written to the primary only: the replica has not caught up yet
+    add_expense(client, headers, 20)
+
+    assert amounts(client, headers) == [10]
+
+
+def test_client_reads_its_own_writes(make_app, tmp_path, register):
+    app = make_app(replicas=1)
+    client = app.test_client()
+    headers = register()
+    add_expense(client, headers, 10)
+    replicate(app, tmp_path)
+
+    response = add_expense(client, headers, 20)
+    last_write = response.headers['X-Last-Write']
+
+    assert amounts(client, headers, **{'X-Last-Write': last_write}) == [10, 20]
+    # Reads do not restart the window
+    assert 'X-Last-Write' not in client.get('/api/expenses', headers=headers).headers
+
+
+def test_old_or_malformed_last_write_reads_from_the_replica(make_app, tmp_path, register):
+    app = make_app(replicas=1, READ_YOUR_WRITES_SECONDS=5)
+    client = app.test_client()
+    headers = register()
+    add_expense(client, headers, 10)
+    replicate(app, tmp_path)
+    add_expense(client, headers, 20)
+
+    assert amounts(client, headers, **{'X-Last-Write': f'{time.time() - 60:.3f}'}) == [10]
+    assert amounts(client, headers, **{'X-Last-Write': 'soon'}) == [10]
+
+
+def test_each_request_reads_from_a_single_replica(make_app, tmp_path, register):
+    app = make_app(replicas=2)
+    client = app.test_client()
+    headers = register()
+    add_expense(client, headers, 10)
+    replicate(app, tmp_path, replicas=2)
+
+    used = []
+    with app.app_context():
+        engines = {key: db.engines[key] for key in ('replica_0', 'replica_1')}
+    listeners = {key: lambda *args, key=key: used.append(key) for key in engines}
+    for key, engine in engines.items():
+        event.listen(engine, 'before_cursor_execute', listeners[key])
+    try:
+        seen = set()
+        for _ in range(20):
+            used.clear()
+            response = client.get('/api/analytics/dashboard', headers=headers)
+            assert response.status_code == 200
+            assert len(used) > 1
+            assert len(set(used)) == 1
+            seen.update(used)
+    finally:
+        for key, engine in engines.items():
+            event.remove(engine, 'before_cursor_execute', listeners[key])
+
+    assert seen == {'replica_0', 'replica_1'}
@@ -0,0 +1,157 @@
+"""
+The long-range report matches SQL aggregates, slices one cached ledger per user for every range, rejects
+unusable windows and keeps its ledger cache within a byte budget.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, func
+
+from models import db, Category, Expense, Income, SavingsTransaction
+from utils import reporting
+from utils.ledger_snapshots import totals_before
+from utils.reporting import load_ledger
+
+
+@pytest.mark.parametrize('window', ['0', '-3', '367', '10000000'])
+def test_window_out_of_range_is_rejected(client, register, window):
+    response = client.get(f'/api/analytics/report?window={window}', headers=register())
+
+    assert response.status_code == 400
+    assert 'window' in response.get_json()['error']
+
+
+def test_ledger_cache_is_bounded_by_bytes(make_app):
+    app = make_app(REPORT_CACHE_BYTES=2000)
+    client = app.test_client()
+    for index in range(3):
+        token = client.post('/api/register', json={
+            'name': 'Test', 'email': f'user{index}@example.com', 'password': 'secret123'
+        }).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        for amount in range(60):
+            client.post('/api/expenses', json={'category': 'Food', 'amount': amount + 1, 'date': '2026-03-05'},
+                        headers=headers)
+
+    with app.test_request_context():
+        ledgers = [load_ledger(user_id) for user_id in (1, 2, 3)]
+        assert 1000 < ledgers[0].nbytes <= 2000
+
+        # Only the most recent ledgers that fit stay cached
+        assert [key[0] for key in reporting._ledger_cache] == [3]
+        assert load_ledger(3) is ledgers[2]
+        assert load_ledger(1) is not ledgers[0]
+
+
+LEDGER = {
+    'expenses': [('Food', 12.5, '2025-11-03'), ('Rent', 900, '2025-11-01'), ('Food', 30.25, '2025-12-24'),
+                 ('Travel', 410, '2026-01-15'), ('Food', 8, '2026-01-31T23:30:00'), ('Misc.', 3.75, '2026-03-02')],
+    'incomes': [(2500, '2025-11-01'), (2500, '2025-12-01'), (2600, '2026-02-01')],
+    'savings': [('deposit', 300, '2025-11-20'), ('withdraw', 120, '2026-01-05'), ('deposit', 50, '2026-03-01')],
+}
+
+
+def seed_ledger(client, headers):
+    for category, amount, day in LEDGER['expenses']:
+        assert client.post('/api/expenses', json={'category': category, 'amount': amount, 'date': day},
+                           headers=headers).status_code == 201
+    for amount, day in LEDGER['incomes']:
+        assert client.post('/api/incomes', json={'source': 'Salary', 'amount': amount, 'date': day},
+                           headers=headers).status_code == 201
+    for action, amount, day in LEDGER['savings']:
+        assert client.post('/api/savings', json={'action': action, 'amount': amount, 'date': day},
+                           headers=headers).status_code == 201
+
+
+def sql_aggregates(user_id, start=None, end=None):
+    """The same report figures from GROUP BY queries: {(category, 'YYYY-MM'): total} and per-month totals"""
+    def grouped(model, *columns, **filters):
+        period = func.strftime('%Y-%m', model.date)
+        query = db.session.query(period, *columns, func.sum(model.amount)).filter(model.user_id == user_id)
+        for column, value in filters.items():
+            query = query.filter(getattr(model, column) == value)
+        if start is not None:
+            query = query.filter(model.date >= start)
+        if end is not None:
+            query = query.filter(model.date <= end)
+        return query.group_by(period, *columns).all()
+
+    names = dict(db.session.query(Category.id, Category.name).filter(Category.user_id == user_id).all())
+    by_category = {(names[id], month): total for month, id, total in grouped(Expense, Expense.category_id)}
+    expenses, income, savings = defaultdict(float), defaultdict(float), defaultdict(float)
+    for (_, month), total in by_category.items():
+        expenses[month] += total
+    for month, total in grouped(Income):
+        income[month] += total
+    for action, sign in (('deposit', 1), ('withdraw', -1)):
+        for month, total in grouped(SavingsTransaction, action=action):
+            savings[month] += sign * total
+    return by_category, expenses, income, savings
+
+
+def assert_matches_sql(report, user_id, start=None, end=None):
+    by_category, expenses, income, savings = sql_aggregates(user_id, start, end)
+    periods = report['periods']
+
+    pivot = {
+        (name, month): total
+        for name, totals in report['expenses_by_category'].items()
+        for month, total in zip(periods, totals) if total
+    }
+    assert pivot == pytest.approx(by_category)
+    assert set(report['categories']) == {name for name, _ in by_category}
+    for key, sums in (('expenses', expenses), ('income', income), ('savings', savings)):
+        assert report['totals'][key] == pytest.approx([round(sums.get(month, 0), 2) for month in periods])
+
+    net = [income.get(month, 0) - expenses.get(month, 0) - savings.get(month, 0) for month in periods]
+    assert report['net'] == pytest.approx([round(value, 2) for value in net])
+    assert report['cumulative_balance'] == pytest.approx(
+        [round(report['opening_balance'] + sum(net[:index + 1]), 2) for index in range(len(net))]
+    )
+
+
+def test_numpy_report_matches_sql_aggregates(app, client, register):
+    headers = register()
+    seed_ledger(client, headers)
+
+    report = client.get('/api/analytics/report', headers=headers).get_json()['report']
+    assert report['periods'] == ['2025-11', '2025-12', '2026-01', '2026-02', '2026-03']
+    with app.app_context():
+        assert_matches_sql(report, 1)
+    assert report['opening_balance'] == 0
+
+    # Other ranges are sliced from the cached ledger, carrying in the balance from before them
+    ranges = [('2025-12-01', '2026-01-31T23:59:59'), ('2026-01-31T23:30:00', '2026-02-28T23:59:59'),
+              ('2026-02-01', None)]
+    for start, end in ranges:
+        query = f'start_date={start}' + (f'&end_date={end}' if end else '')
+        report = client.get(f'/api/analytics/report?{query}', headers=headers).get_json()['report']
+        with app.app_context():
+            start_at = datetime.fromisoformat(start)
+            end_at = datetime.fromisoformat(end) if end else None
+            assert_matches_sql(report, 1, start_at, end_at)
+            before = totals_before(1, start_at)
+        assert report['opening_balance'] == pytest.approx(
+            round(before['income'] - before['expenses'] - before['deposits'] + before['withdrawals'], 2)
+        )
+
+
+def test_report_ranges_reuse_one_ledger_load(app, client, register):
+    headers = register()
+    seed_ledger(client, headers)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for query in ('', 'start_date=2025-12-01', 'start_date=2026-01-01&end_date=2026-02-28', 'period=year'):
+            assert client.get(f'/api/analytics/report?{query}', headers=headers).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert sum('FROM expenses' in statement for statement in statements) == 1
@@ -0,0 +1,176 @@
+"""
+Per-user rows live on the shard the hash ring picks, and rebalancing moves them, renumbering ids taken on the target.
+"""
+from sqlalchemy import select
+
+from database.rebalance import rebalance
+from models import db, Budget, Category, Expense, Tombstone
+from utils.sharding import home_shard, shard_for
+
+
+def register_users(client, count, first=0):
+    headers = []
+    for index in range(first, first + count):
+        response = client.post('/api/register', json={
+            'name': f'User {index}', 'email': f'user{index}@example.com', 'password': 'secret123'
+        })
+        headers.append({'Authorization': f'Bearer {response.get_json()["token"]}'})
+    return headers
+
+
+def add_expenses(client, headers):
+    for index, user_headers in enumerate(headers):
+        for amount in (10, 20):
+            response = client.post('/api/expenses', json={
+                'category': 'Food', 'amount': amount + index, 'date': '2026-03-05'
+            }, headers=user_headers)
+            assert response.status_code == 201
+        client.post('/api/budgets', json={'category': 'Food', 'amount': 100, 'year': 2026, 'month': 3},
+                    headers=user_headers)
+
+
+def rows_on(engine, table, user_id):
+    with engine.connect() as conn:
+        return conn.execute(select(table).where(table.c.user_id == user_id).order_by(table.c.id)).mappings().all()
+
+
+def test_rows_go_to_the_users_shard(make_app):
+    app = make_app(shards=2)
+    client = app.test_client()
+    headers = register_users(client, 6)
+    add_expenses(client, headers)
+
+    with app.app_context():
+        table = Expense.__table__
+        assert {shard_for(user_id) for user_id in range(1, 7)} == {'shard_0', 'shard_1'}
+        for user_id in range(1, 7):
+            shard = shard_for(user_id)
+            other = 'shard_1' if shard == 'shard_0' else 'shard_0'
+            assert len(rows_on(db.engines[shard], table, user_id)) == 2
+            assert rows_on(db.engines[other], table, user_id) == []
+
+    for index, user_headers in enumerate(headers):
+        expenses = client.get('/api/expenses', headers=user_headers).get_json()['expenses']
+        assert sorted(expense['amount'] for expense in expenses) == [10 + index, 20 + index]
+
+
+def test_rebalance_keeps_ids(make_app, tmp_path):
+    app = make_app(shards=1)
+    client = app.test_client()
+    headers = register_users(client, 6)
+    add_expenses(client, headers)
+    before = {
+        index: client.get('/api/expenses', headers=user_headers).get_json()['expenses']
+        for index, user_headers in enumerate(headers)
+    }
+
+    app = make_app(shards=2)
+    with app.app_context():
+        rebalance([f'sqlite:///{tmp_path}/shard_0.db'])
+        moved = [user_id for user_id in range(1, 7) if shard_for(user_id) == 'shard_1']
+        assert moved
+        for user_id in moved:
+            for table in (Expense.__table__, Budget.__table__):
+                assert rows_on(db.engines['shard_0'], table, user_id) == []
+                assert rows_on(db.engines['shard_1'], table, user_id)
+
+    # Tokens from before the split still work and see the same rows under the same ids
+    client = app.test_client()
+    for index, user_headers in enumerate(headers):
+        assert client.get('/api/expenses', headers=user_headers).get_json()['expenses'] == before[index]
+
+    # New rows on the target do not reuse the copied ids
+    user_id = moved[0]
+    response = client.post('/api/expenses', json={'category': 'Food', 'amount': 5, 'date': '2026-03-06'},
+                           headers=headers[user_id - 1])
+    assert response.status_code == 201
+    copied = {expense['id'] for expense in before[user_id - 1]}
+    assert response.get_json()['expense']['id'] > max(copied)
+
+
+def test_rebalance_renumbers_ids_taken_on_the_target(make_app, tmp_path):
+    app = make_app(shards=1)
+    client = app.test_client()
+    headers = register_users(client, 6)
+    add_expenses(client, headers)
+
+    app = make_app(shards=2)
+    with app.app_context():
+        user_id = next(user_id for user_id in range(1, 7) if shard_for(user_id) == 'shard_1')
+        expense = rows_on(db.engines['shard_0'], Expense.__table__, user_id)[0]
+        with db.engines['shard_1'].begin() as conn:
+            conn.execute(Expense.__table__.insert().values(**{**expense, 'user_id': 999}))
+
+        rebalance([f'sqlite:///{tmp_path}/shard_0.db'], user_ids=[user_id])
+
+        assert rows_on(db.engines['shard_0'], Expense.__table__, user_id) == []
+        moved = rows_on(db.engines['shard_1'], Expense.__table__, user_id)
+        assert len(moved) == 2
+        assert expense['id'] not in {row['id'] for row in moved}
+        tombstones = rows_on(db.engines['shard_1'], Tombstone.__table__, user_id)
+        assert [(row['entity'], row['entity_id']) for row in tombstones] == [('expense', expense['id'])]
+
+    expenses = app.test_client().get('/api/expenses', headers=headers[user_id - 1]).get_json()['expenses']
+    assert sorted(row['amount'] for row in expenses) == [10 + user_id - 1, 20 + user_id - 1]
+
+
+def test_rebalance_from_two_shards_to_three(make_app, tmp_path):
+    app = make_app(shards=2)
+    client = app.test_client()
+    headers = register_users(client, 12)
+    add_expenses(client, headers)
+    before = {
+        index: client.get('/api/expenses', headers=user_headers).get_json()['expenses']
+        for index, user_headers in enumerate(headers)
+    }
+    watermark = client.get('/api/sync', headers=headers[0]).get_json()['watermark']
+    with app.app_context():
+        old = {user_id: shard_for(user_id) for user_id in range(1, 13)}
+
+    app = make_app(shards=3, previous_shards=2)
+    client = app.test_client()
+    with app.app_context():
+        moving = [user_id for user_id in range(1, 13) if home_shard(user_id) == 'shard_2']
+        assert {old[user_id] for user_id in moving} == {'shard_0', 'shard_1'}
+        # Until their move is recorded, users are served from their old shard
+        for user_id in range(1, 13):
+            assert shard_for(user_id) == (old[user_id].replace('shard_', 'previous_') if user_id in moving
+                                          else old[user_id])
+    for index, user_headers in enumerate(headers):
+        assert client.get('/api/expenses', headers=user_headers).get_json()['expenses'] == before[index]
+
+    with app.app_context():
+        rebalance([f'sqlite:///{tmp_path}/shard_0.db', f'sqlite:///{tmp_path}/shard_1.db'])
+        target = db.engines['shard_2']
+        for user_id in moving:
+            assert shard_for(user_id) == 'shard_2'
+            assert rows_on(db.engines[old[user_id]], Expense.__table__, user_id) == []
+            # Foreign keys follow renumbered parents
+            categories = {row['id'] for row in rows_on(target, Category.__table__, user_id)}
+            for table in (Expense.__table__, Budget.__table__):
+                rows = rows_on(target, table, user_id)
+                assert rows and {row['category_id'] for row in rows} <= categories
+        with target.connect() as conn:
+            ids = conn.execute(select(Category.__table__.c.id)).scalars().all()
+        assert len(ids) == len(set(ids))
+
+    renumbered = []
+    for index, user_headers in enumerate(headers):
+        expenses = client.get('/api/expenses', headers=user_headers).get_json()['expenses']
+        assert [(row['amount'], row['category']) for row in expenses] == [
+            (row['amount'], row['category']) for row in before[index]
+        ]
+        old_ids = {row['id'] for row in before[index]} - {row['id'] for row in expenses}
+        if old_ids:
+            renumbered.append(index)
+            # Clients syncing drop the old ids and receive the rows again under their new ids
+            payload = client.get(f'/api/sync?since={watermark}', headers=user_headers).get_json()
+            assert set(payload['deleted']['expenses']) == old_ids
+            assert {row['id'] for row in payload['expenses']} == {row['id'] for row in expenses}
+            assert client.get('/api/changes?since=1', headers=user_headers).status_code == 410
+    assert renumbered
+
+    # New accounts created mid-rebalance start on their new shard
+    register_users(client, 6, first=12)
+    with app.app_context():
+        assert all(shard_for(user_id) == home_shard(user_id) for user_id in range(13, 19))
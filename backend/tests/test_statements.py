@@ -0,0 +1,69 @@
+"""
+database/generate_statements.py renders closed months across its process pool, stores each statement once
+and serves the stored bytes as immutable files.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def generate(app):
+    """Run the generator as cron would, against the test database; returns its output"""
+    env = {**os.environ, 'FAST_BOOT': 'true', 'DATABASE_URL': app.config['SQLALCHEMY_DATABASE_URI']}
+    for name in ('DATABASE_SHARD_URLS', 'DATABASE_REPLICA_URLS', 'DATABASE_PREVIOUS_SHARD_URLS'):
+        env.pop(name, None)
+
+    def generate(*args):
+        result = subprocess.run(
+            [sys.executable, os.path.join(BACKEND, 'database', 'generate_statements.py'), *args],
+            env=env, capture_output=True, text=True, timeout=120
+        )
+        assert result.returncode == 0, result.stdout + result.stderr
+        return result.stdout
+
+    return generate
+
+
+def test_pool_generates_each_statement_once(client, register, generate):
+    users = [register(f'user{index}@example.com') for index in range(3)]
+    for amount, headers in enumerate(users[:2], start=1):
+        client.post('/api/expenses', json={'category': 'Food', 'amount': amount * 10, 'date': '2026-03-05'},
+                    headers=headers)
+        client.post('/api/incomes', json={'source': 'Salary', 'amount': 900, 'date': '2026-03-01'}, headers=headers)
+
+    output = generate('--year', '2026', '--month', '3', '--workers', '2', '--chunk-size', '1')
+    assert '3 users, 3 chunks, 2 workers' in output
+    assert 'Done: 6 statements stored, 0 users failed' in output
+
+    listed = client.get('/api/statements', headers=users[0]).get_json()['statements']
+    assert sorted(statement['format'] for statement in listed) == ['csv', 'html', 'pdf']
+    assert client.get('/api/statements', headers=users[2]).get_json()['statements'] == []
+
+    # A re-run (or a resumed one) stores nothing and leaves the issued files alone
+    assert 'Done: 0 statements stored, 0 users failed' in generate('--year', '2026', '--month', '3', '--workers', '2')
+    assert client.get('/api/statements', headers=users[0]).get_json()['statements'] == listed
+
+
+def test_statement_is_served_as_an_immutable_file(client, register, generate):
+    headers = register()
+    client.post('/api/expenses', json={'category': 'Food', 'amount': 42.5, 'description': 'Market', 'date': '2026-03-05'},
+                headers=headers)
+    generate('--year', '2026', '--month', '3', '--workers', '1')
+
+    response = client.get('/api/statements/2026/3?format=csv', headers=headers)
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'Market' in response.get_data(as_text=True)
+
+    revalidated = client.get('/api/statements/2026/3?format=csv',
+                             headers={**headers, 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+    assert client.get('/api/statements/2026/3?format=pdf', headers=headers).data.startswith(b'%PDF')
+    assert client.get('/api/statements/2026/3?format=xls', headers=headers).status_code == 400
+    assert client.get('/api/statements/2026/2', headers=headers).status_code == 404
@@ -0,0 +1,104 @@
+"""
+Clients page through /changes by sequence number and catch up with /sync by watermark; deletes reach both as
+tombstones, and cursors that compaction has outrun get 410.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from database.compact import compact
+from models import db, ChangeLogEntry, Tombstone
+
+
+@pytest.fixture
+def app(make_app):
+    # No overlap window, so a delta contains only what changed after the watermark
+    return make_app(SYNC_OVERLAP_SECONDS=0)
+
+
+def add_expenses(client, headers, count):
+    return [
+        client.post('/api/expenses', json={'category': 'Food', 'amount': amount + 1, 'date': '2026-03-05'},
+                    headers=headers).get_json()['expense']['id']
+        for amount in range(count)
+    ]
+
+
+def age(app, model, column, days):
+    with app.app_context():
+        db.session.execute(update(model).values({column: datetime.utcnow() - timedelta(days=days)}))
+        db.session.commit()
+
+
+def test_changes_page_by_sequence(client, register):
+    headers = register()
+    add_expenses(client, headers, 5)
+
+    pages, since = [], 0
+    while True:
+        page = client.get(f'/api/changes?since={since}&limit=2', headers=headers).get_json()
+        pages.append([change['seq'] for change in page['changes']])
+        if not page['has_more']:
+            break
+        since = pages[-1][-1]
+
+    assert pages == [[1, 2], [3, 4], [5]]
+    assert page['last_seq'] == 5
+    assert client.get('/api/changes?since=-1', headers=headers).status_code == 400
+
+
+def test_sync_returns_changed_rows_and_tombstones(client, register):
+    headers = register()
+    first, second, third, _ = add_expenses(client, headers, 4)
+    full = client.get('/api/sync', headers=headers).get_json()
+    assert full['full'] and len(full['expenses']) == 4
+
+    client.put(f'/api/expenses/{first}', json={'amount': 99}, headers=headers)
+    client.delete(f'/api/expenses/{second}', headers=headers)
+    client.delete('/api/expenses/bulk', json={'ids': [third]}, headers=headers)
+    delta = client.get(f'/api/sync?since={full["watermark"]}', headers=headers).get_json()
+
+    assert not delta['full']
+    assert [(row['id'], row['amount']) for row in delta['expenses']] == [(first, 99)]
+    assert sorted(delta['deleted']['expenses']) == [second, third]
+    assert delta['deleted']['incomes'] == delta['deleted']['savings'] == []
+
+    # The next delta starts from the new watermark and is empty
+    empty = client.get(f'/api/sync?since={delta["watermark"]}', headers=headers).get_json()
+    assert empty['expenses'] == [] and empty['deleted']['expenses'] == []
+
+
+def test_compacted_change_log_expires_old_cursors(app, client, register):
+    headers = register()
+    add_expenses(client, headers, 3)
+    age(app, ChangeLogEntry, 'created_at', app.config['CHANGE_LOG_RETENTION_DAYS'] + 1)
+    add_expenses(client, headers, 1)
+
+    with app.app_context():
+        compact()
+
+    response = client.get('/api/changes?since=0', headers=headers)
+    assert response.status_code == 410
+    assert response.get_json()['last_seq'] == 4
+
+    # A client that resynced resumes from last_seq; one that had seen the purged entries is unaffected
+    assert client.get('/api/changes?since=3', headers=headers).get_json()['changes'][0]['seq'] == 4
+    assert client.get('/api/changes?since=4', headers=headers).get_json()['changes'] == []
+
+
+def test_sync_before_the_tombstone_window_is_expired(app, client, register):
+    headers = register()
+    expense_id, = add_expenses(client, headers, 1)
+    client.delete(f'/api/expenses/{expense_id}', headers=headers)
+    days = app.config['SYNC_TOMBSTONE_RETENTION_DAYS'] + 1
+    age(app, Tombstone, 'deleted_at', days)
+
+    with app.app_context():
+        compact()
+        assert Tombstone.query.count() == 0
+
+    stale = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    assert client.get(f'/api/sync?since={stale}', headers=headers).status_code == 410
+    assert client.get('/api/sync?since=yesterday', headers=headers).status_code == 400
+    assert client.get('/api/sync', headers=headers).get_json()['expenses'] == []
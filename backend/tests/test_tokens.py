@@ -0,0 +1,88 @@
+"""
+Refresh tokens rotate once each; revocations reach every worker, but only access-token ids are kept in memory.
+"""
+import jwt
+
+from utils import token_denylist
+
+
+def login(client, email='user@example.com'):
+    response = client.post('/api/login', json={'email': email, 'password': 'secret123'})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def bearer(tokens):
+    return {'Authorization': f'Bearer {tokens["token"]}'}
+
+
+def refresh(client, tokens):
+    return client.post('/api/token/refresh', json={'refresh_token': tokens['refresh_token']})
+
+
+def jti(token):
+    return jwt.decode(token, options={'verify_signature': False})['jti']
+
+
+def other_worker(monkeypatch):
+    """Forget this process's deny-list, as a worker that has not seen the revocations would"""
+    monkeypatch.setattr(token_denylist, '_revoked', {})
+    monkeypatch.setattr(token_denylist, '_synced_through', None)
+    monkeypatch.setattr(token_denylist, '_next_sync', 0.0)
+
+
+def test_refresh_rotates_the_pair(client, register):
+    register()
+    tokens = login(client)
+
+    response = refresh(client, tokens)
+    assert response.status_code == 200
+    rotated = response.get_json()
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    assert client.get('/api/user', headers=bearer(rotated)).status_code == 200
+    assert refresh(client, rotated).status_code == 200
+
+    # Spent refresh token ids live in the table only
+    assert jti(tokens['refresh_token']) not in token_denylist._revoked
+    assert not token_denylist._revoked
+
+
+def test_reused_refresh_token_is_rejected(client, register, monkeypatch):
+    register()
+    tokens = login(client)
+    assert refresh(client, tokens).status_code == 200
+
+    assert refresh(client, tokens).status_code == 401
+    # Also by a worker that never saw the first use
+    other_worker(monkeypatch)
+    assert refresh(client, tokens).status_code == 401
+    assert not token_denylist._revoked
+
+
+def test_logout_revokes_the_session_everywhere(client, register, monkeypatch):
+    register()
+    tokens, other = login(client), login(client)
+
+    assert client.post('/api/logout', headers=bearer(tokens)).status_code == 200
+    assert client.get('/api/user', headers=bearer(tokens)).status_code == 401
+    assert refresh(client, tokens).status_code == 401
+    # The other session is unaffected
+    assert client.get('/api/user', headers=bearer(other)).status_code == 200
+
+    other_worker(monkeypatch)
+    assert client.get('/api/user', headers=bearer(tokens)).status_code == 401
+    assert set(token_denylist._revoked) == {jti(tokens['token'])}
+
+
+def test_revoke_user_blocks_every_token(client, register, monkeypatch):
+    headers = register()
+    tokens = login(client)
+    stream_token = client.post('/api/changes/stream-token', headers=headers).get_json()['stream_token']
+
+    assert client.delete('/api/user', headers=headers).status_code == 202
+
+    other_worker(monkeypatch)
+    assert client.get('/api/user', headers=bearer(tokens)).status_code == 401
+    assert refresh(client, tokens).status_code == 401
+    assert client.get(f'/api/changes/stream?since=0&token={stream_token}').status_code == 401
+    assert list(token_denylist._revoked) == ['user:1']
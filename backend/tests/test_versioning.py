@@ -0,0 +1,57 @@
+"""
+An edit that changes nothing keeps the row's version and leaves no trace in the change feed;
+one that does moves the replaced values out of the derived totals.
+"""
+import pytest
+
+
+def change_count(client, headers):
+    return len(client.get('/api/changes?since=0', headers=headers).get_json()['changes'])
+
+
+@pytest.mark.parametrize('path, name, body', [
+    ('/api/expenses', 'expense', {'category': 'Food', 'amount': 12.5, 'description': 'Lunch', 'date': '2026-03-05'}),
+    ('/api/incomes', 'income', {'source': 'Salary', 'amount': 900, 'date': '2026-03-01'}),
+])
+def test_edit_without_changes_keeps_the_version(client, register, path, name, body):
+    headers = register()
+    row = client.post(path, json=body, headers=headers).get_json()[name]
+    changes = change_count(client, headers)
+
+    for edit in ({}, {'amount': body['amount']}):
+        response = client.put(f'{path}/{row["id"]}', json=edit, headers=headers)
+        assert response.status_code == 200
+        assert response.headers['ETag'] == '"1"'
+    assert change_count(client, headers) == changes
+
+    # A stale version is still a conflict, even for an empty edit
+    assert client.put(f'{path}/{row["id"]}', json={}, headers={**headers, 'If-Match': '"7"'}).status_code == 409
+
+    response = client.put(f'{path}/{row["id"]}', json={'amount': 1}, headers=headers)
+    assert response.headers['ETag'] == '"2"'
+    assert change_count(client, headers) == changes + 1
+
+
+def test_edit_moves_the_replaced_amount_out_of_budget_totals(client, register):
+    headers = register()
+    for month in (3, 4):
+        client.post('/api/budgets', json={'category': 'Food', 'amount': 100, 'year': 2026, 'month': month}, headers=headers)
+    expense = client.post('/api/expenses', json={'category': 'Food', 'amount': 40, 'date': '2026-03-10'},
+                          headers=headers).get_json()['expense']
+
+    def spent(month):
+        status = client.get(f'/api/budgets/status?year=2026&month={month}', headers=headers).get_json()
+        return status['budgets'][0]['spent']
+
+    client.put(f'/api/expenses/{expense["id"]}', json={'amount': 55}, headers=headers)
+    assert (spent(3), spent(4)) == (55, 0)
+
+    response = client.put(f'/api/expenses/{expense["id"]}', json={'amount': 20, 'date': '2026-04-02'},
+                          headers={**headers, 'If-Match': '"2"'})
+    assert response.headers['ETag'] == '"3"'
+    assert (spent(3), spent(4)) == (0, 20)
+
+    # A stale version leaves the totals alone
+    assert client.put(f'/api/expenses/{expense["id"]}', json={'amount': 1},
+                      headers={**headers, 'If-Match': '"2"'}).status_code == 409
+    assert (spent(3), spent(4)) == (0, 20)
@@ -0,0 +1,168 @@
+"""
+Incremental month-to-date spend tracking for budgets.
+
+Expense write paths report signed amount deltas here so that budget status
+reads one `category_spend` row per category instead of re-summing expenses.
+Totals and deltas are in the user's base currency and, like budgets, are keyed
+by category id, so renaming a category never splits its running total.
+
+The table is complete: every category-month with expenses has a row, created
+by the first write that touches it (or by `rebuild_spend` when totals are
+recomputed wholesale), so reads never have to seed or fall back to a SUM.
+"""
+from datetime import datetime
+from sqlalchemy import func, insert, literal, select, update, extract
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Expense, Budget, CategorySpend, BudgetAlert
+from utils.currency import base_currency, converted_amount
+
+
+def month_bounds(year, month):
+    """Return the [start, end) datetimes of a calendar month"""
+    start = datetime(year, month, 1)
+    if month == 12:
+        end = datetime(year + 1, 1, 1)
+    else:
+        end = datetime(year, month + 1, 1)
+    return start, end
+
+
+def _sum_expenses(user_id, category_id, year, month):
+    """Full recomputation of a category's spend for one month"""
+    start, end = month_bounds(year, month)
+    return db.session.query(func.sum(converted_amount(Expense, base_currency(user_id)))).filter(
+        Expense.user_id == user_id,
+        Expense.category_id == category_id,
+        Expense.date >= start,
+        Expense.date < end
+    ).scalar() or 0
+
+
+def _seed_spend(user_id, category_id, year, month):
+    """Create the running total for a category-month from existing expenses;
+    returns None when a concurrent request created it first"""
+    # Flush so pending expense changes are included in the seeding SUM
+    db.session.flush()
+    row = CategorySpend(
+        user_id=user_id,
+        category_id=category_id,
+        year=year,
+        month=month,
+        total=_sum_expenses(user_id, category_id, year, month)
+    )
+    try:
+        # A savepoint keeps the request's other changes when the insert loses the race
+        with db.session.begin_nested():
+            db.session.add(row)
+    except IntegrityError:
+        return None
+    return row
+
+
+def _add_to_spend(user_id, category_id, year, month, delta):
+    """Add a delta to a tracked category-month; returns the new total, or None when it has no row yet"""
+    return db.session.execute(
+        update(CategorySpend)
+        .where(
+            CategorySpend.user_id == user_id,
+            CategorySpend.category_id == category_id,
+            CategorySpend.year == year,
+            CategorySpend.month == month
+        )
+        .values(total=CategorySpend.total + delta, updated_at=datetime.utcnow())
+        .returning(CategorySpend.total)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def get_month_spend(user_id, year, month):
+    """Return {category id: total} for every category with spend in a month"""
+    rows = CategorySpend.query.filter_by(user_id=user_id, year=year, month=month).all()
+    return {row.category_id: row.total for row in rows}
+
+
+def record_expense_change(user_id, category_id, date, delta):
+    """Apply a signed amount delta to a category-month and raise alerts for crossed thresholds"""
+    if not delta:
+        return
+
+    current = _add_to_spend(user_id, category_id, date.year, date.month, delta)
+    if current is None:
+        # First write for this category-month: the seeding SUM already includes the delta
+        row = _seed_spend(user_id, category_id, date.year, date.month)
+        if row is not None:
+            current = row.total
+    if current is None:
+        # Another request seeded it first, from a SUM that could not see this change
+        current = _add_to_spend(user_id, category_id, date.year, date.month, delta)
+
+    check_thresholds(user_id, category_id, date.year, date.month, current - delta, current)
+
+
+def check_thresholds(user_id, category_id, year, month, previous, current, budget=None):
+    """Record an alert for every budget threshold crossed between previous and current spend"""
+    if current <= previous:
+        return
+
+    if budget is None:
+        budget = Budget.query.filter_by(user_id=user_id, category_id=category_id, year=year, month=month).first()
+    if not budget or budget.amount <= 0:
+        return
+
+    for threshold in sorted({budget.alert_threshold, 100.0}):
+        limit = budget.amount * threshold / 100
+        if not previous < limit <= current:
+            continue
+
+        already_alerted = BudgetAlert.query.filter_by(budget_id=budget.id, threshold=threshold).first()
+        if not already_alerted:
+            db.session.add(BudgetAlert(
+                user_id=user_id,
+                budget_id=budget.id,
+                threshold=threshold,
+                spent=current
+            ))
+
+
+def spend_keys(query):
+    """Distinct (category id, year, month) keys of the expenses selected by a query"""
+    rows = query.with_entities(
+        Expense.category_id,
+        extract('year', Expense.date),
+        extract('month', Expense.date)
+    ).distinct().all()
+    return {(id, int(year), int(month)) for id, year, month in rows}
+
+
+def refresh_spend(user_id, keys):
+    """Recompute category-month totals after a set-based write and raise any crossed alerts"""
+    for category_id, year, month in keys:
+        query = CategorySpend.query.filter_by(user_id=user_id, category_id=category_id, year=year, month=month)
+        row = query.first()
+        if row is None:
+            if _seed_spend(user_id, category_id, year, month) is not None:
+                continue
+            row = query.one()
+
+        previous = row.total
+        row.total = _sum_expenses(user_id, category_id, year, month)
+        check_thresholds(user_id, category_id, year, month, previous, row.total)
+
+
+def rebuild_spend(user_id):
+    """Replace all of a user's category-month totals with ones recomputed from their expenses"""
+    CategorySpend.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+    year, month = extract('year', Expense.date), extract('month', Expense.date)
+    db.session.execute(insert(CategorySpend).from_select(
+        ['user_id', 'category_id', 'year', 'month', 'total', 'updated_at'],
+        select(
+            Expense.user_id,
+            Expense.category_id,
+            year,
+            month,
+            func.coalesce(func.sum(converted_amount(Expense, base_currency(user_id))), 0),
+            literal(datetime.utcnow(), db.DateTime)
+        ).where(Expense.user_id == user_id).group_by(Expense.user_id, Expense.category_id, year, month)
+    ))
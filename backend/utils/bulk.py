@@ -0,0 +1,88 @@
+"""
+Set-based bulk update/delete helpers for the ledger blueprints.
+
+A bulk request selects rows either by `ids` or by a `filter` (a date range
+plus model-specific columns such as category) and is always scoped to the
+current user, so each operation runs as a single UPDATE or DELETE statement.
+"""
+from datetime import datetime
+from sqlalchemy import func
+
+MAX_BULK_IDS = 1000
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def build_bulk_query(model, user_id, data, filter_columns):
+    """Return (query, error) for the rows a bulk request body selects"""
+    ids = data.get('ids')
+    filters = data.get('filter')
+
+    if bool(ids) == bool(filters):
+        return None, 'Provide either a non-empty ids list or a filter'
+
+    query = model.query.filter(model.user_id == user_id)
+
+    if ids:
+        if not isinstance(ids, list) or len(ids) > MAX_BULK_IDS:
+            return None, f'ids must be a list of at most {MAX_BULK_IDS} ids'
+        try:
+            ids = [int(value) for value in ids]
+        except (TypeError, ValueError):
+            return None, 'ids must be integers'
+        return query.filter(model.id.in_(ids)), None
+
+    if not isinstance(filters, dict):
+        return None, 'filter must be an object'
+
+    for key, value in filters.items():
+        if key in ('start_date', 'end_date'):
+            try:
+                bound = _parse_date(value)
+            except ValueError:
+                return None, f'Invalid {key} format'
+            query = query.filter(model.date >= bound if key == 'start_date' else model.date <= bound)
+        elif key in filter_columns:
+            query = query.filter(getattr(model, key) == value)
+        else:
+            return None, f'Unsupported filter: {key}'
+
+    return query, None
+
+
+def parse_changes(values, allowed):
+    """Validate the `set` object of a bulk update; returns (changes, error)"""
+    if not isinstance(values, dict) or not values:
+        return None, 'set must be a non-empty object'
+
+    changes = {}
+    for key, value in values.items():
+        if key not in allowed:
+            return None, f'Field cannot be bulk updated: {key}'
+
+        if key == 'amount':
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None, 'Amount must be a valid number'
+            if value <= 0:
+                return None, 'Amount must be greater than zero'
+        elif key == 'date':
+            try:
+                value = _parse_date(value)
+            except ValueError:
+                return None, 'Invalid date format'
+        elif value is not None:
+            value = str(value)
+
+        changes[key] = value
+
+    return changes, None
+
+
+def summarize(query, model):
+    """Return (matched row count, earliest matched date) with one aggregate query"""
+    count, earliest = query.with_entities(func.count(model.id), func.min(model.date)).one()
+    return count, earliest
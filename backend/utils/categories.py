@@ -0,0 +1,117 @@
+"""
+Per-user expense categories.
+
+Expenses, budgets and the totals derived from them reference `categories` by
+integer id, so a rename only changes the name row. Every user starts with the
+built-in DEFAULT_CATEGORIES and can add, rename and delete their own, so the
+list changes without a deploy. Validating a category name or naming the
+groups of a breakdown reads a per-process copy of the user's categories
+instead of querying: changes made here drop the local copy, other processes
+reload theirs after CATEGORY_CACHE_SECONDS, and a name or id missing from a
+copy forces a reload before it is reported as unknown. Copies are kept per
+shard, since rebalancing may give a moved user's categories new ids.
+"""
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert, update
+
+from models import db, Category, CategorySpend, Expense, SpendingModel
+from utils.sharding import current_shard
+
+DEFAULT_CATEGORIES = ('Food', 'Rent', 'Travel', 'Misc.', 'Others')
+MAX_NAME_LENGTH = 50
+
+# (shard, user_id) -> (expires_at (monotonic), {name: id}, {id: name})
+_cache = {}
+_MAX_CACHED_USERS = 10000
+
+
+def _key(user_id):
+    return current_shard(db.session), user_id
+
+
+def _load(user_id):
+    rows = db.session.query(Category.id, Category.name).filter(
+        Category.user_id == user_id
+    ).order_by(Category.id).all()
+    if len(_cache) >= _MAX_CACHED_USERS:
+        _cache.clear()
+    ttl = current_app.config.get('CATEGORY_CACHE_SECONDS', 60)
+    entry = (time.monotonic() + ttl, {name: id for id, name in rows}, {id: name for id, name in rows})
+    _cache[_key(user_id)] = entry
+    return entry
+
+
+def _lookup(user_id, index, key):
+    entry = _cache.get(_key(user_id))
+    if entry is None or entry[0] <= time.monotonic():
+        entry = _load(user_id)
+    elif key not in entry[index]:
+        # Possibly created or renamed by another process since the copy was loaded
+        entry = _load(user_id)
+    return entry[index].get(key)
+
+
+def category_id(user_id, name):
+    """Id of the user's category with this name, or None"""
+    return _lookup(user_id, 1, name)
+
+
+def category_name(user_id, id):
+    """Name of the user's category with this id, or None"""
+    return _lookup(user_id, 2, id)
+
+
+def category_names(user_id):
+    """The user's category names, oldest first"""
+    entry = _cache.get(_key(user_id))
+    if entry is None or entry[0] <= time.monotonic():
+        entry = _load(user_id)
+    return list(entry[1])
+
+
+def invalidate(user_id):
+    """Drop this process's copy of a user's categories"""
+    _cache.pop(_key(user_id), None)
+
+
+def parse_name(value):
+    """Validate a category name; returns it stripped or raises ValueError"""
+    name = str(value or '').strip()
+    if not name:
+        raise ValueError('Category name is required')
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f'Category name must be at most {MAX_NAME_LENGTH} characters')
+    return name
+
+
+def seed_defaults(user_id):
+    """Give a new user the built-in categories within the current transaction"""
+    now = datetime.utcnow()
+    db.session.execute(insert(Category), [
+        {'user_id': user_id, 'name': name, 'created_at': now} for name in DEFAULT_CATEGORIES
+    ])
+    invalidate(user_id)
+
+
+def rename_category(category, name):
+    """Rename a category and re-stamp its expenses so /sync sends them with the new name"""
+    category.name = name
+    invalidate(category.user_id)
+    # Budgets and running totals are keyed by id and need no change
+    db.session.execute(
+        update(Expense)
+        .where(Expense.user_id == category.user_id, Expense.category_id == category.id)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_category(category):
+    """Delete an unused category and the running totals kept under its id"""
+    for model in (CategorySpend, SpendingModel):
+        model.query.filter_by(user_id=category.user_id, category_id=category.id).delete(synchronize_session=False)
+    db.session.delete(category)
+    invalidate(category.user_id)
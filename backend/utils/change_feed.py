@@ -0,0 +1,89 @@
+"""
+Per-user change feed for delta sync.
+
+Every write in the expense, income and savings blueprints appends a
+`change_log` entry in the same transaction. Sequence numbers come from a
+per-user `change_cursors` row bumped with UPDATE ... RETURNING, whose row lock
+also makes entries commit in sequence order, so a client that has applied
+everything up to `seq` can ask for exactly the entries after it. Entries older
+than CHANGE_LOG_RETENTION_DAYS are purged by database/compact.py.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ChangeCursor, ChangeLogEntry
+
+MAX_CHANGES = 500
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _next_seq(user_id):
+    seq = db.session.execute(
+        update(ChangeCursor)
+        .where(ChangeCursor.user_id == user_id)
+        .values(last_seq=ChangeCursor.last_seq + 1)
+        .returning(ChangeCursor.last_seq)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if seq is not None:
+        return seq
+
+    # First change for this user; a concurrent first write makes the insert fail instead
+    try:
+        with db.session.begin_nested():
+            db.session.add(ChangeCursor(user_id=user_id, last_seq=1))
+        return 1
+    except IntegrityError:
+        return _next_seq(user_id)
+
+
+def record_change(user_id, entity, op, row=None, data=None):
+    """Append a change to the user's feed within the current transaction; returns its seq"""
+    if row is not None:
+        # Flush so a new row has its id and defaults before it is serialized
+        db.session.flush()
+        data = row.to_dict()
+
+    seq = _next_seq(user_id)
+    db.session.add(ChangeLogEntry(
+        user_id=user_id,
+        seq=seq,
+        entity=entity,
+        op=op,
+        data=json.dumps({key: _json_value(value) for key, value in data.items()}, separators=(',', ':'))
+    ))
+    return seq
+
+
+def bulk_change_data(query, model, changes=None):
+    """Feed payload for a set-based write: the affected ids and, for updates, the new values"""
+    data = {'ids': [row_id for (row_id,) in query.with_entities(model.id).all()]}
+    if changes is not None:
+        data['set'] = {key: _json_value(value) for key, value in changes.items()}
+    return data
+
+
+def latest_seq(user_id):
+    return db.session.query(ChangeCursor.last_seq).filter_by(user_id=user_id).scalar() or 0
+
+
+def is_truncated(user_id, since, last_seq):
+    """True when compaction already purged entries the client has not seen"""
+    if since >= last_seq:
+        return False
+    oldest = db.session.query(func.min(ChangeLogEntry.seq)).filter_by(user_id=user_id).scalar()
+    return oldest is None or oldest > since + 1
+
+
+def changes_since(user_id, since, limit=MAX_CHANGES):
+    """Entries with seq > since, oldest first, at most `limit` of them"""
+    return ChangeLogEntry.query.filter(
+        ChangeLogEntry.user_id == user_id,
+        ChangeLogEntry.seq > since
+    ).order_by(ChangeLogEntry.seq).limit(limit).all()
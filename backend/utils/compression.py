@@ -0,0 +1,56 @@
+"""
+Negotiated response compression.
+
+`compress_response` runs as an after_request hook: bodies of at least
+COMPRESS_MIN_SIZE bytes are encoded with brotli (when the optional `brotli`
+package is installed) or gzip, whichever the client's Accept-Encoding prefers.
+"""
+import gzip
+from flask import request, current_app
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript')
+
+
+def _choose_encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def compress_response(response):
+    """Compress large textual responses according to Accept-Encoding"""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+        or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = _choose_encoding()
+    if encoding == 'br':
+        body = brotli.compress(data, quality=current_app.config['COMPRESS_BROTLI_QUALITY'])
+    elif encoding == 'gzip':
+        body = gzip.compress(data, compresslevel=current_app.config['COMPRESS_LEVEL'])
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # The encoded body differs byte for byte from the one a strong ETag was computed for
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,145 @@
+"""
+Currency conversion for multi-currency ledgers.
+
+Ledger rows keep the amount and currency they were entered in; totals are
+reported in the user's base currency. `fx_rates` holds daily rates against a
+single pivot currency (loaded from files by database/load_fx_rates.py) and is
+replicated to every shard, so aggregates convert inside the SUM with
+`converted_amount`: each row uses the latest rate on or before its date, and
+rows already in the base currency skip the lookup. Per-row conversions in the
+write paths (budget deltas) read an in-process copy of the rate series instead
+of querying, refreshed every FX_CACHE_SECONDS.
+
+An amount dated before the first rate of its currency (or of the base) has no
+conversion. Writes check for that and fail with MissingRateError, which the
+app answers with 400, so every stored row converts and no total silently
+leaves one out.
+"""
+import bisect
+import time
+from datetime import datetime
+
+from flask import current_app, g
+from sqlalchemy import case, func, select
+
+from models import db, DEFAULT_CURRENCY, FxRate, User
+
+# currency -> (expires_at, dates, rates) in date order
+_series = {}
+# (expires_at, set of currencies with rates)
+_known = (0.0, frozenset())
+
+
+class MissingRateError(ValueError):
+    """No exchange rate on or before the date of an amount that needs converting"""
+
+    def __init__(self, currency, day):
+        if isinstance(day, datetime):
+            day = day.date()
+        super().__init__(f'No exchange rate for {currency} on or before {day.isoformat()}')
+
+
+def _ttl():
+    return current_app.config.get('FX_CACHE_SECONDS', 3600)
+
+
+def _rate_at(currency, day):
+    """Rate of `currency` on `day`: the latest one on or before it (NULL when there is none)"""
+    return select(FxRate.rate).where(
+        FxRate.currency == currency,
+        FxRate.date <= day
+    ).order_by(FxRate.date.desc()).limit(1).scalar_subquery()
+
+
+def converted_amount(columns, base):
+    """SQL expression for a ledger row's amount in `base`; columns is a model or a table's `.c`"""
+    day = func.date(columns.date)
+    return case(
+        (columns.currency == base, columns.amount),
+        else_=columns.amount * _rate_at(base, day) / _rate_at(columns.currency, day)
+    )
+
+
+def base_currency(user_id):
+    """The currency a user's totals are reported in, looked up once per request"""
+    cache = g.setdefault('base_currencies', {})
+    if user_id not in cache:
+        cache[user_id] = db.session.query(User.base_currency).filter_by(id=user_id).scalar() or DEFAULT_CURRENCY
+    return cache[user_id]
+
+
+def known_currencies():
+    """Currencies with at least one loaded rate"""
+    global _known
+    now = time.monotonic()
+    if _known[0] <= now:
+        codes = frozenset(code for (code,) in db.session.query(FxRate.currency).distinct().all())
+        _known = (now + _ttl(), codes)
+    return _known[1]
+
+
+def parse_currency(value, default):
+    """Validate a currency code from a request body; returns the upper-cased code or `default`"""
+    if value is None or value == '':
+        return default
+    code = str(value).strip().upper()
+    if code != DEFAULT_CURRENCY and code not in known_currencies():
+        raise ValueError(f'Unsupported currency: {code}')
+    return code
+
+
+def _rates(currency):
+    now = time.monotonic()
+    cached = _series.get(currency)
+    if cached is None or cached[0] <= now:
+        rows = db.session.query(FxRate.date, FxRate.rate).filter(
+            FxRate.currency == currency
+        ).order_by(FxRate.date).all()
+        cached = (now + _ttl(), [row.date for row in rows], [row.rate for row in rows])
+        _series[currency] = cached
+    return cached[1], cached[2]
+
+
+def rate_on(currency, day):
+    """Cached equivalent of the SQL rate lookup; None when the currency has no rate on or before `day`"""
+    dates, rates = _rates(currency)
+    if isinstance(day, datetime):
+        day = day.date()
+    index = bisect.bisect_right(dates, day)
+    return rates[index - 1] if index else None
+
+
+def convert(amount, currency, base, when):
+    """Convert one amount to `base` at the rate of `when`, matching `converted_amount`"""
+    if currency == base:
+        return amount
+    base_rate, rate = rate_on(base, when), rate_on(currency, when)
+    if rate is None:
+        raise MissingRateError(currency, when)
+    if base_rate is None:
+        raise MissingRateError(base, when)
+    return amount * base_rate / rate
+
+
+def require_rates(currency, base, when):
+    """Raise MissingRateError unless an amount in `currency` on `when` converts to `base`"""
+    convert(0.0, currency, base, when)
+
+
+def require_rates_on(query, model, base, when):
+    """require_rates for every currency among the rows a bulk update moves to `when`"""
+    for (currency,) in query.with_entities(model.currency).distinct().all():
+        require_rates(currency, base, when)
+
+
+def require_convertible_rows(model, user_id, base):
+    """Raise MissingRateError if any of the user's rows in `model` has no conversion to `base`"""
+    row = db.session.query(model.amount, model.currency, model.date).filter(
+        model.user_id == user_id,
+        model.currency != base,
+        converted_amount(model, base).is_(None)
+    ).first()
+    if row is not None:
+        # Names the missing currency; the cached series may lag the table by FX_CACHE_SECONDS
+        convert(row.amount, row.currency, base, row.date)
+        raise MissingRateError(row.currency, row.date)
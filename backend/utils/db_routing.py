@@ -0,0 +1,149 @@
+"""
+Read-replica routing for the shared SQLAlchemy session.
+
+Replicas are configured as `replica_<n>` entries in SQLALCHEMY_BINDS. Blueprints
+register `use_read_replica` as a before_request hook; their GET handlers then
+read from one replica, picked once per request, unless the client committed a
+write within READ_YOUR_WRITES_SECONDS, in which case they stay on the primary.
+
+Responses to requests that committed a write carry `X-Last-Write` (a Unix
+timestamp) and clients send the latest one back on every request, so the
+window holds whichever worker serves the next read. A client can only use the
+header to keep its own reads on the primary.
+
+Statements on per-user tables go to the user's shard first when shards are
+configured (see utils.sharding).
+"""
+import random
+import time
+from contextlib import contextmanager
+from flask import g, request, current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import UnboundExecutionError
+from sqlalchemy.sql.dml import UpdateBase
+
+from utils.sharding import SHARD_BIND_PREFIX, current_shard, is_sharded, statement_tables
+
+REPLICA_BIND_PREFIX = 'replica_'
+LAST_WRITE_HEADER = 'X-Last-Write'
+
+
+def use_read_replica():
+    """before_request hook: allow GET requests of a blueprint to read from a replica"""
+    g.prefer_replica = request.method == 'GET'
+
+
+def _recently_wrote():
+    """Whether the client says it committed a write within READ_YOUR_WRITES_SECONDS"""
+    try:
+        last = float(request.headers.get(LAST_WRITE_HEADER, ''))
+    except ValueError:
+        return False
+    return time.time() - last < current_app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+
+
+def add_last_write_header(response):
+    """after_request hook: tell the client when this request committed a write"""
+    last_write = g.get('last_write')
+    if last_write is not None:
+        response.headers[LAST_WRITE_HEADER] = f'{last_write:.3f}'
+    return response
+
+
+class RoutingSession(Session):
+    """Session that routes per-user tables to shards and reads to a replica when allowed"""
+
+    def commit(self):
+        # Inside `deferred_commit` a handler's commit only flushes; the block's owner commits once
+        if self.info.get('defer_commit'):
+            self.flush()
+            return
+        super().commit()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            shard = self._shard_engine(mapper, clause)
+            if shard is not None:
+                return shard
+
+        if bind is None and self._can_use_replica(clause):
+            replica = self._replica_engine()
+            if replica is not None:
+                return replica
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _shard_engine(self, mapper, clause):
+        engines = self._db.engines
+        if not any(key and key.startswith(SHARD_BIND_PREFIX) for key in engines):
+            return None
+
+        if mapper is not None:
+            mapper = inspect(mapper)
+        if not any(is_sharded(table) for table in statement_tables(mapper, clause)):
+            return None
+
+        shard = current_shard(self)
+        if shard is None:
+            raise UnboundExecutionError('Per-user tables are sharded; query them inside a request or user_scope()')
+        return engines[shard]
+
+    def _replica_engine(self):
+        """The replica this request reads from, picked on first use so its reads see one snapshot"""
+        if 'replica' not in g:
+            keys = [key for key in self._db.engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+            g.replica = random.choice(keys) if keys else None
+        return self._db.engines[g.replica] if g.replica else None
+
+    def _can_use_replica(self, clause):
+        if self._flushing or isinstance(clause, UpdateBase) or self.info.get('wrote'):
+            return False
+        if not has_app_context() or not g.get('prefer_replica'):
+            return False
+        return not _recently_wrote()
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, e.g. rows a GET handler is about to update"""
+    previous = g.get('prefer_replica') if has_app_context() else None
+    if previous:
+        g.prefer_replica = False
+    try:
+        yield
+    finally:
+        if previous:
+            g.prefer_replica = previous
+
+
+@contextmanager
+def deferred_commit(session):
+    """Turn commits made inside the block into flushes, so the caller can add rows and commit them all at once"""
+    session.info['defer_commit'] = True
+    try:
+        yield
+    finally:
+        session.info.pop('defer_commit', None)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flag_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _flag_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if session.info.pop('wrote', False) and has_app_context():
+        g.last_write = time.time()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('wrote', None)
@@ -0,0 +1,41 @@
+"""
+Sparse fieldsets for list endpoints (`?fields=id,amount,date`).
+
+Only the requested columns are selected from the database and serialized.
+Endpoints can expose derived fields (e.g. the expense `category` name, which
+lives in the categories table) as labelled SQL expressions via `extra`.
+"""
+from datetime import date, datetime
+from flask import request
+
+
+def parse_fields(model, extra=None):
+    """Return the model columns (or `extra` expressions) named in ?fields=, or None when the parameter is absent"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    if not names:
+        return None
+
+    extra = extra or {}
+    columns = model.__table__.columns
+    valid = [*columns.keys(), *(name for name in extra if name not in columns)]
+    unknown = [name for name in names if name not in valid]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}. Valid fields: {", ".join(valid)}')
+
+    return [extra[name] if name in extra else getattr(model, name) for name in names]
+
+
+def serialize_rows(rows, fields):
+    """Serialize rows selected with `parse_fields` columns into dictionaries"""
+    keys = [field.key for field in fields]
+    return [
+        {
+            key: value.isoformat() if isinstance(value, (date, datetime)) else value
+            for key, value in zip(keys, row)
+        }
+        for row in rows
+    ]
@@ -0,0 +1,259 @@
+"""
+Month-end spend forecasts and expense anomaly detection.
+
+Per-category parameters (moments of monthly spend and a log-spaced histogram
+of expense amounts) are folded into `spending_models` once per closed month
+and cached per process, so a forecast only reads the current month's
+expenses. Folding aggregates in SQL (per category-month sums and per-bucket
+counts) and reads and writes the models on the primary, never a replica. Anomalies use a robust z-score, 0.6745 * (x - median) / MAD, with
+the median and MAD read from the histogram. Amounts are in the user's base
+currency; changing it drops the user's models so they are refitted, and so
+does any write to an expense dated in a closed month (`invalidate_models`).
+Other processes reload their cached copy after FORECAST_CACHE_SECONDS.
+Models are keyed by category id like budgets, so they survive renames.
+"""
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import case, func, extract
+from sqlalchemy.exc import IntegrityError
+
+from flask import current_app
+
+from models import db, Expense, SpendingModel
+from utils.budget_tracker import month_bounds
+from utils.categories import category_name
+from utils.currency import base_currency, converted_amount
+from utils.db_routing import primary_reads
+from utils.sharding import current_shard
+
+BUCKETS_PER_DECADE = 20
+BUCKET_EDGES = np.logspace(-2, 7, 9 * BUCKETS_PER_DECADE + 1)  # 0.01 to 10M
+BUCKET_CENTERS = np.sqrt(BUCKET_EDGES[:-1] * BUCKET_EDGES[1:])
+BUCKET_RATIO = BUCKET_EDGES[1] / BUCKET_EDGES[0]
+ROBUST_Z_THRESHOLD = 3.5
+
+# (shard, user_id) -> (expires_at (monotonic), current month index, base currency, {category id: parameters});
+# keyed by shard since rebalancing may renumber ids
+_model_cache = {}
+_MAX_CACHED_USERS = 10000
+
+
+def month_index(value):
+    return value.year * 12 + value.month - 1
+
+
+def _month_start(index):
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _weighted_median(values, weights):
+    total = weights.sum()
+    if not total:
+        return None
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    return float(values[order][np.searchsorted(cumulative, total / 2)])
+
+
+def _parameters(row):
+    counts = np.array(json.loads(row.histogram) or [0] * BUCKET_CENTERS.size)
+    median = _weighted_median(BUCKET_CENTERS, counts)
+    mad = _weighted_median(np.abs(BUCKET_CENTERS - median), counts) if median is not None else None
+    if median is not None and not mad:
+        # Identical amounts: fall back to the histogram's resolution around the median
+        mad = median * (BUCKET_RATIO - 1) / 2
+
+    months = row.months_observed
+    mean = row.month_sum / months if months else 0.0
+    variance = row.month_sumsq / months - mean ** 2 if months else 0.0
+    return {
+        'months': months,
+        'mean': mean,
+        'std': float(np.sqrt(max(variance, 0.0))),
+        'median': median,
+        'mad': mad
+    }
+
+
+def _bucket(amount):
+    """SQL expression for an amount's histogram bucket (-1 below the first edge; clip the top in Python)"""
+    lowest = float(BUCKET_EDGES[0])
+    return case(
+        (amount >= lowest, func.floor(func.log(amount / lowest) * BUCKETS_PER_DECADE)),
+        else_=-1
+    )
+
+
+def _fold_closed_months(user_id, rows, fitted_through, current):
+    """Add the months in [fitted_through, current) to the user's model rows"""
+    start, end = _month_start(fitted_through), _month_start(current)
+    in_range = (Expense.user_id == user_id, Expense.date >= start, Expense.date < end)
+    converted = converted_amount(Expense, base_currency(user_id))
+
+    monthly = [
+        (id, total)
+        for id, _, _, total in db.session.query(
+            Expense.category_id,
+            extract('year', Expense.date).label('year'),
+            extract('month', Expense.date).label('month'),
+            func.sum(converted)
+        ).filter(*in_range).group_by(Expense.category_id, 'year', 'month').all()
+    ]
+
+    histograms = {}
+    amounts = db.session.query(Expense.category_id, converted.label('amount')).filter(*in_range).subquery()
+    bucket = _bucket(amounts.c.amount).label('bucket')
+    for id, index, count in db.session.query(
+        amounts.c.category_id, bucket, func.count()
+    ).group_by(amounts.c.category_id, 'bucket').all():
+        counts = histograms.setdefault(id, np.zeros(BUCKET_CENTERS.size, dtype=np.int64))
+        counts[min(max(int(index), 0), BUCKET_CENTERS.size - 1)] += count
+
+    months_observed = max((row.months_observed for row in rows.values()), default=0) + current - fitted_through
+
+    for id in set(rows) | set(histograms):
+        row = rows.get(id)
+        if row is None:
+            row = SpendingModel(
+                user_id=user_id, category_id=id, month_sum=0.0, month_sumsq=0.0,
+                histogram=json.dumps([0] * BUCKET_CENTERS.size)
+            )
+            db.session.add(row)
+            rows[id] = row
+
+        totals = [total for category_id, total in monthly if category_id == id]
+        row.month_sum += sum(totals)
+        row.month_sumsq += sum(total * total for total in totals)
+        row.months_observed = months_observed
+        row.fitted_through = current
+
+        if id in histograms:
+            row.histogram = json.dumps((np.array(json.loads(row.histogram)) + histograms[id]).tolist())
+
+
+def get_models(user_id, now=None):
+    """Return {category id: parameters}, folding in newly closed months at most once per month"""
+    current = month_index(now or datetime.utcnow())
+    base = base_currency(user_id)
+
+    key = current_shard(db.session), user_id
+    cached = _model_cache.get(key)
+    if cached and cached[0] > time.monotonic() and cached[1:3] == (current, base):
+        return cached[3]
+
+    # Models read from a lagging replica would be folded again and written back over newer rows
+    with primary_reads():
+        rows = {row.category_id: row for row in SpendingModel.query.filter_by(user_id=user_id).all()}
+        if rows:
+            fitted_through = min(row.fitted_through for row in rows.values())
+        else:
+            first = db.session.query(func.min(Expense.date)).filter(Expense.user_id == user_id).scalar()
+            fitted_through = month_index(first) if first else current
+
+        if fitted_through < current:
+            _fold_closed_months(user_id, rows, fitted_through, current)
+            params = {id: _parameters(row) for id, row in rows.items()}
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another request fitted the same user concurrently; its rows are equivalent
+                db.session.rollback()
+        else:
+            params = {id: _parameters(row) for id, row in rows.items()}
+
+    if len(_model_cache) >= _MAX_CACHED_USERS:
+        _model_cache.clear()
+    ttl = current_app.config.get('FORECAST_CACHE_SECONDS', 300)
+    _model_cache[key] = (time.monotonic() + ttl, current, base, params)
+    return params
+
+
+def evict_models(user_id):
+    """Drop this process's copy of a user's models"""
+    _model_cache.pop((current_shard(db.session), user_id), None)
+
+
+def invalidate_models(user_id, *dates):
+    """Drop the user's models within the current transaction when an expense dated in a closed month changed"""
+    current = month_index(datetime.utcnow())
+    if not any(value is not None and month_index(value) < current for value in dates):
+        return
+    # Folded months cannot be corrected in place; the next forecast refits from the expenses
+    SpendingModel.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    evict_models(user_id)
+
+
+def forecast(user_id, now=None):
+    """Project end-of-month spend per category and flag anomalous expenses this month"""
+    now = now or datetime.utcnow()
+    start, end = month_bounds(now.year, now.month)
+    elapsed = max((now - start).total_seconds() / (end - start).total_seconds(), 1e-6)
+
+    params = get_models(user_id, now)
+    base = base_currency(user_id)
+    expenses = db.session.query(
+        Expense.id, Expense.category_id, converted_amount(Expense, base).label('amount'), Expense.date
+    ).filter(
+        Expense.user_id == user_id,
+        Expense.date >= start,
+        Expense.date < end
+    ).all()
+
+    month_to_date = {}
+    for expense in expenses:
+        month_to_date[expense.category_id] = month_to_date.get(expense.category_id, 0) + expense.amount
+
+    categories = []
+    for id in sorted(set(month_to_date) | set(params)):
+        spent = month_to_date.get(id, 0)
+        model = params.get(id)
+        pace = spent / elapsed
+
+        if model and model['months']:
+            # Lean on history early in the month and on this month's pace later on
+            remaining = (1 - elapsed) * (elapsed * pace + (1 - elapsed) * model['mean'])
+        else:
+            remaining = (1 - elapsed) * pace
+
+        projected = spent + remaining
+        categories.append({
+            'category': category_name(user_id, id),
+            'month_to_date': round(spent, 2),
+            'projected': round(projected, 2),
+            'historical_mean': round(model['mean'], 2) if model else None,
+            'historical_std': round(model['std'], 2) if model else None,
+            'unusual': bool(model and model['std'] > 0 and projected > model['mean'] + 2 * model['std'])
+        })
+
+    anomalies = []
+    for expense in expenses:
+        model = params.get(expense.category_id)
+        if not model or model['median'] is None:
+            continue
+        robust_z = 0.6745 * (expense.amount - model['median']) / model['mad']
+        if abs(robust_z) > ROBUST_Z_THRESHOLD:
+            anomalies.append({
+                'expense_id': expense.id,
+                'category': category_name(user_id, expense.category_id),
+                'amount': round(expense.amount, 2),
+                'date': expense.date.isoformat(),
+                'robust_z': round(robust_z, 2),
+                'typical_amount': round(model['median'], 2)
+            })
+
+    anomalies.sort(key=lambda x: abs(x['robust_z']), reverse=True)
+    categories.sort(key=lambda x: x['projected'], reverse=True)
+
+    return {
+        'month': start.strftime('%B %Y'),
+        'currency': base,
+        'elapsed': round(elapsed, 4),
+        'projected_total': round(sum(item['projected'] for item in categories), 2),
+        'month_to_date_total': round(sum(month_to_date.values()), 2),
+        'categories': categories,
+        'anomalies': anomalies,
+        'months_observed': max((model['months'] for model in params.values()), default=0)
+    }
@@ -0,0 +1,137 @@
+"""
+Idempotency-Key support for POST write endpoints.
+
+The key is claimed by inserting an `idempotency_keys` row in the same
+transaction as the ledger write, so concurrent duplicates are serialized by the
+(user_id, key) unique constraint instead of a lock. The handler's commit is
+deferred until its response has been stored on the claim, so the ledger write,
+the claim and the response are committed together: a crash in between leaves
+no claim behind, and the retry runs the request again. Retries are answered
+from the stored response without touching the ledger tables. Rows expire after
+IDEMPOTENCY_TTL_SECONDS and are evicted opportunistically on later claims.
+"""
+import hashlib
+import random
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, current_app, jsonify, make_response, request
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey
+from utils.db_routing import deferred_commit
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+CLEANUP_PROBABILITY = 0.01
+CLEANUP_BATCH = 1000
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _replay(row, fingerprint):
+    """Response for a key that has already been claimed"""
+    if row.fingerprint != fingerprint:
+        return jsonify({'error': f'{HEADER} was already used with a different request'}), 422
+
+    if row.status_code is None:
+        response = jsonify({'error': 'A request with this Idempotency-Key is still being processed'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    response = Response(row.response, status=row.status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _evict_expired(now):
+    """Delete a batch of expired keys"""
+    expired = select(IdempotencyKey.id).where(IdempotencyKey.expires_at < now).limit(CLEANUP_BATCH)
+    db.session.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.id.in_(expired))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _release(user_id, key):
+    """Forget a claim whose request failed so the client can retry it"""
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(user_id=user_id, key=key, status_code=None).delete()
+    db.session.commit()
+
+
+def idempotent(f):
+    """Decorator (below token_required) that makes a POST handler safe to retry"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        user_id = kwargs['current_user_id']
+        fingerprint = _fingerprint()
+        now = datetime.utcnow()
+
+        row = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if row is not None and row.expires_at > now:
+            return _replay(row, fingerprint)
+
+        if row is not None:
+            IdempotencyKey.query.filter_by(id=row.id).delete()
+        elif random.random() < CLEANUP_PROBABILITY:
+            _evict_expired(now)
+
+        ttl = current_app.config.get('IDEMPOTENCY_TTL_SECONDS', 86400)
+        claim = IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            fingerprint=fingerprint,
+            expires_at=now + timedelta(seconds=ttl)
+        )
+        db.session.add(claim)
+        try:
+            # Blocks on a concurrent claim of the same key until that transaction ends
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            row = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+            if row is None:
+                return jsonify({'error': 'Idempotency-Key conflict, please retry'}), 409
+            return _replay(row, fingerprint)
+
+        try:
+            with deferred_commit(db.session):
+                response = make_response(f(*args, **kwargs))
+        except Exception:
+            _release(user_id, key)
+            raise
+
+        if response.status_code >= 500:
+            _release(user_id, key)
+            return response
+
+        if response.mimetype != 'application/json':
+            # Nothing to replay: keep the handler's work but not the claim
+            IdempotencyKey.query.filter_by(user_id=user_id, key=key, status_code=None).delete()
+            db.session.commit()
+            return response
+
+        # A handler that rolled back (e.g. on a validation error) took the claim with it; merge re-adds it
+        claim = db.session.merge(claim)
+        claim.status_code = response.status_code
+        claim.response = response.get_data(as_text=True)
+        # One commit for the ledger write, the claim and its response
+        db.session.commit()
+        return response
+
+    return decorated
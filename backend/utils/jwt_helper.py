@@ -1,27 +1,108 @@
 import jwt
+import uuid
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g
+from utils.sharding import shard_for
+from utils.token_denylist import USER_PREFIX, is_revoked, revoke
 
-def create_token(user_id):
-    """Create JWT token for user"""
-    payload = {
+def _encode(payload):
+    return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+
+def create_tokens(user_id):
+    """Create a short-lived access token and the refresh token of a new session"""
+    now = datetime.utcnow()
+    config = current_app.config
+    refresh_jti = str(uuid.uuid4())
+    refresh_token = _encode({
+        'user_id': user_id,
+        'type': 'refresh',
+        'jti': refresh_jti,
+        'exp': now + timedelta(days=config['REFRESH_TOKEN_DAYS']),
+        'iat': now
+    })
+    access_token = _encode({
         'user_id': user_id,
-        'exp': datetime.utcnow() + timedelta(days=30),  # Token expires in 30 days
-        'iat': datetime.utcnow()
+        'type': 'access',
+        'jti': str(uuid.uuid4()),
+        'sid': refresh_jti,  # logging out with the access token also revokes its refresh token
+        'exp': now + timedelta(minutes=config['ACCESS_TOKEN_MINUTES']),
+        'iat': now
+    })
+    return {
+        'token': access_token,
+        'refresh_token': refresh_token,
+        'expires_in': config['ACCESS_TOKEN_MINUTES'] * 60
     }
-    token = jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
-    return token
 
-def decode_token(token):
-    """Decode JWT token"""
+def create_stream_token(user_id):
+    """Short-lived token that only opens the change stream, for EventSource URLs (which end up in access logs)"""
+    seconds = current_app.config['CHANGE_STREAM_TOKEN_SECONDS']
+    now = datetime.utcnow()
+    token = _encode({
+        'user_id': user_id,
+        'type': 'stream',
+        'jti': str(uuid.uuid4()),
+        'exp': now + timedelta(seconds=seconds),
+        'iat': now
+    })
+    return {'stream_token': token, 'expires_in': seconds}
+
+def _expiry(payload):
+    return datetime.utcfromtimestamp(payload['exp'])
+
+def revoke_session(payload):
+    """Revoke an access token and the refresh token it was issued with"""
+    revoke(payload['jti'], _expiry(payload))
+    refresh_expiry = datetime.utcfromtimestamp(payload['iat']) + timedelta(days=current_app.config['REFRESH_TOKEN_DAYS'])
+    revoke(payload['sid'], refresh_expiry, mirror=False)
+
+def _user_jti(user_id):
+    """Deny-list entry that blocks every token of a user"""
+    return f'{USER_PREFIX}{user_id}'
+
+def revoke_user(user_id):
+    """Revoke all of a user's access and refresh tokens, e.g. once account deletion is requested"""
+    revoke(_user_jti(user_id), datetime.utcnow() + timedelta(days=current_app.config['REFRESH_TOKEN_DAYS']))
+
+def rotate_refresh_token(token):
+    """Spend a refresh token; returns its user id, or None when it is invalid, expired or already used"""
+    payload = decode_token(token, 'refresh')
+    # Revoking in the database rejects a refresh token that was already used or logged out, even by another worker
+    if not payload or not revoke(payload['jti'], _expiry(payload), mirror=False):
+        return None
+    return payload['user_id']
+
+def decode_token(token, token_type='access'):
+    """Decode a JWT of the given type; None when it is invalid, expired or revoked"""
     try:
         payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    # Tokens issued before revocation support carry no jti and are no longer accepted
+    if payload.get('type') != token_type or 'jti' not in payload:
+        return None
+    # Refresh token ids are not mirrored in memory; rotate_refresh_token checks them against the table
+    if token_type != 'refresh' and is_revoked(payload['jti']):
+        return None
+    if is_revoked(_user_jti(payload['user_id'])):
+        return None
+    return payload
+
+def _authenticate(token, token_type='access'):
+    """Decode a token and bind the request to its user; returns the user id or None"""
+    payload = decode_token(token, token_type)
+    if not payload:
+        return None
+    
+    # Expose the user to the session for shard and replica routing
+    g.token = payload
+    g.current_user_id = payload['user_id']
+    g.shard = shard_for(payload['user_id'])
+    return payload['user_id']
 
 def token_required(f):
     """Decorator to protect routes with JWT authentication"""
@@ -41,12 +122,33 @@ def token_required(f):
             return jsonify({'error': 'Token is missing'}), 401
         
         # Decode token
-        payload = decode_token(token)
-        if not payload:
+        user_id = _authenticate(token)
+        if user_id is None:
             return jsonify({'error': 'Token is invalid or expired'}), 401
         
         # Add user_id to kwargs
-        kwargs['current_user_id'] = payload['user_id']
+        kwargs['current_user_id'] = user_id
+        return f(*args, **kwargs)
+    
+    return decorated
+
+def stream_token_required(f):
+    """Like token_required, but also accepts a stream token as ?token= since EventSource cannot send headers"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if 'Authorization' in request.headers:
+            return token_required(f)(*args, **kwargs)
+        
+        token = request.args.get('token')
+        if not token:
+            return jsonify({'error': 'Token is missing'}), 401
+        
+        # Access tokens are never accepted in a URL; get a stream token from POST /changes/stream-token
+        user_id = _authenticate(token, 'stream')
+        if user_id is None:
+            return jsonify({'error': 'Stream token is invalid or expired'}), 401
+        
+        kwargs['current_user_id'] = user_id
         return f(*args, **kwargs)
     
     return decorated
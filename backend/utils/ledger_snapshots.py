@@ -0,0 +1,144 @@
+"""
+Frozen per-user balance snapshots for closed periods.
+
+Carryover reads take the latest snapshot at or before a boundary and only sum
+the rows dated after it, so closed (and archived) partitions are not scanned
+on every dashboard request. Writes dated inside a closed period drop the
+snapshots they would change; `database/partitions.py snapshot` rebuilds them.
+Totals are in the user's base currency, so changing it drops every snapshot.
+"""
+from datetime import datetime
+from sqlalchemy import func
+
+from models import db, Expense, Income, SavingsTransaction, BalanceSnapshot
+from utils.currency import base_currency, converted_amount
+
+TOTAL_KEYS = ('income', 'expenses', 'deposits', 'withdrawals')
+
+
+def _naive(value):
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def current_period_start(now=None):
+    """Start of the current (open) month; every period before it is closed"""
+    now = now or datetime.utcnow()
+    return datetime(now.year, now.month, 1)
+
+
+def next_boundary(value, granularity='month'):
+    """Return the first period boundary strictly after `value`"""
+    if granularity == 'year':
+        return datetime(value.year + 1, 1, 1)
+    if value.month == 12:
+        return datetime(value.year + 1, 1, 1)
+    return datetime(value.year, value.month + 1, 1)
+
+
+def _sum(model, user_id, start, end, action=None):
+    query = db.session.query(func.sum(converted_amount(model, base_currency(user_id)))).filter(
+        model.user_id == user_id,
+        model.date < end
+    )
+    if start is not None:
+        query = query.filter(model.date >= start)
+    if action:
+        query = query.filter(model.action == action)
+    return query.scalar() or 0
+
+
+def _range_totals(user_id, start, end):
+    """Ledger totals for rows dated in [start, end); start=None means since the beginning"""
+    if start is not None and start >= end:
+        return dict.fromkeys(TOTAL_KEYS, 0)
+
+    return {
+        'income': _sum(Income, user_id, start, end),
+        'expenses': _sum(Expense, user_id, start, end),
+        'deposits': _sum(SavingsTransaction, user_id, start, end, 'deposit'),
+        'withdrawals': _sum(SavingsTransaction, user_id, start, end, 'withdraw')
+    }
+
+
+def _snapshot_totals(snapshot):
+    return {
+        'income': snapshot.income_total,
+        'expenses': snapshot.expense_total,
+        'deposits': snapshot.deposits_total,
+        'withdrawals': snapshot.withdrawals_total
+    }
+
+
+def totals_before(user_id, before):
+    """Return cumulative income, expense, deposit and withdrawal totals for rows dated before `before`"""
+    snapshot = BalanceSnapshot.query.filter(
+        BalanceSnapshot.user_id == user_id,
+        BalanceSnapshot.period_end <= before
+    ).order_by(BalanceSnapshot.period_end.desc()).first()
+
+    if snapshot is None:
+        return _range_totals(user_id, None, before)
+
+    totals = _range_totals(user_id, snapshot.period_end, before)
+    base = _snapshot_totals(snapshot)
+    return {key: base[key] + totals[key] for key in TOTAL_KEYS}
+
+
+def _earliest_entry(user_id):
+    dates = [
+        db.session.query(func.min(model.date)).filter(model.user_id == user_id).scalar()
+        for model in (Income, Expense, SavingsTransaction)
+    ]
+    dates = [_naive(value) for value in dates if value is not None]
+    return min(dates) if dates else None
+
+
+def close_periods(user_id, granularity='month', through=None):
+    """Snapshot every closed period for a user that is not snapshotted yet; returns the number created"""
+    through = min(through or current_period_start(), current_period_start())
+
+    latest = BalanceSnapshot.query.filter_by(user_id=user_id).order_by(
+        BalanceSnapshot.period_end.desc()
+    ).first()
+
+    if latest:
+        start = latest.period_end
+        totals = _snapshot_totals(latest)
+    else:
+        earliest = _earliest_entry(user_id)
+        if earliest is None:
+            return 0
+        start = None
+        totals = dict.fromkeys(TOTAL_KEYS, 0)
+
+    created = 0
+    boundary = next_boundary(start if latest else earliest, granularity)
+    while boundary <= through:
+        period = _range_totals(user_id, start, boundary)
+        totals = {key: totals[key] + period[key] for key in TOTAL_KEYS}
+        db.session.add(BalanceSnapshot(
+            user_id=user_id,
+            period_end=boundary,
+            income_total=totals['income'],
+            expense_total=totals['expenses'],
+            deposits_total=totals['deposits'],
+            withdrawals_total=totals['withdrawals']
+        ))
+        created += 1
+        start = boundary
+        boundary = next_boundary(boundary, granularity)
+
+    return created
+
+
+def invalidate_snapshots(user_id, *dates):
+    """Drop snapshots covering any of the given transaction dates"""
+    open_period = current_period_start()
+    closed = [_naive(value) for value in dates if value is not None and _naive(value) < open_period]
+    if not closed:
+        return
+
+    BalanceSnapshot.query.filter(
+        BalanceSnapshot.user_id == user_id,
+        BalanceSnapshot.period_end > min(closed)
+    ).delete(synchronize_session=False)
@@ -0,0 +1,188 @@
+"""
+Account deletion and data purges as background, batched jobs.
+
+Deleting a user through the ORM would load every ledger row into the session
+before deleting them one by one. Instead the API enqueues a `maintenance_jobs`
+row and database/maintenance.py works it off: each batch selects up to
+MAINTENANCE_BATCH_SIZE ids of one per-user table, removes them with a single
+set-based DELETE and commits together with the job's progress, then pauses for
+MAINTENANCE_BATCH_PAUSE_SECONDS so locks are short and the database keeps
+serving requests. Batches are idempotent, so a job whose worker died is picked
+up again once its heartbeat is older than MAINTENANCE_STALE_SECONDS.
+
+An account is disabled and all of its tokens revoked before the first batch.
+Once every worker has picked up that revocation, a final pass over every
+table removes rows that requests already in flight added behind the job.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from models import db, User, MaintenanceJob, BalanceSnapshot, SpendingModel
+from utils.budget_tracker import rebuild_spend
+from utils.change_feed import record_change
+from utils.forecasting import evict_models
+from utils.jwt_helper import revoke_user
+from utils.sharding import is_sharded, user_scope
+from utils.statements import delete_statements_before
+from utils.sync import SYNC_MODELS, record_deletions
+
+JOB_KINDS = ('delete_account', 'purge_data')
+ACTIVE_STATUSES = ('pending', 'running')
+
+
+def enqueue(account_id, kind, params=None):
+    """Add a job unless an identical one is already pending or running; returns the job"""
+    params = json.dumps(params or {}, sort_keys=True)
+    job = MaintenanceJob.query.filter(
+        MaintenanceJob.account_id == account_id,
+        MaintenanceJob.kind == kind,
+        MaintenanceJob.params == params,
+        MaintenanceJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+    if job is None:
+        job = MaintenanceJob(account_id=account_id, kind=kind, params=params, status='pending')
+        db.session.add(job)
+    return job
+
+
+def drop_derived_totals(user_id):
+    """Delete the user's stored aggregates (carryover and forecasts rebuild them on demand) and
+    recompute the category totals, which budget status reads as complete"""
+    for model in (BalanceSnapshot, SpendingModel):
+        model.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    evict_models(user_id)
+    rebuild_spend(user_id)
+
+
+def _targets(job):
+    """(table, row condition, feed entity) to delete from, children before parents"""
+    user_id = job.account_id
+    if job.kind == 'delete_account':
+        return [
+            (table, table.c.user_id == user_id, None)
+            for table in reversed(db.metadata.sorted_tables) if is_sharded(table)
+        ]
+
+    before = datetime.fromisoformat(json.loads(job.params)['before'])
+    return [
+        (model.__table__, and_(model.__table__.c.user_id == user_id, model.__table__.c.date < before), entity)
+        for model, entity in SYNC_MODELS.values()
+    ]
+
+
+def _delete_batch(table, condition, batch_size):
+    """Delete up to batch_size matching rows; returns (rows deleted, their ids)"""
+    if 'id' not in table.c:
+        # Single-row tables keyed by user_id (change_cursors)
+        return db.session.execute(delete(table).where(condition)).rowcount, []
+
+    ids = db.session.execute(select(table.c.id).where(condition).limit(batch_size)).scalars().all()
+    if ids:
+        db.session.execute(delete(table).where(table.c.id.in_(ids)))
+    return len(ids), ids
+
+
+def _sign_out(user_id):
+    """Revoke every token of a user being deleted; returns when that revocation reached all workers"""
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    user.deleted_at = user.deleted_at or datetime.utcnow()
+    revoke_user(user_id)
+    db.session.commit()
+    return user.deleted_at + timedelta(seconds=current_app.config.get('TOKEN_DENYLIST_SYNC_SECONDS', 5))
+
+
+def run_job(job, batch_size, pause):
+    """Work a claimed job off in batches, committing progress after each one"""
+    user_id = job.account_id
+    signed_out_everywhere = None
+    if job.kind == 'delete_account':
+        # Done before the first batch so no session can keep adding rows behind the job
+        signed_out_everywhere = _sign_out(user_id)
+
+    with user_scope(db.session, user_id):
+        targets = _targets(job)
+        if job.total_rows is None:
+            job.total_rows = sum(
+                db.session.execute(select(func.count()).select_from(table).where(condition)).scalar()
+                for table, condition, _ in targets
+            )
+            db.session.commit()
+
+        for table, condition, entity in targets:
+            job.stage = table.name
+            while True:
+                deleted, ids = _delete_batch(table, condition, batch_size)
+                if entity and ids:
+                    # Purged rows leave the same trail for offline clients as a bulk delete
+                    record_deletions(user_id, entity, ids)
+                    record_change(user_id, entity, 'bulk_delete', data={'ids': ids})
+                job.rows_deleted += deleted
+                db.session.commit()
+                if deleted < batch_size:
+                    break
+                time.sleep(pause)
+
+        if job.kind == 'delete_account':
+            # Requests authenticated before other workers saw the revocation may still have added rows:
+            # once they cannot anymore, sweep every table again before the user row goes
+            if signed_out_everywhere is not None:
+                time.sleep(max((signed_out_everywhere - datetime.utcnow()).total_seconds(), 0))
+            for table, condition, _ in targets:
+                while True:
+                    deleted, _ids = _delete_batch(table, condition, batch_size)
+                    job.rows_deleted += deleted
+                    db.session.commit()
+                    if deleted < batch_size:
+                        break
+            db.session.execute(delete(User.__table__).where(User.__table__.c.id == user_id))
+        else:
+            drop_derived_totals(user_id)
+            # Issued statements would still show the purged entries
+            delete_statements_before(user_id, datetime.fromisoformat(json.loads(job.params)['before']))
+
+        job.status = 'done'
+        job.stage = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def claim_next(stale_seconds):
+    """Mark the oldest runnable job as running for this worker; returns it or None"""
+    stale = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    candidates = MaintenanceJob.query.filter(or_(
+        MaintenanceJob.status == 'pending',
+        and_(MaintenanceJob.status == 'running', MaintenanceJob.updated_at < stale)
+    )).order_by(MaintenanceJob.created_at).limit(10).all()
+
+    for job in candidates:
+        now = datetime.utcnow()
+        # The status and heartbeat act as a version: only one worker's UPDATE matches
+        claimed = db.session.execute(
+            update(MaintenanceJob)
+            .where(
+                MaintenanceJob.id == job.id,
+                MaintenanceJob.status == job.status,
+                MaintenanceJob.updated_at == job.updated_at
+            )
+            .values(status='running', started_at=func.coalesce(MaintenanceJob.started_at, now), updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            db.session.refresh(job)
+            return job
+    return None
+
+
+def fail_job(job, error):
+    db.session.rollback()
+    job.status = 'failed'
+    job.error = str(error)[:2000]
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
@@ -0,0 +1,283 @@
+"""
+Vectorized long-range reports.
+
+A user's whole ledger is pulled once into compact NumPy columns (timestamp,
+amount, category code), sorted by date, and cached per base currency; a
+report for any date range slices those arrays with a binary search instead of
+querying again. Every period x category pivot, opening and cumulative balance
+and moving average is computed with array operations instead of one GROUP BY
+query (or Python loop) per period. Amounts are converted to the user's base
+currency by the fetching query.
+"""
+import time
+from collections import OrderedDict
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import Float, cast, extract, select
+
+from models import db, Expense, Income, SavingsTransaction
+from utils.categories import category_name
+from utils.currency import base_currency, converted_amount
+
+PERIOD_UNITS = {'day': 'D', 'month': 'M', 'year': 'Y'}
+MAX_WINDOW = 366
+
+# (user_id, base currency) -> (expires_at, LedgerArrays); reports may lag writes by REPORT_CACHE_SECONDS.
+# Bounded by the bytes of the arrays it holds (REPORT_CACHE_BYTES), least recently used first out
+_ledger_cache = OrderedDict()
+
+
+def _columns(model, user_id, base, *extra):
+    """Fetch (epoch seconds, amount in base, *extra) for a user as a list of column tuples"""
+    table = model.__table__.c
+    # Epoch seconds and plain table columns skip per-row datetime parsing and ORM row handling
+    statement = select(
+        cast(extract('epoch', table.date), Float),
+        converted_amount(table, base),
+        *(table[name] for name in extra)
+    ).where(table.user_id == user_id)
+
+    rows = db.session.execute(statement).all()
+    if not rows:
+        return [()] * (2 + len(extra))
+    return list(zip(*rows))
+
+
+def _dates(epoch_seconds):
+    micros = np.array(epoch_seconds, dtype=np.float64) * 1e6
+    return micros.astype(np.int64).astype('datetime64[us]')
+
+
+def _amounts(values):
+    return np.array(values, dtype=np.float64)
+
+
+def _by_date(dates, *columns):
+    """Sort a table's arrays by date; sorting here spares the database an ORDER BY over the user's rows"""
+    order = np.argsort(dates, kind='stable')
+    return (dates[order], *(column[order] for column in columns))
+
+
+def _span(dates, start, end):
+    """Slice of a sorted date array falling in [start, end]"""
+    first = 0 if start is None else np.searchsorted(dates, np.datetime64(start, 'us'), side='left')
+    last = dates.size if end is None else np.searchsorted(dates, np.datetime64(end, 'us'), side='right')
+    return slice(first, last)
+
+
+class LedgerArrays:
+    """Columnar, in-memory copy of one user's ledger"""
+
+    def __init__(self, expense_dates, expense_amounts, expense_codes, categories,
+                 income_dates, income_amounts, savings_dates, savings_amounts):
+        self.expense_dates = expense_dates
+        self.expense_amounts = expense_amounts
+        self.expense_codes = expense_codes
+        self.categories = categories  # category ids, indexed by expense code
+        self.income_dates = income_dates
+        self.income_amounts = income_amounts
+        self.savings_dates = savings_dates
+        self.savings_amounts = savings_amounts  # deposits positive, withdrawals negative
+
+    @classmethod
+    def load(cls, user_id, base):
+        """Pull a user's ledger columns, sorted by date, with one query per table"""
+        expense_dates, expense_amounts, expense_categories = _columns(Expense, user_id, base, 'category_id')
+        income_dates, income_amounts = _columns(Income, user_id, base)
+        savings_dates, savings_amounts, savings_actions = _columns(SavingsTransaction, user_id, base, 'action')
+
+        categories = sorted(set(expense_categories))
+        lookup = {category: code for code, category in enumerate(categories)}
+        expense_codes = np.fromiter(
+            (lookup[category] for category in expense_categories),
+            dtype=np.int32, count=len(expense_categories)
+        )
+
+        signs = np.where(np.array(savings_actions, dtype=object) == 'withdraw', -1.0, 1.0)
+
+        return cls(
+            *_by_date(_dates(expense_dates), _amounts(expense_amounts), expense_codes), categories,
+            *_by_date(_dates(income_dates), _amounts(income_amounts)),
+            *_by_date(_dates(savings_dates), _amounts(savings_amounts) * signs)
+        )
+
+    def between(self, start=None, end=None):
+        """The rows dated in [start, end], as views of these arrays; categories without rows there are left out"""
+        expenses, incomes, savings = (
+            _span(dates, start, end) for dates in (self.expense_dates, self.income_dates, self.savings_dates)
+        )
+        used, expense_codes = np.unique(self.expense_codes[expenses], return_inverse=True)
+        return LedgerArrays(
+            self.expense_dates[expenses], self.expense_amounts[expenses], expense_codes.astype(np.int32),
+            [self.categories[code] for code in used],
+            self.income_dates[incomes], self.income_amounts[incomes],
+            self.savings_dates[savings], self.savings_amounts[savings]
+        )
+
+    def balance_before(self, start):
+        """Income minus expenses minus net savings transfers dated before `start`"""
+        def total(dates, amounts):
+            return amounts[:_span(dates, start, None).start].sum()
+
+        return float(
+            total(self.income_dates, self.income_amounts)
+            - total(self.expense_dates, self.expense_amounts)
+            - total(self.savings_dates, self.savings_amounts)
+        )
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the ledger's arrays"""
+        arrays = (self.expense_dates, self.expense_amounts, self.expense_codes, self.income_dates,
+                  self.income_amounts, self.savings_dates, self.savings_amounts)
+        return sum(array.nbytes for array in arrays) + 8 * len(self.categories)
+
+    def _all_dates(self):
+        return np.concatenate([self.expense_dates, self.income_dates, self.savings_dates])
+
+    def period_axis(self, period, start=None, end=None):
+        """Return the ordered array of period starts covering the data (or the requested range)"""
+        dtype = f'datetime64[{PERIOD_UNITS[period]}]'
+        dates = self._all_dates()
+
+        if start is not None:
+            first = np.datetime64(start).astype(dtype)
+        elif dates.size:
+            first = dates.min().astype(dtype)
+        else:
+            return np.array([], dtype=dtype)
+
+        if end is not None:
+            last = np.datetime64(end).astype(dtype)
+        elif dates.size:
+            last = dates.max().astype(dtype)
+        else:
+            last = first
+
+        if last < first:
+            return np.array([], dtype=dtype)
+        return np.arange(first, last + 1, dtype=dtype)
+
+    @staticmethod
+    def _bucket(dates, axis):
+        """Index of each date's period on the axis"""
+        return (dates.astype(axis.dtype) - axis[0]).astype(np.int64)
+
+    def _period_sums(self, dates, amounts, axis):
+        if not axis.size or not dates.size:
+            return np.zeros(axis.size)
+        index = self._bucket(dates, axis)
+        inside = (index >= 0) & (index < axis.size)
+        return np.bincount(index[inside], weights=amounts[inside], minlength=axis.size)
+
+    def category_matrix(self, axis):
+        """Expenses pivoted into a (category, period) matrix"""
+        shape = (len(self.categories), axis.size)
+        if not axis.size or not self.expense_dates.size:
+            return np.zeros(shape)
+        index = self._bucket(self.expense_dates, axis)
+        inside = (index >= 0) & (index < axis.size)
+        flat = self.expense_codes[inside].astype(np.int64) * axis.size + index[inside]
+        return np.bincount(flat, weights=self.expense_amounts[inside], minlength=shape[0] * shape[1]).reshape(shape)
+
+    def period_totals(self, axis):
+        """Income, expense and net savings transfer per period"""
+        return {
+            'income': self._period_sums(self.income_dates, self.income_amounts, axis),
+            'expenses': self._period_sums(self.expense_dates, self.expense_amounts, axis),
+            'savings': self._period_sums(self.savings_dates, self.savings_amounts, axis)
+        }
+
+
+def moving_average(values, window):
+    """Trailing moving average; the first window-1 entries are NaN"""
+    result = np.full(values.shape, np.nan)
+    if window <= 0 or values.size < window:
+        return result
+    cumulative = np.cumsum(np.insert(values, 0, 0.0))
+    result[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return result
+
+
+def period_days(axis):
+    """Number of days in each period of the axis"""
+    if not axis.size:
+        return np.array([], dtype=np.int64)
+    starts = axis.astype('datetime64[D]')
+    ends = (axis + 1).astype('datetime64[D]')
+    return (ends - starts).astype(np.int64)
+
+
+def _rounded(values):
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def load_ledger(user_id):
+    """Return the user's whole ledger as arrays, reusing a recent load for repeated reports"""
+    ttl = current_app.config.get('REPORT_CACHE_SECONDS', 30)
+    base = base_currency(user_id)
+    key = (user_id, base)
+    now = time.monotonic()
+
+    cached = _ledger_cache.get(key)
+    if cached and cached[0] > now:
+        _ledger_cache.move_to_end(key)
+        return cached[1]
+
+    ledger = LedgerArrays.load(user_id, base)
+    if ttl > 0:
+        _cache_ledger(key, now + ttl, ledger, now)
+    return ledger
+
+
+def _cache_ledger(key, expires_at, ledger, now):
+    limit = current_app.config.get('REPORT_CACHE_BYTES', 64 * 1024 * 1024)
+    _ledger_cache.pop(key, None)
+    for stale in [stale for stale, (expiry, _) in _ledger_cache.items() if expiry <= now]:
+        del _ledger_cache[stale]
+    if ledger.nbytes > limit:
+        return
+
+    _ledger_cache[key] = (expires_at, ledger)
+    held = sum(cached.nbytes for _, cached in _ledger_cache.values())
+    while held > limit:
+        _, (_, evicted) = _ledger_cache.popitem(last=False)
+        held -= evicted.nbytes
+
+
+def build_report(user_id, period='month', start=None, end=None, window=3):
+    """Compute the long-range report for a user"""
+    full = load_ledger(user_id)
+    ledger = full.between(start, end)
+    axis = ledger.period_axis(period, start, end)
+    totals = ledger.period_totals(axis)
+    matrix = ledger.category_matrix(axis)
+    names = [category_name(user_id, id) for id in ledger.categories]
+
+    # Balance carried in from before the report range
+    opening = full.balance_before(start) if start is not None else 0.0
+
+    net = totals['income'] - totals['expenses'] - totals['savings']
+    cumulative = opening + np.cumsum(net)
+    days = period_days(axis)
+    velocity = np.divide(totals['expenses'], days, out=np.zeros(axis.size), where=days > 0)
+
+    unit = PERIOD_UNITS[period]
+    return {
+        'period': period,
+        'currency': base_currency(user_id),
+        'periods': [str(label) for label in np.datetime_as_string(axis, unit=unit)],
+        'categories': names,
+        'expenses_by_category': {name: _rounded(matrix[code]) for code, name in enumerate(names)},
+        'totals': {key: _rounded(values) for key, values in totals.items()},
+        'net': _rounded(net),
+        'opening_balance': round(float(opening), 2),
+        'cumulative_balance': _rounded(cumulative),
+        'moving_average': {
+            'window': window,
+            'expenses': _rounded(moving_average(totals['expenses'], window)),
+            'income': _rounded(moving_average(totals['income'], window))
+        },
+        'spending_velocity': _rounded(velocity)
+    }
@@ -0,0 +1,165 @@
+"""
+Shard routing by user_id.
+
+Shards are configured as `shard_<n>` entries in SQLALCHEMY_BINDS (built from
+DATABASE_SHARD_URLS). Every table with a user_id column except `users` lives
+on the shard a consistent-hash ring picks for that user, so adding a shard
+only moves about 1/N of the users (see database/rebalance.py). The users table
+and other global tables stay on the primary database. Global reference tables
+marked `info={'replicated': True}` (fx_rates) are also copied to every shard so
+per-user queries can join them.
+
+`token_required` binds each request to the user's shard; scripts wrap per-user
+work in `user_scope`. While a rebalance runs, the old shard list is configured
+as `previous_<n>` binds (DATABASE_PREVIOUS_SHARD_URLS): a user whose shard
+changed keeps being routed to the old one until rebalance records the move in
+`users.shard`.
+"""
+import bisect
+import hashlib
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import MetaData, text
+from sqlalchemy.sql.util import find_tables
+
+SHARD_BIND_PREFIX = 'shard_'
+PREVIOUS_SHARD_BIND_PREFIX = 'previous_'
+VIRTUAL_NODES = 128
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to node names"""
+
+    def __init__(self, nodes, virtual_nodes=VIRTUAL_NODES):
+        points = sorted((_hash(f'{node}#{index}'), node) for node in nodes for index in range(virtual_nodes))
+        self.nodes = tuple(nodes)
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def get(self, key):
+        if not self._owners:
+            return None
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._owners[index]
+
+
+# tuple of shard names -> HashRing
+_rings = {}
+
+
+def shard_names(count):
+    return [f'{SHARD_BIND_PREFIX}{index}' for index in range(count)]
+
+
+def ring_for(names):
+    names = tuple(sorted(names))
+    if names not in _rings:
+        _rings[names] = HashRing(names)
+    return _rings[names]
+
+
+def is_sharded(table):
+    """Per-user tables live on shards; users and global tables stay on the primary"""
+    return table.name != 'users' and 'user_id' in table.c
+
+
+def is_replicated(table):
+    """Global tables kept on the primary and copied to every shard"""
+    return bool(table.info.get('replicated'))
+
+
+def configured_shards(prefix=SHARD_BIND_PREFIX):
+    binds = current_app.config.get('SQLALCHEMY_BINDS') or {}
+    return [key for key in binds if key.startswith(prefix)]
+
+
+def shard_engines(engines):
+    """Engines of the configured shards, given the app's engines mapping"""
+    return [engine for key, engine in engines.items() if key and key.startswith(SHARD_BIND_PREFIX)]
+
+
+def home_shard(user_id):
+    """Shard the current ring assigns to a user, or None when sharding is off"""
+    names = configured_shards()
+    if not names:
+        return None
+    return ring_for(names).get(user_id)
+
+
+def _previous_shard(user_id):
+    """Bind of the shard the user had before the ongoing rebalance, or None"""
+    previous = configured_shards(PREVIOUS_SHARD_BIND_PREFIX)
+    if not previous:
+        return None
+    # The old ring is keyed by the old shard names, in their old order
+    name = ring_for(shard_names(len(previous))).get(user_id)
+    return PREVIOUS_SHARD_BIND_PREFIX + name[len(SHARD_BIND_PREFIX):]
+
+
+def _moved_to(user_id):
+    """Shard rebalance last moved the user to; read from the primary, replicas may lag"""
+    db = current_app.extensions['sqlalchemy']
+    with db.engine.connect() as conn:
+        return conn.execute(text('SELECT shard FROM users WHERE id = :id'), {'id': user_id}).scalar()
+
+
+def shard_for(user_id):
+    """Bind key of the shard holding a user's rows, or None when sharding is off"""
+    shard = home_shard(user_id)
+    previous = _previous_shard(user_id)
+    if shard is None or previous is None:
+        return shard
+    binds = current_app.config['SQLALCHEMY_BINDS']
+    if binds[previous] == binds[shard] or _moved_to(user_id) == shard:
+        return shard
+    return previous
+
+
+def current_shard(session):
+    """Shard the session is bound to by user_scope or by token_required"""
+    shard = session.info.get('shard')
+    if shard is None and has_app_context():
+        shard = g.get('shard')
+    return shard
+
+
+@contextmanager
+def user_scope(session, user_id):
+    """Route a script's queries on per-user tables to user_id's shard"""
+    previous = session.info.get('shard')
+    session.info['shard'] = shard_for(user_id)
+    try:
+        yield
+    finally:
+        session.info['shard'] = previous
+
+
+def statement_tables(mapper, clause):
+    if mapper is not None:
+        return [mapper.local_table]
+    if clause is not None:
+        return find_tables(clause, include_crud=True)
+    return []
+
+
+def shard_metadata(metadata):
+    """Copy of the per-user and replicated tables, minus foreign keys to tables kept on the primary"""
+    target = MetaData()
+    for table in metadata.sorted_tables:
+        if is_sharded(table) or is_replicated(table):
+            table.to_metadata(target)
+
+    for table in target.tables.values():
+        for constraint in list(table.foreign_key_constraints):
+            referred = constraint.elements[0].target_fullname.split('.')[0]
+            if referred not in target.tables:
+                table.constraints.discard(constraint)
+                for element in constraint.elements:
+                    element.parent.foreign_keys.discard(element)
+                    table.foreign_keys.discard(element)
+    return target
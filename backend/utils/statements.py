@@ -0,0 +1,250 @@
+"""
+Monthly statements rendered once, after the month closes.
+
+`generate_statements` reads a user's month (one query per ledger table plus
+the opening balance from the balance snapshots), renders it as CSV, HTML and
+PDF and stores each rendering in `statements` with its sha256 as ETag. The
+rows are never rewritten, so the API serves them as immutable and answers
+revalidations from the ETag alone; later edits to a closed month show up in
+the live endpoints, not in statements already issued. database/
+generate_statements.py runs this for every user across a process pool.
+
+PDFs are written directly (monospaced text on A4 pages), so rendering needs
+no extra packages.
+"""
+import csv
+import hashlib
+import io
+from datetime import datetime
+from html import escape
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Expense, Income, SavingsTransaction, Statement, User
+from utils.budget_tracker import month_bounds
+from utils.categories import category_name
+from utils.currency import base_currency, converted_amount
+from utils.ledger_snapshots import close_periods, current_period_start, totals_before
+from utils.sharding import user_scope
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf'
+}
+CSV_COLUMNS = ('date', 'type', 'category_or_source', 'description', 'amount', 'currency', 'base_amount')
+PAGE_LINES = 68
+LINE_WIDTH = 95
+
+
+def is_closed(year, month):
+    """Statements exist only for months before the current one"""
+    return datetime(year, month, 1) < current_period_start()
+
+
+def _balance(totals):
+    return totals['income'] - totals['expenses'] - (totals['deposits'] - totals['withdrawals'])
+
+
+def _in_month(model, user_id, start, end):
+    return model.user_id == user_id, model.date >= start, model.date < end
+
+
+def statement_data(user_id, year, month):
+    """The month's entries with amounts signed by their effect on the balance; None for an empty ledger"""
+    start, end = month_bounds(year, month)
+    base = base_currency(user_id)
+
+    rows = []
+    for date, id, description, amount, currency, converted in db.session.query(
+        Expense.date, Expense.category_id, Expense.description, Expense.amount, Expense.currency,
+        converted_amount(Expense, base)
+    ).filter(*_in_month(Expense, user_id, start, end)).all():
+        rows.append((date, 'expense', category_name(user_id, id), description, -amount, currency, -converted))
+
+    for date, source, amount, currency, converted in db.session.query(
+        Income.date, Income.source, Income.amount, Income.currency, converted_amount(Income, base)
+    ).filter(*_in_month(Income, user_id, start, end)).all():
+        rows.append((date, 'income', source, '', amount, currency, converted))
+
+    for date, action, description, amount, currency, converted in db.session.query(
+        SavingsTransaction.date, SavingsTransaction.action, SavingsTransaction.description,
+        SavingsTransaction.amount, SavingsTransaction.currency, converted_amount(SavingsTransaction, base)
+    ).filter(*_in_month(SavingsTransaction, user_id, start, end)).all():
+        # Deposits move money out of the spendable balance, withdrawals bring it back
+        sign = -1 if action == 'deposit' else 1
+        rows.append((date, f'savings {action}', '', description, sign * amount, currency, sign * converted))
+
+    opening_totals = totals_before(user_id, start)
+    if not rows and not any(opening_totals.values()):
+        return None
+
+    rows.sort(key=lambda row: row[0])
+    opening = _balance(opening_totals)
+    income = sum(row[6] for row in rows if row[1] == 'income')
+    expenses = -sum(row[6] for row in rows if row[1] == 'expense')
+    savings = -sum(row[6] for row in rows if row[1].startswith('savings'))
+
+    return {
+        'name': db.session.query(User.name).filter_by(id=user_id).scalar(),
+        'period': start.strftime('%B %Y'),
+        'currency': base,
+        'rows': rows,
+        'opening': opening,
+        'income': income,
+        'expenses': expenses,
+        'savings': savings,
+        'closing': opening + income - expenses - savings
+    }
+
+
+def _summary(data):
+    """(CSV type, label, value) of the summary lines"""
+    return [
+        ('opening_balance', 'Opening balance', data['opening']),
+        ('total_income', 'Income', data['income']),
+        ('total_expenses', 'Expenses', data['expenses']),
+        ('net_savings', 'Moved to savings (net)', data['savings']),
+        ('closing_balance', 'Closing balance', data['closing'])
+    ]
+
+
+def render_csv(data):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for date, kind, label, description, amount, currency, converted in data['rows']:
+        writer.writerow((
+            date.date().isoformat(), kind, label, description or '',
+            f'{amount:.2f}', currency, f'{converted:.2f}'
+        ))
+    for kind, _, value in _summary(data):
+        writer.writerow(('', kind, '', '', '', data['currency'], f'{value:.2f}'))
+    return buffer.getvalue().encode('utf-8')
+
+
+def _html_row(values, tag='td'):
+    return '<tr>' + ''.join(f'<{tag}>{escape(str(value))}</{tag}>' for value in values) + '</tr>'
+
+
+def render_html(data):
+    rows = ''.join(
+        _html_row((date.date().isoformat(), kind, label, description or '', f'{amount:.2f} {currency}', f'{converted:.2f}'))
+        for date, kind, label, description, amount, currency, converted in data['rows']
+    )
+    summary = ''.join(_html_row((label, f'{value:.2f}')) for _, label, value in _summary(data))
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f"<title>Statement {escape(data['period'])}</title>"
+        '<style>body{font-family:sans-serif}table{border-collapse:collapse}'
+        'td,th{padding:2px 8px;text-align:left}</style></head><body>'
+        f"<h1>Statement for {escape(data['name'] or '')}</h1>"
+        f"<p>{escape(data['period'])}, amounts in {escape(data['currency'])}</p>"
+        f"<table>{_html_row(('Date', 'Type', 'Category / source', 'Description', 'Amount', data['currency']), 'th')}"
+        f'{rows}</table><h2>Summary</h2><table>{summary}</table></body></html>'
+    ).encode('utf-8')
+
+
+def _text_lines(data):
+    lines = [
+        f"Statement for {data['name'] or ''}",
+        f"{data['period']}, amounts in {data['currency']}",
+        '',
+        f"{'Date':<11}{'Type':<17}{'Category / source':<20}{'Description':<20}{'Amount':>14}{data['currency']:>13}"
+    ]
+    for date, kind, label, description, amount, currency, converted in data['rows']:
+        lines.append(
+            f"{date.date().isoformat():<11}{kind:<17}{(label or '')[:19]:<20}{(description or '')[:19]:<20}"
+            f"{f'{amount:.2f} {currency}':>14}{converted:>13.2f}"
+        )
+    lines.append('')
+    lines.extend(f'{label:<30}{value:>15.2f}' for _, label, value in _summary(data))
+    return [line[:LINE_WIDTH] for line in lines]
+
+
+def _pdf_text(line):
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def render_pdf(data):
+    """Minimal PDF 1.4: Courier text, PAGE_LINES lines per A4 page"""
+    lines = _text_lines(data)
+    pages = [lines[index:index + PAGE_LINES] for index in range(0, len(lines), PAGE_LINES)]
+
+    # 1: catalog, 2: page tree (filled in below), 3: font, then a content stream and a page per page
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>'
+    ]
+    kids = []
+    for page in pages:
+        text = ''.join(f'({_pdf_text(line)}) Tj T*\n' for line in page)
+        stream = f'BT /F1 9 Tf 11 TL 40 800 Td\n{text}ET'.encode('cp1252', 'replace')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append((
+            '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>'
+        ).encode())
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+RENDERERS = {'csv': render_csv, 'html': render_html, 'pdf': render_pdf}
+
+
+def delete_statements_before(user_id, before):
+    """Delete the statements of months that start before `before`, within the current transaction"""
+    year, month = before.year, before.month
+    if before == datetime(year, month, 1):
+        # Nothing of this month is purged
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    Statement.query.filter(Statement.user_id == user_id, or_(
+        Statement.year < year, and_(Statement.year == year, Statement.month <= month)
+    )).delete(synchronize_session=False)
+
+
+def generate_statements(user_id, year, month):
+    """Render and store the user's missing statements for a closed month; returns how many were stored"""
+    with user_scope(db.session, user_id):
+        existing = {
+            fmt for (fmt,) in db.session.query(Statement.format).filter_by(
+                user_id=user_id, year=year, month=month
+            ).all()
+        }
+        missing = [fmt for fmt in RENDERERS if fmt not in existing]
+        if not missing:
+            return 0
+
+        # Freeze the balances of closed months first so the opening balance is a snapshot read
+        close_periods(user_id)
+        data = statement_data(user_id, year, month)
+        if data is None:
+            db.session.commit()
+            return 0
+
+        for fmt in missing:
+            content = RENDERERS[fmt](data)
+            db.session.add(Statement(
+                user_id=user_id, year=year, month=month, format=fmt, currency=data['currency'],
+                etag=hashlib.sha256(content).hexdigest(), size=len(content), content=content
+            ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Generated concurrently by another worker; its rows stand
+            db.session.rollback()
+            return 0
+        return len(missing)
@@ -0,0 +1,66 @@
+"""
+Offline delta sync for the ledger tables.
+
+Rows carry an `updated_at` stamp (indexed with user_id) and hard deletes leave
+a `tombstones` row, so a returning client only downloads what changed after
+its watermark. Tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS are purged
+by database/compact.py; clients whose watermark predates that window must
+download their lists again.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert
+
+from models import db, Expense, Income, SavingsTransaction, Tombstone
+
+# response key -> (model, tombstone entity name)
+SYNC_MODELS = {
+    'expenses': (Expense, 'expense'),
+    'incomes': (Income, 'income'),
+    'savings': (SavingsTransaction, 'savings')
+}
+
+
+def record_deletions(user_id, entity, ids):
+    """Leave tombstones for hard-deleted rows within the current transaction"""
+    if not ids:
+        return
+    now = datetime.utcnow()
+    db.session.execute(insert(Tombstone), [
+        {'user_id': user_id, 'entity': entity, 'entity_id': entity_id, 'deleted_at': now}
+        for entity_id in ids
+    ])
+
+
+def retention_horizon():
+    """Oldest watermark that can still be synced incrementally"""
+    return datetime.utcnow() - timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+
+
+def sync_payload(user_id, since=None):
+    """Rows changed and ids deleted after `since` (everything when since is None)"""
+    watermark = datetime.utcnow()
+    payload = {'watermark': watermark.isoformat(), 'full': since is None}
+
+    if since is not None:
+        # Re-read a short window so rows committed just after the previous watermark are not missed
+        since = since - timedelta(seconds=current_app.config['SYNC_OVERLAP_SECONDS'])
+
+    deleted = {}
+    if since is not None:
+        rows = db.session.query(Tombstone.entity, Tombstone.entity_id).filter(
+            Tombstone.user_id == user_id,
+            Tombstone.deleted_at > since
+        ).all()
+        for entity, entity_id in rows:
+            deleted.setdefault(entity, []).append(entity_id)
+
+    for key, (model, entity) in SYNC_MODELS.items():
+        query = model.query.filter(model.user_id == user_id)
+        if since is not None:
+            query = query.filter(model.updated_at > since)
+        payload[key] = [row.to_dict() for row in query.order_by(model.updated_at).all()]
+        payload.setdefault('deleted', {})[key] = deleted.get(entity, [])
+
+    return payload
@@ -0,0 +1,93 @@
+"""
+In-process deny-list of revoked token ids (jti).
+
+Revocations are written to `revoked_tokens`. Access-token and `user:` entries
+are also mirrored in a per-process dict, so `token_required` answers "is this
+token revoked?" with a hash lookup instead of a query. Each process pulls
+revocations made elsewhere at most once every TOKEN_DENYLIST_SYNC_SECONDS,
+reading only rows revoked since its previous sync; entries are dropped once
+the token they block has expired, which keeps the set as small as the number
+of live revoked access tokens. Refresh-token ids, one per rotation and kept
+for REFRESH_TOKEN_DAYS, stay in the table only: spending a refresh token
+inserts its id there, and the primary key rejects one that was already used.
+"""
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RevokedToken
+from utils.db_routing import RoutingSession
+
+# Prefix of entries that block every token of a user
+USER_PREFIX = 'user:'
+
+# jti -> expiry of the revoked token
+_revoked = {}
+# revoked_at watermark of the last sync, and when the next one is due (monotonic)
+_synced_through = None
+_next_sync = 0.0
+
+
+def _sync():
+    global _synced_through, _next_sync
+    interval = current_app.config.get('TOKEN_DENYLIST_SYNC_SECONDS', 5)
+    if time.monotonic() < _next_sync:
+        return
+    _next_sync = time.monotonic() + interval
+
+    now = datetime.utcnow()
+    table = RevokedToken.__table__
+    # Revoked access tokens expire within ACCESS_TOKEN_MINUTES; later expiries are refresh tokens
+    access_horizon = now + timedelta(minutes=current_app.config['ACCESS_TOKEN_MINUTES'])
+    statement = select(table.c.jti, table.c.expires_at).where(
+        table.c.expires_at > now,
+        or_(table.c.expires_at <= access_horizon, table.c.jti.startswith(USER_PREFIX))
+    )
+    if _synced_through is not None:
+        # Overlap the previous window so revocations committed late are not missed
+        statement = statement.where(table.c.revoked_at > _synced_through - timedelta(seconds=interval))
+
+    # Read the primary directly: replicas may lag and the request's session should stay untouched
+    with db.engine.connect() as conn:
+        rows = conn.execute(statement).all()
+
+    for jti, expires_at in rows:
+        _revoked[jti] = expires_at
+    for jti in [jti for jti, expires_at in _revoked.items() if expires_at <= now]:
+        del _revoked[jti]
+    _synced_through = now
+
+
+def is_revoked(jti):
+    """O(1) check against the local deny-list, refreshed from the database every few seconds"""
+    _sync()
+    return jti in _revoked
+
+
+def revoke(jti, expires_at, mirror=True):
+    """Deny a token id within the current transaction; returns False if it was already revoked
+
+    Pass mirror=False for refresh tokens, which are only ever checked against the table.
+    """
+    try:
+        with db.session.begin_nested():
+            db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+    except IntegrityError:
+        return False
+    if mirror:
+        # Mirrored locally once the transaction commits; a rolled back revocation never took effect
+        db.session.info.setdefault('revoked_tokens', {})[jti] = expires_at
+    return True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _apply_revocations(session):
+    _revoked.update(session.info.pop('revoked_tokens', {}))
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_revocations(session):
+    session.info.pop('revoked_tokens', None)
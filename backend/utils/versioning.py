@@ -0,0 +1,106 @@
+"""
+Optimistic concurrency for single-row edits.
+
+Expenses and incomes carry a `version` that every write increments. A client
+names the version its copy is at with `If-Match: "<version>"` (the ETag of
+an update response) or `version` in the body; the UPDATE then only matches
+that version, so an edit made from a stale copy gets 409 with the current
+row instead of silently overwriting a change made from another device.
+Edits without either keep last-writer-wins semantics.
+
+An edit is a single UPDATE ... RETURNING that hands back the new row. When
+derived data (category-month totals, balance snapshots) depends on the values
+being replaced, PostgreSQL returns them from the same statement: it updates
+FROM a locked (SELECT ... FOR UPDATE) copy of the row and is conditioned on
+that copy's version, so the old values are exactly the ones overwritten.
+SQLite cannot return columns of an UPDATE's FROM clause, so there the values
+are read first (no round trip in-process) and the UPDATE is conditioned on the
+version read; a concurrent edit in between surfaces as a conflict either way.
+
+An edit that changes nothing (an empty body, or values equal to the stored
+ones) keeps the version and writes no change-log entry; the row comes back as
+it is.
+"""
+from flask import jsonify, request
+from sqlalchemy import or_, select, update
+
+from models import db
+
+
+def expected_version(data):
+    """Version named by If-Match or the body's `version`, or None; raises ValueError when malformed"""
+    if request.if_match.star_tag:
+        return None
+
+    tags = request.if_match.as_set(include_weak=True)
+    if len(tags) > 1:
+        raise ValueError('If-Match must name a single version')
+    value = tags.pop() if tags else data.get('version')
+    if value is None:
+        return None
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('version must be an integer')
+
+
+def version_headers(row):
+    return {'ETag': f'"{row.version}"'}
+
+
+def update_row(model, user_id, row_id, values, version=None, previous=()):
+    """Apply values to one of the user's rows and bump its version in one statement.
+
+    Returns (instance, changed, old): `old` holds the `previous` columns as they were before the edit, by
+    name, or is None when nothing was written. The row comes back as it is (changed=False) when the values
+    change nothing, and (None, False, None) means no row with that id (and version) exists.
+    """
+    conditions = [model.id == row_id, model.user_id == user_id]
+    if version is not None:
+        conditions.append(model.version == version)
+
+    if values:
+        statement = update(model).where(
+            or_(*(getattr(model, key).is_distinct_from(value) for key, value in values.items()))
+        )
+        returning = [model]
+        old = None
+        if previous and db.session.get_bind(mapper=model).dialect.name == 'postgresql':
+            locked = select(model.id, model.version, *(getattr(model, key) for key in previous)).where(
+                *conditions
+            ).with_for_update().subquery('old')
+            statement = statement.where(model.id == locked.c.id, model.version == locked.c.version)
+            returning += [locked.c[key].label(key) for key in previous]
+        elif previous:
+            old = db.session.query(model.version, *(getattr(model, key) for key in previous)).filter(
+                *conditions
+            ).first()
+            if old is None:
+                return None, False, None
+            statement = statement.where(*conditions[:2], model.version == old.version)
+        else:
+            statement = statement.where(*conditions)
+
+        result = db.session.execute(
+            statement.values(**values, version=model.version + 1)
+            .returning(*returning)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        ).first()
+        if result is not None:
+            return result[0], True, result if old is None else old
+
+    return model.query.filter(*conditions).first(), False, None
+
+
+def conflict_response(model, user_id, row_id, name):
+    """404 when the row is gone, otherwise 409 with the row as it is now"""
+    db.session.rollback()
+    row = model.query.filter_by(id=row_id, user_id=user_id).first()
+    if row is None:
+        return jsonify({'error': f'{name.capitalize()} not found'}), 404
+
+    return jsonify({
+        'error': f'{name.capitalize()} was changed by another request; apply your edit to the current version',
+        name: row.to_dict()
+    }), 409, version_headers(row)
@@ -0,0 +1,11 @@
+"""
+WSGI entry point for pre-fork serving
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the master builds the app (and checks the schema version)
+once; workers are forked from it instead of importing everything again.
+"""
+from app import create_app
+
+app = create_app()
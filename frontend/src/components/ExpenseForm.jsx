@@ -1,9 +1,9 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useDispatch } from 'react-redux';
 import { motion } from 'framer-motion';
 import { X, Tag, Calendar, FileText, ChevronDown } from 'lucide-react';
 import { formatCurrency } from '../utils/currency';
-import { expenseAPI } from '../utils/api';
+import { categoryAPI, expenseAPI } from '../utils/api';
 import { addExpense, updateExpense } from '../redux/expenseSlice';
 
 function ExpenseForm({ onClose, expense = null, remainingBalance = null }) {
@@ -17,6 +17,8 @@ function ExpenseForm({ onClose, expense = null, remainingBalance = null }) {
     date: expense?.date ? new Date(expense.date).toISOString().split('T')[0] : new Date().toISOString().split('T')[0],
   });
   
+  // Version of the expense this edit is based on
+  const [version, setVersion] = useState(expense?.version);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
 
@@ -29,7 +31,13 @@ function ExpenseForm({ onClose, expense = null, remainingBalance = null }) {
   const displayRemaining = normalizedRemaining !== null ? Math.max(normalizedRemaining, 0) : null;
   const displayBudgetCap = allowableBudget !== null ? Math.max(allowableBudget, 0) : null;
 
-  const categories = ['Food', 'Rent', 'Travel', 'Misc.', 'Others'];
+  const [categories, setCategories] = useState(['Food', 'Rent', 'Travel', 'Misc.', 'Others']);
+
+  useEffect(() => {
+    categoryAPI.getAll()
+      .then((response) => setCategories(response.data.categories.map((category) => category.name)))
+      .catch(() => {});
+  }, []);
 
   const handleChange = (e) => {
     setFormData({
@@ -60,7 +68,8 @@ function ExpenseForm({ onClose, expense = null, remainingBalance = null }) {
       }
 
       if (isEdit) {
-        const response = await expenseAPI.update(expense.id, formData);
+        // The version makes the edit fail with 409 if the expense changed elsewhere meanwhile
+        const response = await expenseAPI.update(expense.id, { ...formData, version });
         dispatch(updateExpense(response.data.expense));
       } else {
         const response = await expenseAPI.create(formData);
@@ -68,6 +77,11 @@ function ExpenseForm({ onClose, expense = null, remainingBalance = null }) {
       }
       onClose();
     } catch (err) {
+      if (err.response?.status === 409) {
+        // Show the current version; saving again applies this edit on top of it
+        dispatch(updateExpense(err.response.data.expense));
+        setVersion(err.response.data.expense.version);
+      }
       setError(err.response?.data?.error || 'Failed to save expense');
     } finally {
       setLoading(false);
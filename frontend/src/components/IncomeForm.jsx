@@ -15,6 +15,8 @@ function IncomeForm({ onClose, income = null }) {
     date: income?.date ? new Date(income.date).toISOString().split('T')[0] : new Date().toISOString().split('T')[0],
   });
   
+  // Version of the income this edit is based on
+  const [version, setVersion] = useState(income?.version);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
 
@@ -33,7 +35,8 @@ function IncomeForm({ onClose, income = null }) {
 
     try {
       if (isEdit) {
-        const response = await incomeAPI.update(income.id, formData);
+        // The version makes the edit fail with 409 if the income changed elsewhere meanwhile
+        const response = await incomeAPI.update(income.id, { ...formData, version });
         dispatch(updateIncome(response.data.income));
       } else {
         const response = await incomeAPI.create(formData);
@@ -41,6 +44,11 @@ function IncomeForm({ onClose, income = null }) {
       }
       onClose();
     } catch (err) {
+      if (err.response?.status === 409) {
+        // Show the current version; saving again applies this edit on top of it
+        dispatch(updateIncome(err.response.data.income));
+        setVersion(err.response.data.income.version);
+      }
       setError(err.response?.data?.error || 'Failed to save income');
     } finally {
       setLoading(false);
@@ -4,6 +4,7 @@ import { motion } from 'framer-motion';
 import { useState } from 'react';
 import { LogOut, Moon, Sun, User, Wallet, Menu, X } from 'lucide-react';
 import { logout } from '../redux/userSlice';
+import { authAPI } from '../utils/api';
 import { toggleTheme, setTheme } from '../redux/themeSlice';
 
 function Navbar() {
@@ -14,6 +15,8 @@ function Navbar() {
   const [mobileOpen, setMobileOpen] = useState(false);
 
   const handleLogout = () => {
+    // Revoke the session server-side; the local logout does not wait for it
+    authAPI.logout().catch(() => {});
     dispatch(logout());
     dispatch(setTheme('dark'));
     navigate('/login');
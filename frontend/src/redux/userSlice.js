@@ -23,6 +23,7 @@ const userSlice = createSlice({
       state.token = action.payload.token;
       state.error = null;
       localStorage.setItem('token', action.payload.token);
+      localStorage.setItem('refreshToken', action.payload.refresh_token);
     },
     loginFailure: (state, action) => {
       state.loading = false;
@@ -33,6 +34,7 @@ const userSlice = createSlice({
       state.token = null;
       state.isAuthenticated = false;
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
     },
     setUser: (state, action) => {
       state.user = action.payload;
@@ -16,6 +16,11 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    // Keeps reads right after our own writes off lagging read replicas
+    const lastWrite = localStorage.getItem('lastWrite');
+    if (lastWrite) {
+      config.headers['X-Last-Write'] = lastWrite;
+    }
     return config;
   },
   (error) => {
@@ -23,13 +28,52 @@ api.interceptors.request.use(
   }
 );
 
+// Requests that must not trigger a token refresh
+const AUTH_PATHS = ['/login', '/register', '/token/refresh'];
+
+// Shared by every request that fails while a refresh is in flight
+let refreshRequest = null;
+
+const refreshAccessToken = async () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    throw new Error('No refresh token');
+  }
+  // Plain axios so the refresh call skips these interceptors
+  const response = await axios.post(`${API_BASE_URL}/token/refresh`, { refresh_token: refreshToken });
+  localStorage.setItem('token', response.data.token);
+  localStorage.setItem('refreshToken', response.data.refresh_token);
+  return response.data.token;
+};
+
 // Handle response errors
 api.interceptors.response.use(
-  (response) => response,
-  (error) => {
+  (response) => {
+    const lastWrite = response.headers['x-last-write'];
+    if (lastWrite) {
+      localStorage.setItem('lastWrite', lastWrite);
+    }
+    return response;
+  },
+  async (error) => {
+    const request = error.config;
+    if (error.response?.status === 401 && request && !request._retried && !AUTH_PATHS.includes(request.url)) {
+      // Access tokens are short-lived: get a new one and retry the request once
+      request._retried = true;
+      try {
+        refreshRequest = refreshRequest || refreshAccessToken().finally(() => {
+          refreshRequest = null;
+        });
+        const token = await refreshRequest;
+        request.headers.Authorization = `Bearer ${token}`;
+        return api(request);
+      } catch {
+        // Refresh token missing, expired or revoked: fall through to the login page
+      }
+    }
     if (error.response?.status === 401) {
-      // Token expired or invalid
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
       if (!window.location.pathname.startsWith('/login')) {
         window.location.href = '/login';
       }
@@ -54,6 +98,14 @@ export const expenseAPI = {
   delete: (id) => api.delete(`/expenses/${id}`),
 };
 
+// Category APIs
+export const categoryAPI = {
+  getAll: () => api.get('/categories'),
+  create: (data) => api.post('/categories', data),
+  update: (id, data) => api.put(`/categories/${id}`, data),
+  delete: (id) => api.delete(`/categories/${id}`),
+};
+
 // Income APIs
 export const incomeAPI = {
   getAll: (params) => api.get('/incomes', { params }),